@@ -1,16 +1,42 @@
-# import whisper
+import argparse
+import functools
 import os
+import socket
+import threading
+import time
 from dotenv import load_dotenv
 from pathlib import Path
-from openai import OpenAI
+from voice2md.asr_pool import TranscriptionPool
+from voice2md.job_state import QuarantinedError, RetryLaterError, open_job_store
+from voice2md.lazy import load_openai_client, load_whisper_model
+from voice2md.llm import preload_model
+from voice2md.llm_async import AsyncLLMClient
+from voice2md.audio_cache import AudioCache
+from voice2md.llm_cache import LLMCache
 from voice2md.logger_config import setup_logger
-from voice2md.voice_memo import VoiceMemo
-import whisper
-from tinydb import TinyDB
+from voice2md.metrics import RunMetrics
+from voice2md.mirror import MATERIALIZE_STRATEGIES, Materializer
+from voice2md.memo_index import (
+    ProcessingState,
+    StemIndex,
+    scan_voice_memos,
+    select_voice_memos,
+)
+from voice2md.note_templates import NOTE_TEMPLATES
+from voice2md.pipeline import Stage, run_pipeline
+from voice2md.search import open_search_index
+from voice2md.storage import open_storage
+from voice2md.transcript_cache import TranscriptCache, model_cache_name
+from voice2md.transcript_store import SegmentStore
+from voice2md.voice_memo import VoiceMemo, parse_datetime_from_file_name
+from voice2md.watcher import create_watcher, watch_settled_files
+from voice2md.work_queue import WorkQueue
 from datetime import datetime
 
 logger = setup_logger(__name__)
 
+OLLAMA_HOST = "http://localhost:11434"
+
 
 def load_environment():
     """
@@ -50,10 +76,42 @@ def process_voice_memos(
     overwrite: bool = True,
     max_file_size_mb: float = 3.0,
     last_n_files: int = 4,
+    prep_workers: int = 1,
+    asr_workers: int = 1,
+    llm_workers: int = 1,
+    queue_size: int = 2,
+    longest_first: bool = False,
+    transcript_cache=None,
+    asr_model_name: str = None,
+    llm_cache=None,
+    storage_backend: str = "sqlite",
+    max_files: int = None,
+    use_high_water_mark: bool = True,
+    file_paths: list = None,
+    segment_threshold_mb: float = None,
+    segment_seconds: float = 300.0,
+    map_reduce_token_budget: int = None,
+    map_workers: int = 4,
+    audio_cache=None,
+    metrics_path=None,
+    profile_path=None,
+    materialize: str = "auto",
+    preload_llm=None,
+    note_template: str = "default",
+    job_store=None,
+    segment_store=None,
+    journal_mode: str = "WAL",
+    raise_on_errors: bool = True,
+    search_index=None,
+    persist_if=None,
 ):
     """
     Process voice memos: transcribe, summarize, generate title, and store in database.
 
+    Memos flow through a pipeline of stages connected by bounded queues
+    (file prep -> ASR -> LLM -> render/persist), so that while one memo is
+    being transcribed, the previous one is summarized and titled.
+
     Args:
         path_voice_memos_original (Path): Directory of original voice memos.
         path_voice_memos_processed (Path): Directory for processed voice memos.
@@ -63,40 +121,145 @@ def process_voice_memos(
         llm_client: Language Model client.
         llm_model (str): Language Model name. Defaults to "llama3.2:3b".
         overwrite (bool): Whether to overwrite existing files. Defaults to True.
-        max_file_size_mb (float): Maximum file size to process in MB. Defaults to 3.0.
-        last_n_files (int): Number of recent files to process. Defaults to 4.
+        max_file_size_mb (float, optional): Maximum file size to process in MB, or None
+            for no limit. Defaults to 3.0.
+        last_n_files (int): Number of recent files to process on the first run,
+            before a high-water mark exists. Defaults to 4.
+        prep_workers (int): Worker threads of the file-prep stage. Defaults to 1.
+        asr_workers (int): Worker threads of the ASR stage. Defaults to 1.
+        llm_workers (int): Worker threads of the LLM stage. Defaults to 1.
+        queue_size (int): Capacity of the queue in front of each stage. Defaults to 2.
+        longest_first (bool): Feed the selected memos largest file first, and let
+            the ASR workers take the largest waiting memo, which packs better
+            across several ASR workers. Defaults to False.
+        transcript_cache (TranscriptCache, optional): Cache of transcription results,
+            so that overwriting notes does not pay for ASR again. Defaults to None.
+        asr_model_name (str, optional): ASR model name, part of the transcript cache
+            key. Required with a transcript cache if the model has no cache_name.
+        llm_cache (LLMCache, optional): Cache of summary and title responses. Defaults to None.
+        storage_backend (str): Database backend, "sqlite" or "tinydb". Defaults to "sqlite".
+        max_files (int, optional): Maximum number of memos per run. Defaults to all.
+        use_high_water_mark (bool): Select the memos recorded after the persisted
+            high-water mark and advance it afterwards. If False, the newest
+            last_n_files memos are selected. Defaults to True.
+        file_paths (list[Path], optional): Process exactly these voice memos instead
+            of selecting them (used by the watch mode). Defaults to None.
+        segment_threshold_mb (float, optional): Memos larger than this are split at
+            silence and transcribed in segments. Defaults to never segmenting.
+        segment_seconds (float): Maximum segment length of segmented transcription.
+            Defaults to 300.
+        map_reduce_token_budget (int, optional): Transcripts estimated above this many
+            tokens are summarized in concurrently processed chunks. Defaults to None.
+        map_workers (int): Chunks of one transcript summarized concurrently.
+            Defaults to 4.
+        audio_cache (AudioCache, optional): Cache of decoded waveforms, so each memo
+            is decoded by ffmpeg only once. Defaults to None.
+        metrics_path (Path, optional): Prometheus textfile the timings and token
+            counts of the run are written to. Defaults to None.
+        profile_path (Path, optional): File the merged cProfile stats of all
+            processing steps are dumped to. Defaults to no profiling.
+        materialize (str): How processed voice memos are placed: "auto", "hardlink",
+            "reflink", "symlink" or "copy", falling back in that order when the
+            filesystem does not support a strategy. Defaults to "auto".
+        preload_llm (callable, optional): Called in a background thread when memos
+            were selected, so the LLM loads while the first memo is transcribed.
+        note_template (str): Name of the note template in NOTE_TEMPLATES.
+            Defaults to "default".
+        job_store (JobStore, optional): Per-memo stage checkpoints. Memos left
+            unfinished by an earlier run are resumed at their first incomplete
+            stage, failed stages are retried by a later run after a backoff, and
+            memos failing too often are quarantined instead of failing the run.
+            Defaults to None.
+        segment_store (SegmentStore, optional): Store of the transcript segments in
+            compressed sidecars; the database record then keeps only text,
+            language and a pointer. Defaults to storing the full transcript.
+        journal_mode (str): SQLite journal mode of the database, "DELETE" for a
+            database shared by workers on several hosts. Defaults to "WAL".
+        raise_on_errors (bool): Raise a RuntimeError after the run if memos
+            failed. If False, the failures are only in the returned "errors".
+            Defaults to True.
+        search_index (SearchIndex, optional): Full-text index updated with every
+            persisted memo. Defaults to None.
+        persist_if (callable, optional): Function (VoiceMemo) -> bool called
+            before a memo's note and record are written; memos for which it
+            returns False are dropped. Defaults to writing every memo.
 
     Returns:
-        None
+        dict: Pipeline result with the "completed" memos, "errors" and per-stage
+            "timings" (see run_pipeline).
     """
-    db = TinyDB(path_db / "db.json")
-    file_path_list_original = sorted(list(path_voice_memos_original.glob("*.m4a")))
-    for file_path in file_path_list_original[-last_n_files:]:
-        print(file_path)
+    if transcript_cache is not None:
+        # fail before any memo is processed, not in every memo's ASR stage
+        asr_model_name = model_cache_name(asr_model, asr_model_name)
+    storage = open_storage(path_db, backend=storage_backend, journal_mode=journal_mode)
+    state = ProcessingState(path_db)
+    if file_paths is not None:
+        memos_selected = []
+        for file_path in file_paths:
+            try:
+                datetime_created = parse_datetime_from_file_name(file_path.name)
+            except ValueError:
+                logger.warning(f"Ignoring {file_path}: no recording datetime in name")
+                continue
+            memos_selected.append((datetime_created, file_path))
+        memos_selected.sort()
+    else:
+        memos_selected = select_voice_memos(
+            scan_voice_memos(path_voice_memos_original),
+            high_water_mark=state.high_water_mark if use_high_water_mark else None,
+            last_n_files=last_n_files,
+            max_files=max_files,
+        )
+        if job_store is not None:
+            memos_selected = resume_pending_jobs(job_store, memos_selected)
+    logger.info(
+        f"Selected {len(memos_selected)} voice memo(s) after high-water mark {state.high_water_mark}"
+    )
+    file_path_list_selected = [file_path for _, file_path in memos_selected]
+    if preload_llm is not None and file_path_list_selected:
+        threading.Thread(target=preload_llm, name="llm-preload", daemon=True).start()
+    run_metrics = RunMetrics(profile=profile_path is not None)
+    materializer = Materializer(materialize)
+    processed_index = StemIndex(path_voice_memos_processed)
+    if longest_first:
+        file_path_list_selected.sort(key=lambda path: path.stat().st_size, reverse=True)
+
+    def prepare(file_path):
         vm = VoiceMemo(file_path, path_voice_memos_processed, path_markdown)
+        vm.metrics = run_metrics.new_memo()
         vm.parse_datetime_created()
         vm.create_file_path_voice_memo_processed()
         vm.get_file_size_mb()
 
-        if vm.file_size_mb > max_file_size_mb:
+        if max_file_size_mb is not None and vm.file_size_mb > max_file_size_mb:
             logger.info(
                 f"Skipping {file_path} because it exceeds the maximum file size of {max_file_size_mb} MB"
             )
-            continue
+            return None
 
         # Get the processed file name without path and suffix
         processed_file_name = vm.file_path_voice_memo_processed.stem
 
+        job = job_store.get(processed_file_name) if job_store is not None else None
+        if job is not None and job["quarantined"]:
+            logger.info(f"Skipping {file_path} because it is quarantined")
+            return None
+        if job is not None and (job["retry_after"] or 0) > time.time():
+            logger.info(
+                f"Skipping {file_path} until its retry at "
+                f"{datetime.fromtimestamp(job['retry_after']).isoformat(timespec='seconds')}"
+            )
+            return None
+        resuming = job is not None and job["stage"] not in (None, "persisted")
+        if resuming:
+            logger.info(f"Resuming {processed_file_name} after stage {job['stage']}")
         # Check if the processed file already exists
-        if any(
-            file.stem == processed_file_name
-            for file in path_voice_memos_processed.iterdir()
-        ):
+        elif processed_file_name in processed_index:
             if not overwrite:
                 logger.info(
                     f"Skipping {file_path} because {processed_file_name} already exists in processed directory and overwrite is False"
                 )
-                continue
+                return None
             else:
                 logger.info(
                     f"File {processed_file_name} exists in processed directory, but overwrite is True. Proceeding with transcription."
@@ -104,54 +267,786 @@ def process_voice_memos(
         else:
             logger.info(f"Processing new file: {file_path}")
 
-        vm.create_file_path_markdown()
-        vm.save_voice_memo_processed()
-        vm.transcribe(asr_model)
+        if job_store is not None:
+            job = job_store.begin(processed_file_name, file_path)
+        if resuming:
+            vm.materialized_as = job["artifacts"].get("materialized_as")
+            vm.file_path_audio = vm.file_path_original
+        else:
+            run_stage(
+                vm,
+                "copied",
+                lambda: vm.save_voice_memo_processed(materializer),
+                lambda: {"materialized_as": vm.materialized_as},
+            )
+        processed_index.add(processed_file_name)
+        return vm
+
+    def run_stage(vm, stage, func, artifacts=None):
+        if job_store is None:
+            return func()
+        return job_store.run(
+            vm.file_path_voice_memo_processed.stem, stage, func, artifacts
+        )
+
+    def checkpoint(vm, stage):
+        """Return the artifacts of a completed stage, or None."""
+        if job_store is None:
+            return None
+        job = job_store.get(vm.file_path_voice_memo_processed.stem)
+        if not job_store.reached(job["file_name"], stage):
+            return None
+        return job["artifacts"]
+
+    def transcribe(vm):
+        artifacts = checkpoint(vm, "transcribed")
+        if artifacts is not None:
+            vm.transcript = artifacts["transcript"]
+            return vm
+        segmented = (
+            segment_threshold_mb is not None and vm.file_size_mb > segment_threshold_mb
+        )
+        run_stage(
+            vm,
+            "transcribed",
+            lambda: vm.transcribe(
+                asr_model,
+                transcript_cache,
+                asr_model_name,
+                segment_seconds=segment_seconds if segmented else None,
+                # only a process pool can transcribe several segments at once
+                segment_workers=(
+                    asr_workers if isinstance(asr_model, TranscriptionPool) else 1
+                ),
+                audio_cache=audio_cache,
+            ),
+            lambda: {"transcript": vm.transcript},
+        )
         logger.info(f"voice memo file: {vm.file_path_voice_memo_processed}.")
-        vm.summarize(llm_client, llm_model)
+        return vm
+
+    def summarize(vm):
+        job = (
+            job_store.get(vm.file_path_voice_memo_processed.stem)
+            if job_store is not None
+            else None
+        )
+        if job is not None and "transcript_tldr" in job["artifacts"]:
+            # also kept when only the title failed
+            vm.transcript_tldr = job["artifacts"]["transcript_tldr"]
+            vm.transcript_title = job["artifacts"].get("transcript_title")
+
+        def summarize_and_title():
+            if vm.transcript_tldr is not None:
+                # the summary is checkpointed, only the title is missing
+                vm.generate_title(llm_client, llm_model, llm_cache)
+                return
+            try:
+                vm.summarize_and_title(
+                    llm_client,
+                    llm_model,
+                    llm_cache,
+                    token_budget=map_reduce_token_budget,
+                    map_workers=map_workers,
+                )
+            except Exception:
+                if job_store is not None and vm.transcript_tldr is not None:
+                    # keep the summary for the retry, without completing a stage
+                    job_store.save_artifacts(
+                        vm.file_path_voice_memo_processed.stem,
+                        transcript_tldr=vm.transcript_tldr,
+                    )
+                raise
+
+        if vm.transcript_title is None:
+            run_stage(
+                vm,
+                "titled",
+                summarize_and_title,
+                lambda: {
+                    "transcript_tldr": vm.transcript_tldr,
+                    "transcript_title": vm.transcript_title,
+                },
+            )
         logger.info(f"summary: {vm.transcript_tldr}")
-        vm.generate_title(llm_client, llm_model)
         logger.info(f"title: {vm.transcript_title}")
         vm.create_file_path_markdown()
         logger.info(vm.file_path_markdown)
-        vm.save_transcription()
+        return vm
+
+    def persist(vm):
+        if persist_if is not None and not persist_if(vm):
+            logger.warning(f"Dropping the result of {vm.file_path_original.name}")
+            return None
+        if checkpoint(vm, "rendered") is None:
+            run_stage(
+                vm,
+                "rendered",
+                lambda: vm.save_transcription(NOTE_TEMPLATES[note_template]),
+            )
 
+        processed_file_name = vm.file_path_voice_memo_processed.stem
+        transcript = vm.transcript
+        if segment_store is not None:
+            with vm.metrics.measure("store_segments"):
+                transcript = segment_store.compact(processed_file_name, transcript)
         db_item = {
             "file_name": processed_file_name,
             "file_path_original": str(vm.file_path_original),
             "file_path_voice_memo_processed": str(vm.file_path_voice_memo_processed),
+            "materialized_as": vm.materialized_as,
             "file_path_markdown": str(vm.file_path_markdown),
             "datetime_created": vm.datetime_created.isoformat(),
             "file_size_mb": vm.file_size_mb,
-            "transcript": vm.transcript,
+            "transcript": transcript,
             "transcript_tldr": vm.transcript_tldr,
             "transcript_title": vm.transcript_title,
             "datetime_recorded": datetime.now().isoformat(),
+            "metrics": vm.metrics.as_dict(),
         }
-        db.insert(db_item)
+        # measured after the record is built, so it only shows in the run metrics
+        with vm.metrics.measure("db_insert"):
+            storage.upsert(db_item)
+        if search_index is not None:
+            with vm.metrics.measure("search_index"):
+                search_index.add(db_item, vm.transcript.get("segments"))
+        run_metrics.add(vm.metrics)
+        persisted.append(processed_file_name)
         logger.info(f"Persisted {processed_file_name} to database")
+        return vm
 
+    persisted = []
+    try:
+        result = run_pipeline(
+            file_path_list_selected,
+            [
+                Stage("prep", prepare, workers=prep_workers, queue_size=queue_size),
+                Stage(
+                    "asr",
+                    transcribe,
+                    workers=asr_workers,
+                    queue_size=queue_size,
+                    # memos finish prep out of order, so keep sorting them here
+                    priority=(lambda vm: -vm.file_size_mb) if longest_first else None,
+                ),
+                Stage("llm", summarize, workers=llm_workers, queue_size=queue_size),
+                # a single writer keeps the database batches in order
+                Stage("persist", persist, workers=1, queue_size=queue_size),
+            ],
+        )
+    finally:
+        storage.close()
+        if job_store is not None:
+            # only now are the buffered upserts committed
+            for processed_file_name in persisted:
+                job_store.advance(processed_file_name, "persisted")
+    if transcript_cache is not None:
+        logger.info(f"Transcript cache: {transcript_cache.flush_stats()}")
+    if llm_cache is not None:
+        logger.info(f"LLM cache: {llm_cache.flush_stats()}")
+    if audio_cache is not None:
+        logger.info(f"Audio cache: {audio_cache.flush_stats()}")
+    if metrics_path is not None:
+        run_metrics.write_prometheus_textfile(metrics_path)
+    if profile_path is not None:
+        run_metrics.profiles.dump(profile_path)
+
+    errors = []
+    for item, stage_name, error in result["errors"]:
+        if isinstance(error, QuarantinedError):
+            logger.warning(f"Quarantined in stage {stage_name}: {error}")
+        elif isinstance(error, RetryLaterError):
+            logger.warning(f"Deferred in stage {stage_name}: {error}")
+        else:
+            errors.append((item, stage_name, error))
+    if use_high_water_mark:
+        # Advance up to (not past) the oldest memo that failed, waits for a retry
+        # or is quarantined, so that later runs select it again
+        failed = {
+            getattr(item, "file_path_original", item) for item, _, _ in result["errors"]
+        }
+        if job_store is not None:
+            failed.update(
+                Path(job["file_path_original"])
+                for job in job_store.pending() + job_store.quarantined()
+            )
+        for datetime_created, file_path in memos_selected:
+            if file_path in failed:
+                break
+            if (
+                state.high_water_mark is None
+                or datetime_created > state.high_water_mark
+            ):
+                state.high_water_mark = datetime_created
+        state.save()
+    if errors and raise_on_errors:
+        item, stage_name, error = errors[0]
+        raise RuntimeError(
+            f"{len(errors)} voice memo(s) failed, first in stage {stage_name}: {item}"
+        ) from error
+    return result
+
+
+def run_worker(run_kwargs, work_queue, batch_size=2, poll_seconds=None):
+    """
+    Process voice memos claimed from a queue shared with other workers, until none are left.
 
-def main():
+    Claims a few memos at a time, so a crashed worker holds up little work.
+    Memos leased by other workers are waited for until they are done or their
+    lease expires and they can be taken over.
+
+    Args:
+        run_kwargs (dict): Keyword arguments for process_voice_memos.
+        work_queue (WorkQueue): The shared queue.
+        batch_size (int): Memos claimed per process_voice_memos run. Defaults to 2.
+        poll_seconds (float, optional): Wait before looking for claimable memos
+            again. Defaults to a third of the lease duration, at most 5 s.
+
+    Returns:
+        dict: Number of memos this worker marked "done" and "failed".
+    """
+    poll_seconds = poll_seconds or min(5.0, work_queue.lease_seconds / 3)
+    counts = {"done": 0, "failed": 0}
+    work_queue.start_heartbeat()
+    try:
+        while True:
+            claimed = work_queue.claim_batch(batch_size)
+            if not claimed:
+                if not work_queue.unfinished():
+                    break
+                # the remaining memos are leased by other workers
+                time.sleep(poll_seconds)
+                continue
+            logger.info(
+                f"{work_queue.worker_id} claimed {[path.name for path in claimed]}"
+            )
+            result = process_voice_memos(
+                **{
+                    **run_kwargs,
+                    "file_paths": claimed,
+                    "max_files": None,
+                    "use_high_water_mark": False,
+                    "raise_on_errors": False,
+                    # another worker took over the memo: its result counts
+                    "persist_if": lambda vm: work_queue.holds(
+                        vm.file_path_original.name
+                    ),
+                }
+            )
+            failed = {
+                getattr(item, "file_path_original", item): error
+                for item, _, error in result["errors"]
+            }
+            for file_path in claimed:
+                if not work_queue.holds(file_path.name):
+                    logger.warning(
+                        f"{work_queue.worker_id} lost the lease of {file_path.name} "
+                        "while processing it, leaving it to the new holder"
+                    )
+                    work_queue.release(file_path.name)
+                    continue
+                if file_path in failed:
+                    work_queue.mark_failed(file_path.name, failed[file_path])
+                    counts["failed"] += 1
+                else:
+                    work_queue.mark_done(file_path.name)
+                    counts["done"] += 1
+    finally:
+        work_queue.close()
+    logger.info(f"{work_queue.worker_id} finished: {counts}")
+    return counts
+
+
+def resume_pending_jobs(job_store, memos_selected):
+    """
+    Add the memos an earlier run left unfinished to the selected memos.
+
+    Args:
+        job_store (JobStore): Per-memo stage checkpoints.
+        memos_selected (list[tuple]): (datetime_created, file_path) of the selected memos.
+
+    Returns:
+        list[tuple]: The selected and the unfinished memos, in recording order.
+    """
+    selected = {file_path for _, file_path in memos_selected}
+    memos = list(memos_selected)
+    for job in job_store.pending():
+        file_path = Path(job["file_path_original"])
+        if file_path in selected or not file_path.exists():
+            continue
+        logger.info(f"Resuming unfinished {job['file_name']} (stage {job['stage']})")
+        memos.append((parse_datetime_from_file_name(file_path.name), file_path))
+    memos.sort()
+    return memos
+
+
+def _file_signature(path):
+    """Return (size, mtime_ns) of a file, or None if it is gone."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def watch_voice_memos(run_kwargs, settle_seconds=5.0, catch_up=False, stop_event=None):
+    """
+    Process voice memos as they arrive, until interrupted.
+
+    Watches the originals directory (inotify on Linux, polling elsewhere) and
+    passes each batch of completely written memos to process_voice_memos, with
+    the same resident ASR model and LLM client. The watcher is started before
+    the catch-up run, so memos arriving while it runs are processed afterwards;
+    reports of memos the catch-up run already processed are ignored unless
+    the files changed since. Failures are logged and never stop the daemon.
+
+    Args:
+        run_kwargs (dict): Keyword arguments for process_voice_memos.
+        settle_seconds (float): Quiet time before a new file counts as complete.
+        catch_up (bool): First process the memos that arrived while not watching.
+            Defaults to False.
+        stop_event (threading.Event, optional): Stops watching when set.
+    """
+    watcher = create_watcher(run_kwargs["path_voice_memos_original"])
+    # signatures of the memos the catch-up run processed, so the watcher's
+    # reports of the same, unchanged files do not process them again
+    caught_up = {}
+    try:
+        if catch_up:
+            try:
+                result = process_voice_memos(**{**run_kwargs, "raise_on_errors": False})
+                caught_up = {
+                    vm.file_path_original.name: _file_signature(vm.file_path_original)
+                    for vm in result["completed"]
+                }
+                if result["errors"]:
+                    logger.error(f"{len(result['errors'])} voice memo(s) failed")
+            except Exception as e:
+                logger.error(f"Processing failed: {e}")
+        logger.info(
+            f"Watching {run_kwargs['path_voice_memos_original']} with {type(watcher).__name__}"
+        )
+        for file_paths in watch_settled_files(
+            watcher, settle_seconds=settle_seconds, stop_event=stop_event
+        ):
+            file_paths = [
+                path
+                for path in file_paths
+                if caught_up.pop(path.name, None) != _file_signature(path)
+            ]
+            if not file_paths:
+                continue
+            logger.info(f"New voice memos: {[path.name for path in file_paths]}")
+            try:
+                process_voice_memos(
+                    **{**run_kwargs, "file_paths": file_paths, "max_files": None}
+                )
+            except Exception as e:
+                # keep the daemon alive; the high-water mark was not advanced past failures
+                logger.error(f"Processing failed: {e}")
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+    finally:
+        watcher.close()
+
+
+def parse_args(argv=None):
+    """
+    Parses command line arguments.
+
+    Args:
+        argv (list[str], optional): Arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Transcribe Apple voice memos to markdown"
+    )
+    parser.add_argument(
+        "--asr-model", default="medium", help="Whisper model name (default: medium)"
+    )
+    parser.add_argument(
+        "--adaptive-asr",
+        action="store_true",
+        help="Transcribe with tiny/base and escalate unreliable segments to --asr-model",
+    )
+    parser.add_argument(
+        "--languages",
+        default="en,de",
+        help="Languages of the memos for adaptive language detection (default: en,de)",
+    )
+    parser.add_argument(
+        "--min-avg-logprob",
+        type=float,
+        default=-0.8,
+        help="Adaptive ASR escalates segments below this avg_logprob (default: -0.8)",
+    )
+    parser.add_argument(
+        "--no-speech-threshold",
+        type=float,
+        default=0.6,
+        help="Adaptive ASR never escalates segments with a higher no_speech_prob (default: 0.6)",
+    )
+    parser.add_argument(
+        "--max-escalated-fraction",
+        type=float,
+        default=0.5,
+        help="Adaptive ASR escalates the whole memo if more of it is unreliable (default: 0.5)",
+    )
+    parser.add_argument(
+        "--asr-processes",
+        type=int,
+        default=1,
+        help="Number of transcription worker processes (default: 1, in-process model)",
+    )
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=None,
+        help="Torch threads per transcription worker (default: cores / processes)",
+    )
+    parser.add_argument(
+        "--transcript-cache-mb",
+        type=float,
+        default=2048.0,
+        help="Size bound of the transcript cache in MB (default: 2048)",
+    )
+    parser.add_argument(
+        "--no-transcript-cache",
+        action="store_true",
+        help="Always transcribe, without reading or filling the transcript cache",
+    )
+    parser.add_argument(
+        "--audio-cache-mb",
+        type=float,
+        default=2048.0,
+        help="Size bound of the decoded-audio cache in MB, 0 to disable (default: 2048)",
+    )
+    parser.add_argument(
+        "--llm-cache-mb",
+        type=float,
+        default=256.0,
+        help="Size bound of the LLM response cache in MB (default: 256)",
+    )
+    parser.add_argument(
+        "--llm-cache-ttl-days",
+        type=float,
+        default=30.0,
+        help="Maximum age of cached LLM responses in days (default: 30)",
+    )
+    parser.add_argument(
+        "--refresh-llm",
+        action="store_true",
+        help="Regenerate summaries and titles instead of using cached LLM responses",
+    )
+    parser.add_argument(
+        "--async-llm",
+        action="store_true",
+        help="Use the pooled asyncio LLM client, with several requests in flight",
+    )
+    parser.add_argument(
+        "--llm-max-in-flight",
+        type=int,
+        default=4,
+        help="Maximum concurrent LLM requests with --async-llm; match OLLAMA_NUM_PARALLEL (default: 4)",
+    )
+    parser.add_argument(
+        "--llm-timeout",
+        type=float,
+        default=120.0,
+        help="Per-request LLM timeout in seconds with --async-llm (default: 120)",
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        default=None,
+        help="Maximum number of voice memos per run (default: all new ones)",
+    )
+    parser.add_argument(
+        "--reprocess-last",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Ignore the high-water mark and reprocess the newest N voice memos",
+    )
+    parser.add_argument(
+        "--max-file-size-mb",
+        type=float,
+        default=2.0,
+        help="Skip voice memos larger than this; 0 for no limit (default: 2)",
+    )
+    parser.add_argument(
+        "--segment-threshold-mb",
+        type=float,
+        default=None,
+        help="Transcribe memos larger than this in silence-separated segments",
+    )
+    parser.add_argument(
+        "--segment-seconds",
+        type=float,
+        default=300.0,
+        help="Maximum segment length for segmented transcription (default: 300)",
+    )
+    parser.add_argument(
+        "--map-reduce-tokens",
+        type=int,
+        default=1500,
+        help="Summarize transcripts longer than this many tokens in chunks; 0 to disable (default: 1500)",
+    )
+    parser.add_argument(
+        "--map-workers",
+        type=int,
+        default=4,
+        help="Chunks of a long transcript summarized concurrently (default: 4)",
+    )
+    parser.add_argument(
+        "--materialize",
+        choices=("auto",) + MATERIALIZE_STRATEGIES,
+        default="auto",
+        help="How processed voice memos are placed, with fallback in the order "
+        "hardlink, reflink, symlink, copy (default: auto)",
+    )
+    parser.add_argument(
+        "--llm-keep-alive",
+        default="30m",
+        help="Preload the LLM when there are memos and keep it loaded this long, "
+        'e.g. "30m"; empty to disable (default: 30m)',
+    )
+    parser.add_argument(
+        "--note-template",
+        choices=sorted(NOTE_TEMPLATES),
+        default="default",
+        help="Template of the markdown notes (default: default)",
+    )
+    parser.add_argument(
+        "--inline-segments",
+        action="store_true",
+        help="Store the transcript segments in the database records instead of "
+        "compressed sidecars in PATH_DB/segments",
+    )
+    parser.add_argument(
+        "--no-search-index",
+        action="store_true",
+        help="Do not add processed memos to the full-text index in PATH_DB/search.sqlite",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Attempts at a processing stage before a memo is quarantined (default: 3)",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=5.0,
+        help="Seconds before a later run retries a failed stage, doubling per retry (default: 5)",
+    )
+    parser.add_argument(
+        "--no-job-state",
+        action="store_true",
+        help="Do not checkpoint stages, resume unfinished memos or quarantine failing ones",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        default=None,
+        help="Prometheus textfile for the timings of each run (default: PATH_DB/voice2md.prom)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="Dump cProfile stats of all processing steps to this file",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running, with models loaded, and process voice memos as they arrive",
+    )
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=5.0,
+        help="In watch mode, quiet time before a new file counts as complete (default: 5)",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Claim voice memos from the queue shared with other workers in "
+        "PATH_VOICE_MEMOS_ORIGINAL until all are processed",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=60.0,
+        help="In worker mode, seconds without heartbeat after which a memo is "
+        "reclaimed from a crashed worker (default: 60)",
+    )
+    parser.add_argument(
+        "--worker-batch",
+        type=int,
+        default=2,
+        help="In worker mode, memos claimed at a time (default: 2)",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="In worker mode, make memos that failed in an earlier run claimable again",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["sqlite", "tinydb"],
+        default="sqlite",
+        help="Database backend in PATH_DB (default: sqlite, migrates db.json once)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # heavy modules (whisper/torch, openai) are imported and models loaded
+    # only once the first memo needs them, so runs with nothing to do stay fast
+    start = time.perf_counter()
+    args = parse_args(argv)
     paths = load_environment()
     setup_directories(paths)
 
-    asr_model = whisper.load_model("medium")
-    llm_client = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
+    asr_model_name = args.asr_model
+    if args.adaptive_asr:
+        # numpy is only needed for adaptive transcription
+        from voice2md.adaptive_asr import AdaptiveASRModel
+
+        if args.asr_processes > 1:
+            logger.warning(
+                "--adaptive-asr uses in-process models, ignoring --asr-processes"
+            )
+            args.asr_processes = 1
+        tiers = ("tiny", "base", args.asr_model)
+        asr_model = AdaptiveASRModel(
+            {name: load_whisper_model(name) for name in tiers},
+            escalation_tier=args.asr_model,
+            languages=args.languages.split(","),
+            min_avg_logprob=args.min_avg_logprob,
+            no_speech_threshold=args.no_speech_threshold,
+            max_escalated_fraction=args.max_escalated_fraction,
+        )
+        asr_model_name = asr_model.cache_name
+    elif args.asr_processes > 1:
+        asr_model = TranscriptionPool(
+            args.asr_model, args.asr_processes, args.torch_threads
+        )
+    else:
+        asr_model = load_whisper_model(args.asr_model)
+    transcript_cache = None
+    if not args.no_transcript_cache:
+        transcript_cache = TranscriptCache(
+            paths["path_db"] / "cache" / "transcripts",
+            max_size_mb=args.transcript_cache_mb,
+        )
+    audio_cache = None
+    if args.audio_cache_mb:
+        audio_cache = AudioCache(
+            paths["path_db"] / "cache" / "audio", max_size_mb=args.audio_cache_mb
+        )
+    if args.async_llm:
+        llm_client = AsyncLLMClient(
+            base_url=f"{OLLAMA_HOST}/v1",
+            max_in_flight=args.llm_max_in_flight,
+            timeout=args.llm_timeout,
+        )
+    else:
+        llm_client = load_openai_client(f"{OLLAMA_HOST}/v1", "ollama")
     llm_model = "llama3.2:3b"
+    llm_cache = LLMCache(
+        paths["path_db"] / "cache" / "llm",
+        max_size_mb=args.llm_cache_mb,
+        ttl_seconds=args.llm_cache_ttl_days * 24 * 3600,
+        refresh=args.refresh_llm,
+    )
+    job_store = None
+    # in worker mode the shared queue tracks the memos instead
+    if not args.no_job_state and not args.worker:
+        job_store = open_job_store(
+            paths["path_db"],
+            max_attempts=args.max_attempts,
+            backoff_seconds=args.retry_backoff,
+        )
 
-    process_voice_memos(
-        paths["path_voice_memos_original"],
-        paths["path_voice_memos_processed"],
-        paths["path_markdown"],
-        paths["path_db"],
-        asr_model,
-        llm_client,
-        llm_model,
+    search_index = None
+    if not args.no_search_index:
+        search_index = open_search_index(
+            paths["path_db"], journal_mode="DELETE" if args.worker else "WAL"
+        )
+
+    run_kwargs = dict(
+        path_voice_memos_original=paths["path_voice_memos_original"],
+        path_voice_memos_processed=paths["path_voice_memos_processed"],
+        path_markdown=paths["path_markdown"],
+        path_db=paths["path_db"],
+        asr_model=asr_model,
+        llm_client=llm_client,
+        llm_model=llm_model,
         overwrite=True,
-        max_file_size_mb=2.0,
-        last_n_files=3,
+        max_file_size_mb=args.max_file_size_mb or None,
+        segment_threshold_mb=args.segment_threshold_mb,
+        segment_seconds=args.segment_seconds,
+        map_reduce_token_budget=args.map_reduce_tokens or None,
+        map_workers=args.map_workers,
+        last_n_files=args.reprocess_last or 3,
+        max_files=args.max_files,
+        use_high_water_mark=args.reprocess_last is None,
+        asr_workers=args.asr_processes,
+        longest_first=args.asr_processes > 1,
+        transcript_cache=transcript_cache,
+        asr_model_name=asr_model_name,
+        llm_cache=llm_cache,
+        audio_cache=audio_cache,
+        metrics_path=args.metrics_file
+        or paths["path_db"]
+        / (f"voice2md-{socket.gethostname()}.prom" if args.worker else "voice2md.prom"),
+        profile_path=args.profile,
+        materialize=args.materialize,
+        note_template=args.note_template,
+        preload_llm=(
+            functools.partial(
+                preload_model, OLLAMA_HOST, llm_model, args.llm_keep_alive
+            )
+            if args.llm_keep_alive
+            else None
+        ),
+        llm_workers=args.llm_max_in_flight if args.async_llm else 1,
+        storage_backend=args.storage,
+        job_store=job_store,
+        segment_store=None if args.inline_segments else SegmentStore(paths["path_db"]),
+        # WAL does not work for a database shared over the network
+        journal_mode="DELETE" if args.worker else "WAL",
+        search_index=search_index,
     )
+    try:
+        if args.worker:
+            work_queue = WorkQueue(
+                paths["path_voice_memos_original"], lease_seconds=args.lease_seconds
+            )
+            if args.retry_failed:
+                logger.info(f"Requeued {work_queue.retry_failed()} failed memo(s)")
+            run_worker(run_kwargs, work_queue, batch_size=args.worker_batch)
+            return
+        if args.watch:
+            watch_voice_memos(
+                run_kwargs, settle_seconds=args.settle_seconds, catch_up=True
+            )
+        else:
+            process_voice_memos(**run_kwargs)
+    finally:
+        if isinstance(llm_client, AsyncLLMClient):
+            llm_client.close()
+        if isinstance(asr_model, TranscriptionPool):
+            asr_model.close()
+        if job_store is not None:
+            job_store.close()
+        if search_index is not None:
+            search_index.close()
+        logger.info(f"Finished in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
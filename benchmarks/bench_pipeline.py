@@ -0,0 +1,359 @@
+"""
+End-to-end benchmark of the voice memo pipeline with stub ASR and LLM backends.
+
+Generates a synthetic corpus, then times the mirror copy, the no-op re-sync,
+the directory scan and the pipeline stages of process_voice_memos, with a
+FakeASRModel in place of Whisper and a StubChatServer in place of Ollama.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --count 50 --output results.json
+"""
+
+import argparse
+import functools
+import json
+import math
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import copy_voice_memos
+from app import process_voice_memos
+from copy_voice_memos import get_voice_memos
+from voice2md.lazy import load_openai_client
+from voice2md.llm_async import AsyncLLMClient
+from voice2md.memo_index import scan_voice_memos
+from voice2md.stubs import FakeASRModel, StubChatServer
+
+
+def make_corpus(directory, count, size_kb=64, start=datetime(2024, 1, 1, 8), seed=0):
+    """
+    Write synthetic voice memos named like Apple Voice Memos exports.
+
+    Args:
+        directory (Path): Target directory, created if missing.
+        count (int): Number of memos.
+        size_kb (float): Size of every memo in KB. Defaults to 64.
+        start (datetime): Recording time of the first memo.
+        seed (int): Seed of the file contents and ids. Defaults to 0.
+
+    Returns:
+        list[Path]: Paths of the memos, oldest first.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for n in range(count):
+        recorded = start + timedelta(minutes=37 * n)
+        memo_id = f"{rng.getrandbits(32):08X}"
+        path = directory / f"{recorded:%Y%m%d %H%M%S}-{memo_id}.m4a"
+        path.write_bytes(rng.randbytes(int(size_kb * 1024)))
+        paths.append(path)
+    return paths
+
+
+SCAN_REPEATS = 20
+
+
+@contextmanager
+def time_per_call(module, name, seconds):
+    """
+    Append the seconds of every call of module.name to a list while in the block.
+
+    Lets the benchmark time single files of the mirror without changing its API.
+
+    Args:
+        module (module): Module defining the function.
+        name (str): Name of the function.
+        seconds (list[float]): List the call times are appended to.
+    """
+    func = getattr(module, name)
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds.append(time.perf_counter() - start)
+
+    setattr(module, name, timed)
+    try:
+        yield
+    finally:
+        setattr(module, name, func)
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(values, p):
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize_timings(values):
+    """Return count, p50, p95 (in ms) and the total seconds of per-memo timings."""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if values else None,
+        "total_seconds": round(sum(values), 4),
+    }
+
+
+def git_revision():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    count=20,
+    size_kb=64,
+    asr_latency=0.0,
+    asr_realtime_factor=0.0,
+    llm_latency=0.0,
+    asr_workers=1,
+    llm_workers=1,
+    async_llm=False,
+    copy_workers=4,
+    work_dir=None,
+):
+    """
+    Run the benchmark once.
+
+    Args:
+        count (int): Number of synthetic memos. Defaults to 20.
+        size_kb (float): Size of every memo in KB. Defaults to 64.
+        asr_latency (float): Seconds per fake transcription. Defaults to 0.
+        asr_realtime_factor (float): Extra fake ASR seconds per audio second. Defaults to 0.
+        llm_latency (float): Seconds per stub LLM request. Defaults to 0.
+        asr_workers (int): Worker threads of the ASR stage. Defaults to 1.
+        llm_workers (int): Worker threads of the LLM stage. Defaults to 1.
+        async_llm (bool): Use the pooled asyncio LLM client. Defaults to False.
+        copy_workers (int): Workers of the mirror copy. Defaults to 4.
+        work_dir (Path, optional): Directory for the corpus and outputs.
+            Defaults to a temporary directory that is removed afterwards.
+
+    Returns:
+        dict: Parameters, memos/second, per-stage timings and peak RSS.
+    """
+    if work_dir is None:
+        with tempfile.TemporaryDirectory(prefix="voice2md-bench-") as tmp:
+            return run_benchmark(
+                count,
+                size_kb,
+                asr_latency,
+                asr_realtime_factor,
+                llm_latency,
+                asr_workers,
+                llm_workers,
+                async_llm,
+                copy_workers,
+                Path(tmp),
+            )
+
+    work_dir = Path(work_dir)
+    source = work_dir / "voice_memos_app"
+    paths = {
+        "path_voice_memos_original": work_dir / "original",
+        "path_voice_memos_processed": work_dir / "processed",
+        "path_markdown": work_dir / "markdown",
+        "path_db": work_dir / "db",
+    }
+    for path in paths.values():
+        path.mkdir(parents=True, exist_ok=True)
+    make_corpus(source, count, size_kb)
+    max_size_mb = size_kb / 1024 + 1
+    stages = {}
+
+    def timed(name, item_seconds, func):
+        """Run func and summarize the seconds it appended to item_seconds."""
+        start = time.perf_counter()
+        func()
+        stages[name] = {
+            **summarize_timings(item_seconds),
+            "wall_seconds": round(time.perf_counter() - start, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+    def mirror():
+        return get_voice_memos(
+            source,
+            paths["path_voice_memos_original"],
+            max_size_mb=max_size_mb,
+            workers=copy_workers,
+        )
+
+    copy_seconds, sync_seconds = [], []
+    with time_per_call(copy_voice_memos, "_sync_file", copy_seconds):
+        timed("copy", copy_seconds, mirror)
+    with time_per_call(copy_voice_memos, "_sync_file", sync_seconds):
+        timed("sync", sync_seconds, mirror)
+    # the scan is one os.scandir pass over all memos, so it is timed as a whole
+    # and repeated; per-memo costs are those times divided by the memo count
+    scan_seconds = []
+
+    def scan():
+        for _ in range(SCAN_REPEATS):
+            start = time.perf_counter()
+            scan_voice_memos(paths["path_voice_memos_original"])
+            scan_seconds.append(time.perf_counter() - start)
+
+    timed("scan", scan_seconds, scan)
+    stages["scan"]["per_memo_p50_ms"] = round(
+        stages["scan"]["p50_ms"] / max(1, count), 4
+    )
+
+    asr_model = FakeASRModel(latency=asr_latency, realtime_factor=asr_realtime_factor)
+    with StubChatServer(latency=llm_latency) as server:
+        if async_llm:
+            llm_client = AsyncLLMClient(
+                base_url=server.base_url, api_key="stub", max_in_flight=llm_workers
+            )
+        else:
+            llm_client = load_openai_client(server.base_url, "stub")
+            # keep the one-off openai import out of the LLM stage timings
+            llm_client.get()
+        start = time.perf_counter()
+        try:
+            result = process_voice_memos(
+                **paths,
+                asr_model=asr_model,
+                llm_client=llm_client,
+                llm_model="stub",
+                max_file_size_mb=None,
+                last_n_files=count,
+                use_high_water_mark=False,
+                asr_workers=asr_workers,
+                llm_workers=llm_workers,
+            )
+        finally:
+            if async_llm:
+                llm_client.close()
+        pipeline_seconds = time.perf_counter() - start
+        llm_requests = server.requests
+
+    stage_names = {
+        "prep": "prep",
+        "asr": "transcribe",
+        "llm": "llm",
+        "persist": "persist",
+    }
+    for pipeline_name, name in stage_names.items():
+        stages[name] = summarize_timings(result["timings"][pipeline_name])
+    stages["pipeline"] = {
+        "total_seconds": round(pipeline_seconds, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    return {
+        "revision": git_revision(),
+        "datetime": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "count": count,
+            "size_kb": size_kb,
+            "asr_latency": asr_latency,
+            "asr_realtime_factor": asr_realtime_factor,
+            "llm_latency": llm_latency,
+            "asr_workers": asr_workers,
+            "llm_workers": llm_workers,
+            "async_llm": async_llm,
+            "copy_workers": copy_workers,
+        },
+        "memos_processed": len(result["completed"]),
+        "memos_per_second": round(len(result["completed"]) / pipeline_seconds, 3),
+        "asr_calls": asr_model.calls,
+        "llm_requests": llm_requests,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the voice memo pipeline with stub ASR and LLM backends"
+    )
+    parser.add_argument(
+        "--count", type=int, default=20, help="Number of memos (default: 20)"
+    )
+    parser.add_argument(
+        "--size-kb", type=float, default=64, help="Memo size in KB (default: 64)"
+    )
+    parser.add_argument(
+        "--asr-latency", type=float, default=0.0, help="Seconds per transcription"
+    )
+    parser.add_argument(
+        "--asr-realtime-factor",
+        type=float,
+        default=0.0,
+        help="Extra transcription seconds per audio second",
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.0, help="Seconds per LLM request"
+    )
+    parser.add_argument("--asr-workers", type=int, default=1, help="ASR stage threads")
+    parser.add_argument("--llm-workers", type=int, default=1, help="LLM stage threads")
+    parser.add_argument(
+        "--async-llm", action="store_true", help="Use the asyncio LLM client"
+    )
+    parser.add_argument(
+        "--copy-workers", type=int, default=4, help="Mirror copy workers"
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        default=None,
+        help="Keep the corpus and outputs here (default: temporary directory)",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, help="Write the JSON result here"
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        count=args.count,
+        size_kb=args.size_kb,
+        asr_latency=args.asr_latency,
+        asr_realtime_factor=args.asr_realtime_factor,
+        llm_latency=args.llm_latency,
+        asr_workers=args.asr_workers,
+        llm_workers=args.llm_workers,
+        async_llm=args.async_llm,
+        copy_workers=args.copy_workers,
+        work_dir=args.work_dir,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
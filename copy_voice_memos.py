@@ -1,10 +1,13 @@
 import os
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 from voice2md.logger_config import setup_logger
+from voice2md.mirror import ByteBudget, copy_file_atomic
+from voice2md.sync_manifest import SyncManifest, file_digest, stat_signature
 
 logger = setup_logger(__name__)
 
@@ -15,80 +18,179 @@ def main():
     MAX_FILE_SIZE_MIRROR = (
         100.0  # in MB, this is roughly the size of a 3 hour audio file
     )
+    MIRROR_WORKERS = 4  # concurrent copies, helps most on network/FUSE destinations
+    MAX_INFLIGHT_MB = 256.0  # cap on bytes being hashed or copied at once
 
     path_voice_memos_apple = Path(os.getenv("PATH_VOICE_MEMOS_APPLE"))
     path_voice_memos_original = Path(os.getenv("PATH_VOICE_MEMOS_ORIGINAL"))
     path_voice_memos_original.mkdir(parents=True, exist_ok=True)
 
     get_voice_memos(
-        path_voice_memos_apple, path_voice_memos_original, "m4a", MAX_FILE_SIZE_MIRROR
+        path_voice_memos_apple,
+        path_voice_memos_original,
+        "m4a",
+        MAX_FILE_SIZE_MIRROR,
+        workers=MIRROR_WORKERS,
+        max_inflight_mb=MAX_INFLIGHT_MB,
     )
 
 
+def _sync_file(file_path, source_stat, dest_file_path, manifest, manifest_lock):
+    """Bring one destination file in line with its source.
+
+    Args:
+        file_path: Source file path.
+        source_stat: Stat result of the source file.
+        dest_file_path: Destination file path.
+        manifest: Sync manifest of the destination directory.
+        manifest_lock: Lock guarding manifest updates.
+
+    Returns:
+        tuple: ("copied" or "unchanged", hashed bytes, copied bytes).
+    """
+    hashed_bytes = 0
+    digest = None
+    if dest_file_path.exists():
+        dest_stat = dest_file_path.stat()
+        if manifest.is_unchanged(file_path.name, source_stat, dest_stat):
+            return "unchanged", hashed_bytes, 0
+
+        # Metadata differs from the manifest: compare content hashes,
+        # reusing the recorded digest for whichever side did not change
+        entry = manifest.get(file_path.name)
+        if entry and entry["digest"] and entry["source"] == stat_signature(source_stat):
+            digest = entry["digest"]
+        else:
+            digest = file_digest(file_path)
+            hashed_bytes += source_stat.st_size
+        if (
+            entry
+            and entry["digest"]
+            and entry["destination"] == stat_signature(dest_stat)
+        ):
+            dest_digest = entry["digest"]
+        else:
+            dest_digest = file_digest(dest_file_path)
+            hashed_bytes += dest_stat.st_size
+
+        if digest == dest_digest:
+            with manifest_lock:
+                manifest.record(file_path.name, source_stat, dest_stat, digest)
+            return "unchanged", hashed_bytes, 0
+
+    copy_file_atomic(file_path, dest_file_path)
+    with manifest_lock:
+        manifest.record(file_path.name, source_stat, dest_file_path.stat(), digest)
+    return "copied", hashed_bytes, source_stat.st_size
+
+
 def get_voice_memos(
     source_dir: Path,
     destination_dir: Path,
     suffix: str = "m4a",
     max_size_mb: float = 100.0,
+    workers: int = 1,
+    max_inflight_mb: float = 256.0,
 ) -> dict:
     """Copies voice memo files from source to destination directory, filtering by maximum size and avoiding duplicates.
 
+    A sync manifest in the destination directory records size, mtime and inode of
+    every mirrored file, so unchanged files are skipped from stat() alone. Files are
+    only hashed (streamed in chunks) when their metadata differs from the manifest.
+
+    Files are checked and copied on a thread pool; the bytes being hashed or copied
+    at any time are capped by max_inflight_mb. Copies go through a temporary file
+    and a rename, so a partial copy never appears under the final name. Errors are
+    collected per file instead of aborting the run.
+
     Args:
         source_dir: Source directory path.
         destination_dir: Destination directory path.
         suffix: File extension to copy. Defaults to "m4a".
         max_size_mb: Maximum file size in megabytes to copy. Defaults to 100.0.
+        workers: Number of concurrent copy workers. Defaults to 1.
+        max_inflight_mb: Maximum megabytes hashed or copied concurrently. Defaults to 256.0.
 
     Returns:
-        dict: Operation summary.
+        dict: Operation summary, including the number of bytes hashed and copied
+            and the errors of failed files.
     """
-    import hashlib
-
     destination_dir.mkdir(parents=True, exist_ok=True)
+    manifest = SyncManifest.for_directory(destination_dir)
+    manifest_lock = threading.Lock()
+    budget = ByteBudget(int(max_inflight_mb * 1024 * 1024))
     files = list(source_dir.glob(f"*.{suffix}"))
     copied_files = []
     skipped_files = []
     unchanged_files = []
+    failed_files = {}
+    hashed_bytes = 0
+    copied_bytes = 0
+
+    def sync_within_budget(file_path, source_stat):
+        budget.acquire(source_stat.st_size)
+        try:
+            return _sync_file(
+                file_path,
+                source_stat,
+                destination_dir / file_path.name,
+                manifest,
+                manifest_lock,
+            )
+        finally:
+            budget.release(source_stat.st_size)
 
     logger.info(
         f"Copying files smaller than {max_size_mb} MB from {source_dir} to {destination_dir}"
     )
-    for file_path in files:
-        if file_path.is_file():
-            file_size_mb = file_path.stat().st_size / (1024 * 1024)
-            if file_size_mb < max_size_mb:
-                dest_file_path = destination_dir / file_path.name
-                if dest_file_path.exists():
-                    # Compare file hashes
-                    with open(file_path, "rb") as f:
-                        source_hash = hashlib.md5(f.read()).hexdigest()
-                    with open(dest_file_path, "rb") as f:
-                        dest_hash = hashlib.md5(f.read()).hexdigest()
-
-                    if source_hash == dest_hash:
-                        unchanged_files.append(file_path.name)
-                        logger.info(
-                            f"Skipped unchanged file {file_path} ({file_size_mb:.2f} MB)"
-                        )
-                        continue
-
-                shutil.copy2(file_path, destination_dir)
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for file_path in files:
+            if file_path.is_file():
+                source_stat = file_path.stat()
+                file_size_mb = source_stat.st_size / (1024 * 1024)
+                if file_size_mb < max_size_mb:
+                    future = executor.submit(sync_within_budget, file_path, source_stat)
+                    futures.append((file_path, file_size_mb, future))
+                else:
+                    skipped_files.append(file_path.name)
+                    logger.info(
+                        f"Skipped file {file_path} ({file_size_mb:.2f} MB) due to size"
+                    )
+
+        for file_path, file_size_mb, future in futures:
+            try:
+                status, n_hashed, n_copied = future.result()
+            except Exception as e:
+                failed_files[file_path.name] = str(e)
+                logger.error(f"Failed to copy file {file_path}: {e}")
+                continue
+            hashed_bytes += n_hashed
+            copied_bytes += n_copied
+            if status == "copied":
                 copied_files.append(file_path.name)
                 logger.info(f"Copied file {file_path} ({file_size_mb:.2f} MB)")
             else:
-                skipped_files.append(file_path.name)
+                unchanged_files.append(file_path.name)
                 logger.info(
-                    f"Skipped file {file_path} ({file_size_mb:.2f} MB) due to size"
+                    f"Skipped unchanged file {file_path} ({file_size_mb:.2f} MB)"
                 )
 
+    manifest.save()
+
     return {
         "total_files": len(files),
         "copied_files": len(copied_files),
         "skipped_files": len(skipped_files),
         "unchanged_files": len(unchanged_files),
+        "failed_files": len(failed_files),
         "copied_file_names": copied_files,
         "skipped_file_names": skipped_files,
         "unchanged_file_names": unchanged_files,
+        "failed_file_names": list(failed_files),
+        "errors": failed_files,
+        "hashed_bytes": hashed_bytes,
+        "copied_bytes": copied_bytes,
     }
 
 
@@ -0,0 +1,33 @@
+import json
+
+from openai.types.chat import ChatCompletion
+
+
+class SummaryChatClient:
+    """
+    Fake OpenAI client answering every chat completion with summary and title.
+    """
+
+    supports_streaming = False
+
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        content = json.dumps({"tldr_summary": "A summary.", "title": "A title"})
+        return ChatCompletion.model_validate(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+            }
+        )
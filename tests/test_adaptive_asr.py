@@ -0,0 +1,125 @@
+import numpy as np
+
+from voice2md.adaptive_asr import AdaptiveASRModel
+from voice2md.segmenter import SAMPLE_RATE
+
+
+class TierModel:
+    """
+    Fake Whisper model returning one-second segments with a fixed avg_logprob.
+    """
+
+    def __init__(self, name, avg_logprob, bad_seconds=()):
+        self.name = name
+        self.avg_logprob = avg_logprob
+        self.bad_seconds = set(bad_seconds)
+        self.calls = []
+
+    def transcribe(self, audio, clip_timestamps=None, **options):
+        self.calls.append({"clip_timestamps": clip_timestamps, **options})
+        duration = len(audio) / SAMPLE_RATE
+        seconds = range(int(duration))
+        if clip_timestamps is not None:
+            starts, ends = clip_timestamps[::2], clip_timestamps[1::2]
+            seconds = [
+                s for s in seconds if any(b <= s < e for b, e in zip(starts, ends))
+            ]
+        segments = [
+            {
+                "id": i,
+                "start": float(s),
+                "end": float(s + 1),
+                "text": f" {self.name}{s}",
+                "avg_logprob": -2.0 if s in self.bad_seconds else self.avg_logprob,
+                "no_speech_prob": 0.1,
+            }
+            for i, s in enumerate(seconds)
+        ]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": options.get("language"),
+        }
+
+
+def make_model(base_bad_seconds=()):
+    models = {
+        "tiny": TierModel("tiny", -0.2),
+        "base": TierModel("base", -0.3, base_bad_seconds),
+        "medium": TierModel("medium", -0.1),
+    }
+    detected = []
+
+    def detect(model, audio, languages):
+        detected.append((model.name, len(audio), languages))
+        return "de"
+
+    return AdaptiveASRModel(models, short_seconds=10, detect_language=detect), detected
+
+
+def test_short_memo_uses_tiny_with_detected_language():
+    """
+    Test that a short memo is transcribed by the short tier in the detected language.
+    """
+    model, detected = make_model()
+
+    transcript = model.transcribe(np.zeros(5 * SAMPLE_RATE, dtype=np.float32))
+
+    assert detected == [("tiny", 5 * SAMPLE_RATE, ("en", "de"))]
+    assert transcript["asr"]["tiers"] == ["tiny"]
+    assert transcript["language"] == "de"
+    assert model.models["tiny"].calls[0]["language"] == "de"
+    assert model.models["medium"].calls == []
+
+
+def test_unreliable_segments_are_escalated_and_spliced():
+    """
+    Test that only unreliable segments are re-transcribed by the escalation tier.
+    """
+    model, detected = make_model(base_bad_seconds={3, 4, 9})
+    audio = np.zeros(40 * SAMPLE_RATE, dtype=np.float32)
+
+    transcript = model.transcribe(audio, language="en")
+
+    assert detected == []
+    assert transcript["asr"]["tiers"] == ["base", "medium"]
+    assert model.models["medium"].calls[0]["clip_timestamps"] == [3.0, 5.0, 9.0, 10.0]
+    assert [s["start"] for s in transcript["segments"]] == [float(s) for s in range(40)]
+    assert [s["id"] for s in transcript["segments"]] == list(range(40))
+    assert " medium3 medium4 base5" in transcript["text"]
+    assert transcript["asr"]["escalated_seconds"] == 3.0
+
+
+def test_mostly_unreliable_memo_is_escalated_whole():
+    """
+    Test that a memo with mostly unreliable audio is transcribed again as a whole.
+    """
+    model, _ = make_model(base_bad_seconds=set(range(30)))
+
+    transcript = model.transcribe(np.zeros(40 * SAMPLE_RATE, dtype=np.float32))
+
+    assert model.models["medium"].calls[0]["clip_timestamps"] is None
+    assert transcript["text"].startswith(" medium0 medium1")
+    assert transcript["asr"]["escalated_seconds"] == 40.0
+
+
+def test_cache_name_covers_every_setting():
+    """
+    Test that transcripts made with different adaptive settings get different
+    transcript cache keys.
+    """
+    models = {name: None for name in ("tiny", "base", "medium", "large")}
+    default = AdaptiveASRModel(models)
+    variants = [
+        AdaptiveASRModel(models, escalation_tier="large"),
+        AdaptiveASRModel(models, languages=("de",)),
+        AdaptiveASRModel(models, short_seconds=20.0),
+        AdaptiveASRModel(models, min_avg_logprob=-1.0),
+        AdaptiveASRModel(models, no_speech_threshold=0.5),
+        AdaptiveASRModel(models, max_escalated_fraction=0.3),
+    ]
+
+    names = {model.cache_name for model in variants}
+    assert len(names) == len(variants)
+    assert default.cache_name not in names
+    assert default.cache_name == AdaptiveASRModel(models).cache_name
@@ -0,0 +1,138 @@
+import functools
+import os
+import sys
+import types
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import process_voice_memos
+from benchmarks.bench_pipeline import make_corpus
+from tests.conftest import SummaryChatClient
+from voice2md.asr_pool import TranscriptionPool, load_pinned_whisper_model
+from voice2md.stubs import FakeASRModel
+
+
+class StubWhisperModel(FakeASRModel):
+    """
+    FakeASRModel that reports the worker it ran in, fails on "broken" files and
+    kills its process on "crash" files.
+    """
+
+    def __init__(self, log_path=None):
+        super().__init__()
+        self.log_path = log_path
+
+    def transcribe(self, audio, **options):
+        name = os.path.basename(str(audio))
+        if "broken" in name:
+            raise ValueError(f"cannot decode {name}")
+        if "crash" in name:
+            os._exit(1)
+        if self.log_path is not None:
+            with open(self.log_path, "a") as f:
+                f.write(f"{name}\n")
+        transcript = super().transcribe(audio, **options)
+        transcript["pid"] = os.getpid()
+        transcript["torch_threads"] = sys.modules["torch"].get_num_threads()
+        return transcript
+
+
+def load_stub_model(model_name, torch_threads, log_path=None):
+    """
+    Load a StubWhisperModel through load_pinned_whisper_model, with stand-ins
+    for the torch and whisper modules of the worker process.
+    """
+    torch = types.ModuleType("torch")
+    torch.threads = None
+    torch.set_num_threads = lambda n: setattr(torch, "threads", n)
+    torch.get_num_threads = lambda: torch.threads
+    whisper = types.ModuleType("whisper")
+    whisper.load_model = lambda name: StubWhisperModel(log_path)
+    sys.modules.update(torch=torch, whisper=whisper)
+    return load_pinned_whisper_model(model_name, torch_threads)
+
+
+def test_transcription_pool_pins_torch_threads_per_worker(tmp_path):
+    """
+    Test that every worker process loads the model with its share of the torch threads.
+    """
+    audio = tmp_path / "memo.m4a"
+    audio.write_bytes(b"0" * 4096)
+    with TranscriptionPool(
+        "stub", processes=2, torch_threads=3, load_model=load_stub_model
+    ) as pool:
+        transcript = pool.transcribe(str(audio))
+
+    assert transcript["torch_threads"] == 3
+    assert transcript["pid"] != os.getpid()
+    assert transcript["text"] == FakeASRModel().transcribe(str(audio))["text"]
+
+
+def test_transcription_pool_raises_worker_errors_in_caller(tmp_path):
+    """
+    Test that an exception in a worker is raised by transcribe and the pool
+    keeps working.
+    """
+    broken = tmp_path / "broken.m4a"
+    fine = tmp_path / "fine.m4a"
+    for path in (broken, fine):
+        path.write_bytes(b"0" * 4096)
+    with TranscriptionPool("stub", processes=1, load_model=load_stub_model) as pool:
+        with pytest.raises(ValueError, match="cannot decode broken.m4a"):
+            pool.transcribe(str(broken))
+        assert pool.transcribe(str(fine))["text"]
+
+
+def test_transcription_pool_restarts_after_a_worker_died(tmp_path):
+    """
+    Test that a call whose worker process died raises instead of hanging, and
+    the next call runs on a new pool.
+    """
+    crash = tmp_path / "crash.m4a"
+    fine = tmp_path / "fine.m4a"
+    for path in (crash, fine):
+        path.write_bytes(b"0" * 4096)
+    with TranscriptionPool("stub", processes=1, load_model=load_stub_model) as pool:
+        with pytest.raises(BrokenProcessPool):
+            pool.transcribe(str(crash))
+        assert pool.transcribe(str(fine))["text"]
+
+
+def test_process_voice_memos_feeds_pool_longest_first(tmp_path):
+    """
+    Test that the memos reach the pool's workers largest file first.
+    """
+    paths = {
+        name: tmp_path / name for name in ("original", "processed", "markdown", "db")
+    }
+    for path in paths.values():
+        path.mkdir()
+    memos = make_corpus(paths["original"], 4, size_kb=4)
+    for n, memo in enumerate(memos):
+        memo.write_bytes(b"0" * 1024 * (1 + (n * 3) % 4))
+    log_path = tmp_path / "asr.log"
+
+    with TranscriptionPool(
+        "stub",
+        processes=1,
+        load_model=functools.partial(load_stub_model, log_path=log_path),
+    ) as pool:
+        result = process_voice_memos(
+            path_voice_memos_original=paths["original"],
+            path_voice_memos_processed=paths["processed"],
+            path_markdown=paths["markdown"],
+            path_db=paths["db"],
+            asr_model=pool,
+            llm_client=SummaryChatClient(),
+            llm_model="stub",
+            max_file_size_mb=None,
+            longest_first=True,
+        )
+
+    assert len(result["completed"]) == 4
+    transcribed = log_path.read_text().splitlines()
+    sizes = {memo.stem: memo.stat().st_size for memo in memos}
+    assert [sizes[os.path.splitext(name)[0]] for name in transcribed] == sorted(
+        sizes.values(), reverse=True
+    )
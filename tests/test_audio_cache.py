@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import voice2md.segmenter
+from voice2md.audio_cache import AudioCache
+from voice2md.lazy import LazyModel
+from voice2md.segmenter import SAMPLE_RATE
+
+
+def test_audio_cache_decodes_once_and_memory_maps(tmp_path, monkeypatch):
+    """
+    Test that an audio file is decoded once and later loads are memory-mapped copies.
+    """
+    decoded = []
+    waveform = np.linspace(-1, 1, 3 * SAMPLE_RATE, dtype=np.float32)
+
+    def fake_stream_audio(path):
+        decoded.append(path)
+        yield waveform[:SAMPLE_RATE]
+        yield waveform[SAMPLE_RATE:]
+
+    monkeypatch.setattr(voice2md.segmenter, "stream_audio", fake_stream_audio)
+    audio_path = tmp_path / "20240101 120000-A.m4a"
+    audio_path.write_bytes(b"audio")
+    cache = AudioCache(tmp_path / "cache", max_size_mb=10)
+
+    first = cache.load(audio_path)
+    second = cache.load(audio_path)
+
+    assert len(decoded) == 1
+    assert isinstance(second, np.memmap)
+    assert second.dtype == np.float32
+    np.testing.assert_array_equal(first, waveform)
+    np.testing.assert_array_equal(second, waveform)
+
+    class PoolLike:
+        accepts_npy_paths = True
+
+    assert cache.audio_for(PoolLike(), audio_path).endswith(".npy")
+    assert cache.stats()["hits"] == 2
+
+
+def test_audio_cache_keeps_an_entry_larger_than_its_bound(tmp_path, monkeypatch):
+    """
+    Test that a waveform larger than the cache bound can still be loaded, writably,
+    and is evicted once the next waveform is added.
+    """
+    waveforms = {
+        "a": np.ones(SAMPLE_RATE, dtype=np.float32),
+        "b": np.zeros(SAMPLE_RATE, dtype=np.float32),
+    }
+    monkeypatch.setattr(
+        voice2md.segmenter, "stream_audio", lambda path: iter([waveforms[path.stem]])
+    )
+    cache = AudioCache(tmp_path / "cache", max_size_mb=0.01)
+    paths = {}
+    for name in waveforms:
+        paths[name] = tmp_path / f"{name}.m4a"
+        paths[name].write_bytes(name.encode())
+
+    first = cache.load(paths["a"])
+
+    np.testing.assert_array_equal(first, waveforms["a"])
+    # copy-on-write, so torch.from_numpy does not warn about a read-only array
+    assert first.flags.writeable
+    first[0] = 2.0
+    np.testing.assert_array_equal(cache.load(paths["a"]), waveforms["a"])
+
+    np.testing.assert_array_equal(cache.load(paths["b"]), waveforms["b"])
+    assert cache.stats()["entries"] == 1
+
+
+def test_audio_for_does_not_load_a_lazy_model(tmp_path, monkeypatch):
+    """
+    Test that choosing the audio form for a LazyModel does not load the model.
+    """
+    monkeypatch.setattr(
+        voice2md.segmenter,
+        "stream_audio",
+        lambda path: iter([np.zeros(SAMPLE_RATE, dtype=np.float32)]),
+    )
+    audio_path = tmp_path / "memo.m4a"
+    audio_path.write_bytes(b"audio")
+    model = LazyModel(lambda: pytest.fail("model loaded"), "whisper")
+
+    audio = AudioCache(tmp_path / "cache").audio_for(model, audio_path)
+
+    assert isinstance(audio, np.memmap)
+    assert not model.loaded
@@ -0,0 +1,29 @@
+from benchmarks.bench_pipeline import make_corpus, run_benchmark
+from voice2md.voice_memo import parse_datetime_from_file_name
+
+
+def test_make_corpus_names_memos_like_voice_memos(tmp_path):
+    """
+    Test that synthetic memos have parseable names, the requested size and distinct times.
+    """
+    paths = make_corpus(tmp_path, 5, size_kb=2)
+
+    assert len({parse_datetime_from_file_name(path.name) for path in paths}) == 5
+    assert all(path.stat().st_size == 2048 for path in paths)
+
+
+def test_run_benchmark_reports_all_stages(tmp_path):
+    """
+    Test that a small benchmark processes every memo and reports every stage.
+    """
+    report = run_benchmark(count=4, size_kb=4, work_dir=tmp_path)
+
+    assert report["memos_processed"] == 4
+    assert report["llm_requests"] == 4
+    assert report["memos_per_second"] > 0
+    for stage in ["copy", "sync", "scan", "prep", "transcribe", "llm", "persist"]:
+        assert stage in report["stages"]
+    for stage in ["copy", "sync", "transcribe"]:
+        assert report["stages"][stage]["count"] == 4
+        assert report["stages"][stage]["p50_ms"] <= report["stages"][stage]["p95_ms"]
+    assert report["stages"]["scan"]["count"] > 1
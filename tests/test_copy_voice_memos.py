@@ -78,3 +78,82 @@ def test_get_voice_memos_empty_source(temp_dirs):
     assert result["copied_files"] == 0
     assert result["skipped_files"] == 0
     assert result["unchanged_files"] == 0
+
+def test_get_voice_memos_manifest_skips_hashing(temp_dirs):
+    """
+    Test that a second sync skips unchanged files without hashing them.
+    """
+    source_dir, destination_dir = temp_dirs
+
+    create_test_file(source_dir / "memo.m4a", 0.1, "test content")
+
+    first = get_voice_memos(source_dir, destination_dir, "m4a", 100.0)
+    assert first["copied_files"] == 1
+    assert first["copied_bytes"] == (source_dir / "memo.m4a").stat().st_size
+
+    second = get_voice_memos(source_dir, destination_dir, "m4a", 100.0)
+    assert second["copied_files"] == 0
+    assert second["unchanged_files"] == 1
+    assert second["hashed_bytes"] == 0
+    assert second["copied_bytes"] == 0
+
+def test_get_voice_memos_recopies_modified_file(temp_dirs):
+    """
+    Test that a modified source file is detected and copied again.
+    """
+    source_dir, destination_dir = temp_dirs
+
+    create_test_file(source_dir / "memo.m4a", 0.1, "original")
+    get_voice_memos(source_dir, destination_dir, "m4a", 100.0)
+
+    create_test_file(source_dir / "memo.m4a", 0.1, "modified")
+    result = get_voice_memos(source_dir, destination_dir, "m4a", 100.0)
+
+    assert result["copied_files"] == 1
+    assert result["hashed_bytes"] > 0
+    assert (destination_dir / "memo.m4a").read_bytes().endswith(b"modified")
+
+def test_get_voice_memos_parallel(temp_dirs):
+    """
+    Test the get_voice_memos function with several workers and a small in-flight budget.
+    """
+    source_dir, destination_dir = temp_dirs
+
+    for i in range(8):
+        create_test_file(source_dir / f"memo_{i}.m4a", 0.5, f"memo {i}")
+
+    result = get_voice_memos(
+        source_dir, destination_dir, "m4a", 100.0, workers=4, max_inflight_mb=1.0
+    )
+
+    assert result["copied_files"] == 8
+    assert result["failed_files"] == 0
+    for i in range(8):
+        assert (destination_dir / f"memo_{i}.m4a").read_bytes() == (
+            source_dir / f"memo_{i}.m4a"
+        ).read_bytes()
+    assert not list(destination_dir.glob("*.part"))
+
+def test_get_voice_memos_collects_errors(temp_dirs, monkeypatch):
+    """
+    Test that a failing copy is reported without aborting the other files.
+    """
+    import copy_voice_memos
+
+    source_dir, destination_dir = temp_dirs
+    create_test_file(source_dir / "good.m4a", 0.1)
+    create_test_file(source_dir / "bad.m4a", 0.1)
+
+    original_copy = copy_voice_memos.copy_file_atomic
+
+    def failing_copy(source_path, dest_path):
+        if source_path.name == "bad.m4a":
+            raise OSError("disk full")
+        original_copy(source_path, dest_path)
+
+    monkeypatch.setattr(copy_voice_memos, "copy_file_atomic", failing_copy)
+    result = get_voice_memos(source_dir, destination_dir, "m4a", 100.0, workers=2)
+
+    assert result["copied_file_names"] == ["good.m4a"]
+    assert result["failed_file_names"] == ["bad.m4a"]
+    assert "disk full" in result["errors"]["bad.m4a"]
@@ -0,0 +1,264 @@
+import json
+import time
+
+import httpx
+import openai
+import pytest
+from openai.types.chat import ChatCompletion
+
+from app import process_voice_memos
+from benchmarks.bench_pipeline import make_corpus
+from voice2md.job_state import (
+    JobStore,
+    QuarantinedError,
+    RetryLaterError,
+    open_job_store,
+)
+from voice2md.memo_index import ProcessingState
+from voice2md.prompts import system_prompt
+from voice2md.stubs import FakeASRModel
+
+
+class FlakyChatClient:
+    """
+    Fake OpenAI client that raises error while it is set, else answers summary and title.
+    """
+
+    supports_streaming = False
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def reply(self, messages):
+        return json.dumps({"tldr_summary": "A summary.", "title": "A title"})
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        content = self.reply(messages)
+        return ChatCompletion.model_validate(
+            {
+                "id": f"chatcmpl-{self.calls}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+            }
+        )
+
+
+class TitleFailingChatClient(FlakyChatClient):
+    """
+    Fake OpenAI client whose summaries succeed but whose title requests fail.
+    """
+
+    def reply(self, messages):
+        system = messages[0]["content"]
+        if system == system_prompt("title"):
+            raise ValueError("title request rejected")
+        if system == system_prompt("summary_and_title"):
+            return "not the requested format"
+        return "A summary."
+
+
+def test_job_store_retries_and_checkpoints(tmp_path):
+    """
+    Test that a failing stage is left for a later run after a backoff, and its
+    artifacts are checkpointed once it succeeds.
+    """
+    jobs = JobStore(tmp_path / "jobs.sqlite", max_attempts=3, backoff_seconds=60)
+    jobs.begin("memo", tmp_path / "memo.m4a")
+    outcomes = [ValueError("transient"), "transcript"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert jobs.run("memo", "copied", lambda: None) is None
+    start = time.time()
+    with pytest.raises(RetryLaterError):
+        jobs.run("memo", "transcribed", flaky)
+    # the failure does not wait for the backoff, it schedules the retry
+    assert time.time() - start < 1
+    assert jobs.get("memo")["retry_after"] >= start + 60
+    assert jobs.get("memo")["attempts"] == 1
+    assert [job["file_name"] for job in jobs.pending()] == ["memo"]
+
+    result = jobs.run(
+        "memo", "transcribed", flaky, lambda: {"transcript": {"text": "hi"}}
+    )
+
+    job = jobs.get("memo")
+    assert result == "transcript"
+    assert job["stage"] == "transcribed"
+    assert job["attempts"] == 0 and job["retry_after"] is None
+    assert job["artifacts"]["transcript"] == {"text": "hi"}
+    assert jobs.reached("memo", "copied") and not jobs.reached("memo", "titled")
+
+
+def test_job_store_quarantines_poison_memo(tmp_path):
+    """
+    Test that a memo is quarantined after max_attempts failures and can be requeued.
+    """
+    jobs = JobStore(tmp_path / "jobs.sqlite", max_attempts=2, backoff_seconds=0)
+    jobs.begin("memo", tmp_path / "memo.m4a")
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("corrupt audio")
+
+    with pytest.raises(RetryLaterError):
+        jobs.run("memo", "copied", broken)
+    with pytest.raises(QuarantinedError):
+        jobs.run("memo", "copied", broken)
+    with pytest.raises(QuarantinedError):
+        jobs.run("memo", "copied", broken)
+
+    assert len(calls) == 2
+    assert [job["file_name"] for job in jobs.quarantined()] == ["memo"]
+    assert "corrupt audio" in jobs.get("memo")["last_error"]
+    assert jobs.pending() == []
+
+    assert jobs.requeue("memo")
+    assert [job["file_name"] for job in jobs.pending()] == ["memo"]
+
+
+def test_job_store_does_not_count_unavailable_services(tmp_path):
+    """
+    Test that failures because a service is down leave the memo for the next run
+    without counting towards quarantine.
+    """
+    jobs = JobStore(tmp_path / "jobs.sqlite", max_attempts=2, backoff_seconds=60)
+    jobs.begin("memo", tmp_path / "memo.m4a")
+
+    def unreachable():
+        raise openai.APIConnectionError(request=httpx.Request("POST", "http://llm"))
+
+    for _ in range(3):
+        with pytest.raises(RetryLaterError):
+            jobs.run("memo", "copied", unreachable)
+
+    job = jobs.get("memo")
+    assert not job["quarantined"]
+    assert job["attempts"] == 0 and job["retry_after"] is None
+    assert "APIConnectionError" in job["last_error"]
+    assert jobs.run("memo", "copied", lambda: "copied") == "copied"
+
+
+def test_job_store_counts_attempts_interrupted_by_a_crash(tmp_path):
+    """
+    Test that attempts that never returned (the process died) count towards quarantine.
+    """
+    path = tmp_path / "jobs.sqlite"
+    for _ in range(2):
+        jobs = JobStore(path, max_attempts=2, backoff_seconds=0)
+        jobs.begin("memo", tmp_path / "memo.m4a")
+        # simulate a crash in the middle of the stage
+        jobs._start_attempt("memo")
+        jobs.close()
+
+    with JobStore(path, max_attempts=2, backoff_seconds=0) as jobs:
+        with pytest.raises(QuarantinedError):
+            jobs.run("memo", "copied", lambda: None)
+        assert jobs.get("memo")["quarantined"]
+
+
+def corpus_run_kwargs(tmp_path, llm_client, asr_model):
+    paths = {
+        name: tmp_path / name for name in ("original", "processed", "markdown", "db")
+    }
+    for path in paths.values():
+        path.mkdir()
+    make_corpus(paths["original"], 3, size_kb=4)
+    return dict(
+        path_voice_memos_original=paths["original"],
+        path_voice_memos_processed=paths["processed"],
+        path_markdown=paths["markdown"],
+        path_db=paths["db"],
+        asr_model=asr_model,
+        llm_client=llm_client,
+        llm_model="stub",
+        max_file_size_mb=None,
+    )
+
+
+def test_process_voice_memos_resumes_at_first_incomplete_stage(tmp_path):
+    """
+    Test that memos whose LLM stage failed because the LLM server is down are
+    neither quarantined nor passed by the high-water mark, and that the next run
+    resumes them after the transcription stage.
+    """
+    asr_model = FakeASRModel()
+    llm_client = FlakyChatClient(error=ConnectionError("LLM server is down"))
+    run_kwargs = corpus_run_kwargs(tmp_path, llm_client, asr_model)
+
+    with open_job_store(run_kwargs["path_db"], max_attempts=2) as jobs:
+        for _ in range(3):
+            result = process_voice_memos(**run_kwargs, job_store=jobs)
+
+            assert result["completed"] == []
+            assert jobs.quarantined() == []
+            pending = jobs.pending()
+            assert len(pending) == 3
+            for job in pending:
+                assert jobs.reached(job["file_name"], "transcribed")
+                assert not jobs.reached(job["file_name"], "titled")
+                assert "transcript" in job["artifacts"]
+            assert ProcessingState(run_kwargs["path_db"]).high_water_mark is None
+        assert asr_model.calls == 3
+
+        llm_client.error = None
+        result = process_voice_memos(**run_kwargs, job_store=jobs)
+
+        assert len(result["completed"]) == 3
+        # resumed after transcription, without transcribing again
+        assert asr_model.calls == 3
+        assert jobs.pending() == [] and jobs.quarantined() == []
+        assert len(list(run_kwargs["path_markdown"].glob("*.md"))) == 3
+        assert ProcessingState(run_kwargs["path_db"]).high_water_mark is not None
+
+
+def test_process_voice_memos_quarantines_memos_failing_after_the_summary(tmp_path):
+    """
+    Test that a memo whose title keeps failing is quarantined, although its
+    summary succeeds and is kept, and that the high-water mark stops before it.
+    """
+    asr_model = FakeASRModel()
+    llm_client = TitleFailingChatClient()
+    run_kwargs = corpus_run_kwargs(tmp_path, llm_client, asr_model)
+
+    with open_job_store(
+        run_kwargs["path_db"], max_attempts=2, backoff_seconds=0
+    ) as jobs:
+        for _ in range(3):
+            result = process_voice_memos(**run_kwargs, job_store=jobs)
+        quarantined = jobs.quarantined()
+
+        assert result["completed"] == []
+        assert len(quarantined) == 3
+        for job in quarantined:
+            assert job["artifacts"]["transcript_tldr"]
+            assert "title request rejected" in job["last_error"]
+        assert ProcessingState(run_kwargs["path_db"]).high_water_mark is None
+
+        for job in quarantined:
+            jobs.requeue(job["file_name"])
+        llm_client.reply = FlakyChatClient.reply.__get__(llm_client)
+        result = process_voice_memos(**run_kwargs, job_store=jobs)
+
+        assert len(result["completed"]) == 3
+        assert jobs.pending() == [] and jobs.quarantined() == []
+        assert ProcessingState(run_kwargs["path_db"]).high_water_mark is not None
@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from voice2md.lazy import LazyModel, load_whisper_model
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_run_without_memos_imports_no_heavy_modules(tmp_path):
+    """
+    Test that a run with nothing to do neither imports whisper/torch nor openai.
+    """
+    env = dict(os.environ)
+    for name in ("original", "processed", "markdown", "db"):
+        (tmp_path / name).mkdir()
+    env.update(
+        PATH_VOICE_MEMOS_ORIGINAL=str(tmp_path / "original"),
+        PATH_VOICE_MEMOS_PROCESSED=str(tmp_path / "processed"),
+        PATH_MARKDOWN=str(tmp_path / "markdown"),
+        PATH_DB=str(tmp_path / "db"),
+    )
+    script = (
+        "import json, sys, app; app.main([]); "
+        "print(json.dumps([m for m in ('whisper', 'torch', 'openai') "
+        "if m in sys.modules]))"
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+
+def test_lazy_model_loads_once_across_threads():
+    """
+    Test that concurrent first uses construct the object exactly once.
+    """
+    calls = []
+
+    def loader():
+        calls.append(threading.get_ident())
+        time.sleep(0.1)
+        return SimpleNamespace(transcribe=lambda audio: f"text of {audio}")
+
+    model = LazyModel(loader, "stub model")
+    assert not model.loaded and calls == []
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def use():
+        barrier.wait()
+        results.append(model.transcribe("memo.m4a"))
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["text of memo.m4a"] * 8
+    assert model.loaded
+    assert model.get() is model.get()
+    assert len(calls) == 1
+
+
+def test_load_whisper_model_defers_import():
+    """
+    Test that creating the whisper proxy does not import whisper.
+    """
+    loaded_before = "whisper" in sys.modules
+
+    model = load_whisper_model("tiny")
+
+    assert not model.loaded
+    assert ("whisper" in sys.modules) == loaded_before
@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import pytest
+
+from voice2md.llm import llm_summarize_and_title
+from voice2md.llm_async import AsyncLLMClient
+from voice2md.metrics import MemoMetrics
+from voice2md.stubs import StubChatServer
+
+MESSAGES = [{"role": "user", "content": "Voice memo: hello"}]
+
+
+def test_async_client_limits_requests_in_flight():
+    """
+    Test that concurrent requests are capped by max_in_flight.
+    """
+
+    async def run(client):
+        try:
+            return await asyncio.gather(
+                *(client.acreate(model="stub", messages=MESSAGES) for _ in range(8))
+            )
+        finally:
+            await client.aclose()
+
+    with StubChatServer(latency=0.1) as server:
+        client = AsyncLLMClient(server.base_url, max_in_flight=3)
+        responses = asyncio.run(run(client))
+
+    assert len(responses) == 8
+    assert server.max_in_flight == 3
+
+
+def test_async_client_retries_server_errors():
+    """
+    Test that failed requests are retried with backoff.
+    """
+    with StubChatServer(fail_first=2) as server:
+        client = AsyncLLMClient(server.base_url, max_retries=3, backoff_base=0.01)
+        try:
+            response = client.chat.completions.create(model="stub", messages=MESSAGES)
+        finally:
+            client.close()
+
+    assert server.requests == 3
+    assert "Stub title" in response.choices[0].message.content
+
+
+def test_async_client_backs_off_without_holding_a_slot():
+    """
+    Test that a request waiting to retry lets other requests use its slot.
+    """
+    finished = []
+
+    async def send(client, name):
+        await client.acreate(model="stub", messages=MESSAGES)
+        finished.append(name)
+
+    async def run(client):
+        try:
+            await asyncio.gather(send(client, "retried"), send(client, "other"))
+        finally:
+            await client.aclose()
+
+    with StubChatServer(fail_first=1) as server:
+        client = AsyncLLMClient(server.base_url, max_in_flight=1)
+        client._backoff = lambda attempt: 0.3
+        asyncio.run(run(client))
+
+    assert finished == ["other", "retried"]
+
+
+def test_async_client_times_out():
+    """
+    Test that a slow server raises once all retries timed out.
+    """
+    with StubChatServer(latency=0.5) as server:
+        client = AsyncLLMClient(
+            server.base_url, timeout=0.1, max_retries=1, backoff_base=0.01
+        )
+        try:
+            with pytest.raises((asyncio.TimeoutError, openai.APITimeoutError)):
+                client.chat.completions.create(model="stub", messages=MESSAGES)
+        finally:
+            client.close()
+
+
+def test_sync_facade_serves_concurrent_threads():
+    """
+    Test that pipeline threads using the llm.py helpers share the async client.
+    """
+    with StubChatServer(latency=0.1) as server:
+        client = AsyncLLMClient(server.base_url, max_in_flight=4)
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                responses = list(
+                    executor.map(
+                        lambda i: llm_summarize_and_title(
+                            client, {"text": f"memo {i}"}, "stub"
+                        ),
+                        range(4),
+                    )
+                )
+        finally:
+            client.close()
+
+    assert len(responses) == 4
+    assert server.max_in_flight == 4
+
+
+def test_async_client_records_ttft():
+    """
+    Test that the llm.py helpers record the time to first token with the async client.
+    """
+    with StubChatServer(latency=0.05) as server:
+        client = AsyncLLMClient(server.base_url)
+        metrics = MemoMetrics()
+        try:
+            with metrics.measure("summarize_and_title"):
+                response = llm_summarize_and_title(client, {"text": "memo"}, "stub")
+        finally:
+            client.close()
+
+    assert "Stub title" in response.choices[0].message.content
+    assert len(metrics.ttft_seconds) == 1
+    assert metrics.ttft_seconds[0] >= 0.05
+    assert metrics.tokens_out > 0
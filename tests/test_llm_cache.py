@@ -0,0 +1,68 @@
+from openai.types.chat import ChatCompletion
+
+from voice2md.llm import llm_summarize_transcript
+from voice2md.llm_cache import LLMCache
+
+
+class FakeChatClient:
+    """
+    Fake OpenAI client answering every chat completion with a fixed summary.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        return ChatCompletion.model_validate(
+            {
+                "id": f"chatcmpl-{self.calls}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": "<tldr_summary>A summary.</tldr_summary>",
+                        },
+                    }
+                ],
+            }
+        )
+
+
+def test_llm_cache_serves_repeated_requests(tmp_path):
+    """
+    Test that an identical request is answered from the cache.
+    """
+    client = FakeChatClient()
+    cache = LLMCache(tmp_path / "llm")
+    transcript = {"text": "a voice memo about caching"}
+
+    first = llm_summarize_transcript(client, transcript, "llama3.2:3b", cache)
+    second = llm_summarize_transcript(client, transcript, "llama3.2:3b", cache)
+    llm_summarize_transcript(client, transcript, "llama3.2:1b", cache)
+
+    assert client.calls == 2
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert cache.flush_stats()["hits"] == 1
+
+
+def test_llm_cache_refresh_forces_regeneration(tmp_path):
+    """
+    Test that refresh=True bypasses cached responses.
+    """
+    client = FakeChatClient()
+    transcript = {"text": "a voice memo about caching"}
+
+    llm_summarize_transcript(client, transcript, "llama3.2:3b", LLMCache(tmp_path))
+    llm_summarize_transcript(
+        client, transcript, "llama3.2:3b", LLMCache(tmp_path, refresh=True)
+    )
+
+    assert client.calls == 2
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from voice2md.memo_index import (
+    ProcessingState,
+    StemIndex,
+    scan_voice_memos,
+    select_voice_memos,
+)
+
+
+def test_scan_and_select_voice_memos(tmp_path):
+    """
+    Test selection by recording datetime with and without a high-water mark.
+    """
+    for name in [
+        "20241016 101010-CCCC.m4a",
+        "20241014 080000-AAAA.m4a",
+        "20241015 090000-BBBB.m4a",
+        "notes.txt",
+        "not a memo.m4a",
+    ]:
+        (tmp_path / name).write_bytes(b"")
+
+    memos = scan_voice_memos(tmp_path)
+    assert [path.name for _, path in memos] == [
+        "20241014 080000-AAAA.m4a",
+        "20241015 090000-BBBB.m4a",
+        "20241016 101010-CCCC.m4a",
+    ]
+
+    first_run = select_voice_memos(memos, last_n_files=2)
+    assert [dt.day for dt, _ in first_run] == [15, 16]
+
+    later_run = select_voice_memos(memos, high_water_mark=datetime(2024, 10, 14, 8))
+    assert [dt.day for dt, _ in later_run] == [15, 16]
+
+    capped = select_voice_memos(memos, datetime(2024, 10, 1), max_files=1)
+    assert [dt.day for dt, _ in capped] == [14]
+
+
+def test_stem_index_and_state(tmp_path):
+    """
+    Test the stem index and the persisted high-water mark.
+    """
+    (tmp_path / "2024-10-16_101010_CCCC.m4a").write_bytes(b"")
+    index = StemIndex(tmp_path)
+    assert "2024-10-16_101010_CCCC" in index
+    assert "2024-10-17_101010_DDDD" not in index
+    index.add("2024-10-17_101010_DDDD")
+    assert "2024-10-17_101010_DDDD" in index
+
+    state = ProcessingState(tmp_path)
+    assert state.high_water_mark is None
+    state.high_water_mark = datetime(2024, 10, 16, 10, 10, 10)
+    state.save()
+    assert ProcessingState(tmp_path).high_water_mark == datetime(
+        2024, 10, 16, 10, 10, 10
+    )
@@ -0,0 +1,69 @@
+import pstats
+import time
+from types import SimpleNamespace
+
+from voice2md.metrics import MemoMetrics, RunMetrics, measured, record_llm_usage
+
+
+class Memo:
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @measured("transcribe")
+    def transcribe(self):
+        time.sleep(0.02)
+        self.metrics.audio_seconds = 0.1
+
+    @measured("summarize_and_title")
+    def summarize_and_title(self, cached=False):
+        usage = SimpleNamespace(
+            model_dump=lambda: {"prompt_tokens": 100, "completion_tokens": 20}
+        )
+        record_llm_usage(SimpleNamespace(usage=usage), cached=cached)
+        time.sleep(0.01)
+
+
+def test_memo_metrics_record_steps_tokens_and_rates():
+    """
+    Test that measured steps, LLM usage and the derived rates end up in the record.
+    """
+    memo = Memo(MemoMetrics())
+    memo.transcribe()
+    memo.summarize_and_title()
+    memo.summarize_and_title(cached=True)
+    # usage outside of a measured step belongs to no memo
+    record_llm_usage(SimpleNamespace(usage=None))
+
+    record = memo.metrics.as_dict()
+
+    assert record["steps"]["transcribe"]["wall_seconds"] >= 0.02
+    assert "cpu_seconds" in record["steps"]["summarize_and_title"]
+    assert (record["tokens_in"], record["tokens_out"]) == (100, 20)
+    assert (record["llm_calls"], record["llm_cached_calls"]) == (1, 1)
+    assert record["asr_realtime_factor"] >= 0.2
+    assert record["llm_tokens_per_second"] > 0
+
+
+def test_run_metrics_exports_prometheus_textfile_and_profile(tmp_path):
+    """
+    Test that run aggregates are written as a textfile and profiled steps are dumped.
+    """
+    run_metrics = RunMetrics(profile=True)
+    for _ in range(2):
+        memo = Memo(run_metrics.new_memo())
+        memo.transcribe()
+        memo.summarize_and_title()
+        run_metrics.add(memo.metrics)
+
+    run_metrics.write_prometheus_textfile(tmp_path / "voice2md.prom")
+    run_metrics.profiles.dump(tmp_path / "run.prof")
+
+    text = (tmp_path / "voice2md.prom").read_text()
+    assert "voice2md_last_run_memos 2" in text
+    assert 'voice2md_last_run_llm_tokens{direction="in"} 200' in text
+    assert 'voice2md_last_run_step_count{step="transcribe"} 2' in text
+    assert "voice2md_last_run_asr_realtime_factor" in text
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".part")] == []
+    assert (tmp_path / "voice2md.prom").stat().st_mode & 0o777 == 0o644
+    stats = pstats.Stats(str(tmp_path / "run.prof"))
+    assert any(name == "transcribe" for _, _, name in stats.stats)
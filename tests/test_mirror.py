@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import voice2md.mirror
+from voice2md.mirror import UMASK, Materializer, write_if_changed
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "original" / "20241016 101010-ABCD.m4a"
+    path.parent.mkdir()
+    path.write_bytes(b"audio bytes" * 100)
+    (tmp_path / "processed").mkdir()
+    return path
+
+
+def test_materializer_hardlinks_and_never_rewrites(source, tmp_path):
+    """
+    Test that auto mode hardlinks and that a rerun leaves the identical file alone.
+    """
+    dest = tmp_path / "processed" / "2024-10-16_101010_ABCD.m4a"
+    materializer = Materializer()
+
+    assert materializer.materialize(source, dest) == "hardlink"
+    assert os.path.samefile(source, dest)
+    assert materializer.materialize(source, dest) == "unchanged"
+
+
+def test_materializer_replaces_changed_copy(source, tmp_path):
+    """
+    Test that an existing copy with different bytes is replaced, and an identical one kept.
+    """
+    dest = tmp_path / "processed" / "2024-10-16_101010_ABCD.m4a"
+    dest.write_bytes(b"stale")
+    materializer = Materializer("copy")
+
+    assert materializer.materialize(source, dest) == "copy"
+    assert dest.read_bytes() == source.read_bytes()
+    assert not os.path.samefile(source, dest)
+    assert materializer.materialize(source, dest) == "unchanged"
+
+
+def test_materializer_falls_back_in_order(source, tmp_path, monkeypatch):
+    """
+    Test that unsupported strategies fall back in order and the working one is remembered.
+    """
+    attempts = []
+
+    def fail_links(src, dst):
+        attempts.append("hardlink")
+        raise OSError("cross-device link")
+
+    def fail_reflink(src, dst):
+        attempts.append("reflink")
+        raise OSError("operation not supported")
+
+    monkeypatch.setattr(voice2md.mirror.os, "link", fail_links)
+    monkeypatch.setattr(voice2md.mirror, "reflink_file", fail_reflink)
+    materializer = Materializer()
+
+    first = tmp_path / "processed" / "first.m4a"
+    second = tmp_path / "processed" / "second.m4a"
+    assert materializer.materialize(source, first) == "symlink"
+    assert materializer.materialize(source, second) == "symlink"
+
+    assert attempts == ["hardlink", "reflink"]
+    assert first.is_symlink() and first.read_bytes() == source.read_bytes()
+    assert [p.name for p in first.parent.iterdir() if p.name.endswith(".part")] == []
+
+
+def test_write_if_changed_keeps_file_permissions(tmp_path):
+    """
+    Test that new notes get the umask's default mode and rewritten ones keep theirs.
+    """
+    note = tmp_path / "note.md"
+
+    assert write_if_changed(note, b"first")
+    assert note.stat().st_mode & 0o777 == 0o666 & ~UMASK
+
+    note.chmod(0o640)
+    assert write_if_changed(note, b"second")
+    assert note.read_bytes() == b"second"
+    assert note.stat().st_mode & 0o777 == 0o640
+    assert not write_if_changed(note, b"second")
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from voice2md.pipeline import Stage, run_pipeline
+
+
+def test_run_pipeline_passes_items_through_all_stages():
+    """
+    Test that every item goes through all stages in order.
+    """
+    result = run_pipeline(
+        range(5),
+        [
+            Stage("double", lambda x: x * 2),
+            Stage("increment", lambda x: x + 1, workers=3),
+        ],
+    )
+
+    assert sorted(result["completed"]) == [1, 3, 5, 7, 9]
+    assert result["errors"] == []
+
+
+def test_run_pipeline_overlaps_stages():
+    """
+    Test that two slow stages overlap instead of running back to back.
+    """
+    delay = 0.05
+
+    def slow(x):
+        time.sleep(delay)
+        return x
+
+    start = time.perf_counter()
+    result = run_pipeline(range(6), [Stage("a", slow), Stage("b", slow)])
+    elapsed = time.perf_counter() - start
+
+    assert len(result["completed"]) == 6
+    # serial execution would take 12 * delay, a pipeline about 7 * delay
+    assert elapsed < 10 * delay
+
+
+def test_run_pipeline_drops_none_and_collects_errors():
+    """
+    Test that None drops an item and exceptions are collected per item.
+    """
+    seen = []
+    lock = threading.Lock()
+
+    def prep(x):
+        if x == 0:
+            return None
+        if x == 1:
+            raise ValueError("bad memo")
+        return x
+
+    def persist(x):
+        with lock:
+            seen.append(x)
+        return x
+
+    result = run_pipeline(range(4), [Stage("prep", prep), Stage("persist", persist)])
+
+    assert sorted(seen) == [2, 3]
+    assert len(result["errors"]) == 1
+    item, stage_name, error = result["errors"][0]
+    assert item == 1
+    assert stage_name == "prep"
+    assert isinstance(error, ValueError)
+
+
+def test_run_pipeline_records_stage_timings():
+    """
+    Test that the time spent on every item is recorded per stage, including failures.
+    """
+
+    def fail_on_two(x):
+        if x == 2:
+            raise ValueError("boom")
+        time.sleep(0.01)
+        return x
+
+    result = run_pipeline(
+        range(4), [Stage("first", fail_on_two), Stage("second", lambda x: x)]
+    )
+
+    assert len(result["timings"]["first"]) == 4
+    assert len(result["timings"]["second"]) == 3
+    assert min(result["timings"]["first"]) >= 0
+
+
+def test_run_pipeline_takes_waiting_items_by_priority():
+    """
+    Test that a stage with a priority takes the waiting items in priority order,
+    not in the order they arrived.
+    """
+    taken = []
+
+    def slow(x):
+        taken.append(x)
+        time.sleep(0.2)
+        return x
+
+    def feed():
+        yield 0
+        # the first item is being processed while the others queue up
+        time.sleep(0.05)
+        yield from [3, 9, 5]
+
+    result = run_pipeline(
+        feed(),
+        [
+            Stage("pass", lambda x: x, queue_size=4),
+            Stage("slow", slow, queue_size=4, priority=lambda x: -x),
+        ],
+    )
+
+    assert sorted(result["completed"]) == [0, 3, 5, 9]
+    assert taken == [0, 9, 5, 3]
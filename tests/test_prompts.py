@@ -0,0 +1,57 @@
+import json
+
+import openai
+
+from voice2md.llm import llm_summarize_and_title, preload_model
+from voice2md.metrics import MemoMetrics
+from voice2md.prompts import EXAMPLES_ENV_VAR, _system_prompts, system_prompt
+from voice2md.stubs import StubChatServer
+
+
+def test_system_prompt_loads_examples_from_file(tmp_path, monkeypatch):
+    """
+    Test that few-shot examples come from the configured file and are rendered per task.
+    """
+    examples = tmp_path / "few_shots.json"
+    examples.write_text(
+        json.dumps(
+            {
+                "examples": [
+                    {
+                        "voice_memo": "buy milk and eggs",
+                        "tldr_summary": "Groceries to buy.",
+                        "title": "Groceries",
+                    }
+                ]
+            }
+        )
+    )
+    monkeypatch.setenv(EXAMPLES_ENV_VAR, str(examples))
+
+    assert '<voice memo>"buy milk and eggs"</voice memo>' in system_prompt("summary")
+    assert '<title>"Groceries"</title>' in system_prompt("title")
+    assert '"title": "Groceries"' in system_prompt("summary_and_title")
+    assert _system_prompts.cache_info().currsize >= 1
+    assert system_prompt("title") is system_prompt("title")
+
+
+def test_streamed_calls_share_prefix_and_record_ttft():
+    """
+    Test that every memo is sent the identical system prompt and streamed calls record TTFT.
+    """
+    with StubChatServer(latency=0.05) as server:
+        client = openai.OpenAI(base_url=server.base_url, api_key="stub")
+        metrics = MemoMetrics()
+        with metrics.measure("summarize_and_title"):
+            for text in ["first memo about taxes", "second memo about travel"]:
+                response = llm_summarize_and_title(client, {"text": text}, model="stub")
+                assert json.loads(response.choices[0].message.content)["title"]
+
+        assert preload_model(server.host, "stub", keep_alive="10m")
+
+    assert len(server.system_prompts) == 2
+    assert server.system_prompts[0] == server.system_prompts[1]
+    assert len(metrics.ttft_seconds) == 2
+    assert min(metrics.ttft_seconds) >= 0.05
+    assert metrics.tokens_out > 0
+    assert server.preloads == [{"model": "stub", "keep_alive": "10m"}]
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from voice2md.note_templates import md_note_builder, md_note_builder_obsidian
+from voice2md.rerender import rerender_notes, select_records
+
+
+def make_record(tmp_path, file_name, datetime_created):
+    return {
+        "file_name": file_name,
+        "datetime_created": datetime_created,
+        "file_path_voice_memo_processed": str(tmp_path / "audio" / f"{file_name}.m4a"),
+        "file_path_markdown": str(tmp_path / "notes" / f"{file_name}_Title.md"),
+        "transcript": {"text": f"transcript of {file_name}"},
+        "transcript_tldr": "A summary.",
+        "transcript_title": "Title",
+    }
+
+
+def test_rerender_writes_only_changed_notes(tmp_path):
+    """
+    Test that re-rendering writes new and changed notes only and leaves no temp files.
+    """
+    records = [
+        make_record(
+            tmp_path, f"2024-10-{day:02d}_101010_ABCD", f"2024-10-{day:02d}T10:10:10"
+        )
+        for day in range(1, 6)
+    ]
+
+    first = rerender_notes(records, md_note_builder, workers=4)
+    mtimes = {p: p.stat().st_mtime_ns for p in (tmp_path / "notes").iterdir()}
+    second = rerender_notes(records, md_note_builder, workers=4)
+    unchanged_mtimes = {p: p.stat().st_mtime_ns for p in mtimes}
+    dry_run = rerender_notes(records, md_note_builder_obsidian, dry_run=True)
+    third = rerender_notes(records[:2], md_note_builder_obsidian)
+
+    assert (first["written"], first["unchanged"]) == (5, 0)
+    assert (second["written"], second["unchanged"]) == (0, 5)
+    assert unchanged_mtimes == mtimes
+    assert (dry_run["written"], third["written"]) == (5, 2)
+    notes = sorted((tmp_path / "notes").iterdir())
+    assert len(notes) == 5
+    assert notes[0].read_text().startswith("---\ndate-created: 2024-10-01")
+    assert "transcript of 2024-10-05_101010_ABCD" in notes[4].read_text()
+
+
+def test_select_records_filters_by_date_and_name(tmp_path):
+    """
+    Test the date range and file name filters.
+    """
+    records = [
+        make_record(tmp_path, "2024-09-30_080000_A", "2024-09-30T08:00:00"),
+        make_record(tmp_path, "2024-10-01_080000_B", "2024-10-01T08:00:00"),
+        make_record(tmp_path, "2024-10-02_080000_C", "2024-10-02T08:00:00"),
+    ]
+
+    since = select_records(records, since=datetime(2024, 10, 1))
+    until = select_records(records, until=datetime(2024, 10, 2))
+    matched = select_records(records, pattern="*_C")
+
+    assert [r["file_name"][-1] for r in since] == ["B", "C"]
+    assert [r["file_name"][-1] for r in until] == ["A", "B"]
+    assert [r["file_name"][-1] for r in matched] == ["C"]
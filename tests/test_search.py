@@ -0,0 +1,177 @@
+from datetime import datetime
+
+from app import process_voice_memos
+from benchmarks.bench_pipeline import make_corpus
+from tests.conftest import SummaryChatClient
+from voice2md.search import SearchIndex, open_search_index, rebuild_index, to_fts_query
+from voice2md.storage import open_storage
+from voice2md.stubs import FakeASRModel
+from voice2md.transcript_store import SegmentStore
+
+
+def record(file_name, title="", tldr="", text=""):
+    """Build a stored voice memo record with one segment per sentence."""
+    segments = [
+        {"start": i * 2.5, "end": i * 2.5 + 2.5, "text": " " + sentence}
+        for i, sentence in enumerate(text.split(". "))
+    ]
+    return {
+        "file_name": file_name,
+        "datetime_created": "2024-10-05T08:15:00",
+        "transcript": {"text": text, "segments": segments, "language": "en"},
+        "transcript_tldr": tldr,
+        "transcript_title": title,
+    }
+
+
+def test_to_fts_query_quotes_words():
+    """
+    Test that free text cannot inject FTS5 syntax and keeps prefix queries.
+    """
+    assert to_fts_query('budget OR "next week" plan*') == (
+        '"budget" "OR" "next" "week" "plan"*'
+    )
+    assert to_fts_query("  -- ") == ""
+
+
+def test_search_ranks_title_matches_first(tmp_path):
+    """
+    Test that a memo with the query in its title outranks one that only
+    mentions it in the transcript, and that the hit points at the segment.
+    """
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        index.add(
+            record(
+                "mentioned",
+                title="Groceries",
+                text="Buy milk. Think about the budget later. Call mom",
+            )
+        )
+        index.add(
+            record(
+                "titled",
+                title="Budget for next year",
+                tldr="Planning the budget.",
+                text="We need to plan the budget. Costs rise",
+            )
+        )
+        for i in range(5):
+            index.add(record(f"unrelated-{i}", title="Walk", text="Nice weather today"))
+
+        hits = index.search("budget")
+
+        assert [hit["file_name"] for hit in hits] == ["titled", "mentioned"]
+        assert hits[0]["score"] < hits[1]["score"]
+        assert hits[1]["segments"] == [
+            {
+                "start_ms": 2500,
+                "end_ms": 5000,
+                "snippet": "Think about the [budget] later",
+            }
+        ]
+        assert index.search("nothing matches this") == []
+
+
+def test_search_folds_diacritics(tmp_path):
+    """
+    Test that German words are found without their umlauts and vice versa.
+    """
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        index.add(record("de", title="Gedanken über Bücher", text="Größe zählt"))
+
+        for query in ("uber", "über", "BUCHER", "große", "gro*", "zahlt"):
+            assert [hit["file_name"] for hit in index.search(query)] == ["de"], query
+        # no stemming: only prefix queries find inflected forms
+        assert index.search("buch") == []
+        assert len(index.search("buch*")) == 1
+
+
+def test_search_index_replaces_updated_memos(tmp_path):
+    """
+    Test that indexing a memo again replaces its earlier version.
+    """
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        index.add(record("memo", title="Old title", text="First draft"))
+        index.add(record("memo", title="New title", text="Second draft"))
+
+        assert len(index) == 1
+        assert index.search("first") == []
+        (hit,) = index.search("draft")
+        assert hit["title"] == "New title"
+        assert len(hit["segments"]) == 1
+
+        index.remove("memo")
+        assert len(index) == 0 and index.search("draft") == []
+
+
+def test_search_index_finds_rows_of_a_memo_by_index(tmp_path):
+    """
+    Test that replacing a memo looks up its rows by index instead of scanning.
+    """
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        conn = index._conn
+        for query, args in [
+            ("SELECT id FROM docs WHERE file_name = ?", ("memo",)),
+            ("SELECT id FROM spans WHERE doc_id = ?", (1,)),
+        ]:
+            plan = " ".join(
+                row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", args)
+            )
+            assert plan.startswith("SEARCH") and "INDEX" in plan, plan
+
+
+def test_rebuild_index_reads_segments_from_sidecars(tmp_path):
+    """
+    Test that records whose segments were moved to sidecars are indexed with them.
+    """
+    segment_store = SegmentStore(tmp_path)
+    stored = record("memo", title="Trip", text="Pack bags. Book the train")
+    stored["transcript"] = segment_store.compact("memo", stored["transcript"])
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        assert rebuild_index(index, [stored], segment_store) == 1
+
+        (hit,) = index.search("train")
+        assert hit["segments"][0]["start_ms"] == 2500
+
+
+def test_process_voice_memos_updates_search_index(tmp_path):
+    """
+    Test that every persisted memo is indexed as part of the run, so new memos
+    are searchable without rebuilding the index.
+    """
+    paths = {
+        name: tmp_path / name for name in ("original", "processed", "markdown", "db")
+    }
+    for path in paths.values():
+        path.mkdir()
+    make_corpus(paths["original"], 2, size_kb=48)
+    run_kwargs = dict(
+        path_voice_memos_original=paths["original"],
+        path_voice_memos_processed=paths["processed"],
+        path_markdown=paths["markdown"],
+        path_db=paths["db"],
+        asr_model=FakeASRModel(),
+        llm_client=SummaryChatClient(),
+        llm_model="stub",
+        max_file_size_mb=None,
+        segment_store=SegmentStore(paths["db"]),
+    )
+
+    with open_search_index(paths["db"]) as index:
+        process_voice_memos(**run_kwargs, search_index=index)
+        assert len(index) == 2
+
+        make_corpus(
+            paths["original"], 1, size_kb=48, start=datetime(2024, 2, 1), seed=1
+        )
+        process_voice_memos(**run_kwargs, search_index=index)
+        assert len(index) == 3
+
+        with open_storage(paths["db"]) as storage:
+            newest = max(storage.all(), key=lambda item: item["datetime_created"])
+        word = newest["transcript"]["text"].split()[0]
+        hits = {hit["file_name"]: hit for hit in index.search(word, limit=3)}
+        assert newest["file_name"] in hits
+        segment = hits[newest["file_name"]]["segments"][0]
+        assert f"[{word}]" in segment["snippet"]
+        assert segment["end_ms"] - segment["start_ms"] == 1000
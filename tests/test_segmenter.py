@@ -0,0 +1,78 @@
+import numpy as np
+
+from voice2md.segmenter import SAMPLE_RATE, split_at_silence, transcribe_segmented
+
+
+def make_waveform(seconds_speech, seconds_silence, repeats):
+    """
+    Create a waveform of noise bursts separated by silence.
+    """
+    rng = np.random.default_rng(0)
+    parts = []
+    for _ in range(repeats):
+        parts.append(rng.uniform(-0.5, 0.5, int(seconds_speech * SAMPLE_RATE)))
+        parts.append(np.zeros(int(seconds_silence * SAMPLE_RATE)))
+    return np.concatenate(parts).astype(np.float32)
+
+
+def as_blocks(waveform, block_seconds=1.0):
+    size = int(block_seconds * SAMPLE_RATE)
+    return (waveform[i : i + size] for i in range(0, len(waveform), size))
+
+
+class SegmentASRModel:
+    """
+    Fake ASR model reporting the length of each segment it receives.
+    """
+
+    def transcribe(self, audio, **options):
+        duration = len(audio) / SAMPLE_RATE
+        return {
+            "text": f" {duration:.1f}s",
+            "language": "en",
+            "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": duration}],
+        }
+
+
+def test_split_at_silence_cuts_in_quiet_stretches():
+    """
+    Test that segments respect the maximum length and are cut inside silences.
+    """
+    waveform = make_waveform(2.5, 1.0, 6)
+
+    segments = list(
+        split_at_silence(
+            as_blocks(waveform), max_segment_seconds=4.0, search_seconds=2.0
+        )
+    )
+
+    assert sum(len(segment) for _, segment in segments) == len(waveform)
+    for offset, segment in segments:
+        assert len(segment) <= 4.0 * SAMPLE_RATE
+        if offset > 0:
+            cut = int(offset * SAMPLE_RATE)
+            assert np.all(waveform[cut - 100 : cut + 100] == 0)
+
+
+def test_transcribe_segmented_stitches_segments():
+    """
+    Test that segment transcripts are joined with shifted timestamps.
+    """
+    waveform = make_waveform(2.5, 1.0, 6)
+
+    transcript = transcribe_segmented(
+        SegmentASRModel(),
+        "memo.m4a",
+        max_segment_seconds=4.0,
+        workers=2,
+        blocks=as_blocks(waveform),
+    )
+
+    segments = transcript["segments"]
+    assert len(segments) > 1
+    assert [segment["id"] for segment in segments] == list(range(len(segments)))
+    assert segments[0]["start"] == 0.0
+    for previous, current in zip(segments, segments[1:]):
+        assert abs(current["start"] - previous["end"]) < 1e-6
+    assert abs(segments[-1]["end"] - len(waveform) / SAMPLE_RATE) < 1e-6
+    assert transcript["language"] == "en"
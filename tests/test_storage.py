@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from voice2md.storage import MIGRATIONS, SQLiteStorage, TinyDBStorage, open_storage
+
+
+def make_record(file_name, title="Title", datetime_created="2024-10-16T10:10:10"):
+    return {
+        "file_name": file_name,
+        "datetime_created": datetime_created,
+        "transcript": {"text": "hello"},
+        "transcript_title": title,
+    }
+
+
+@pytest.mark.parametrize("backend", [SQLiteStorage, TinyDBStorage])
+def test_storage_upsert_replaces_records(tmp_path, backend):
+    """
+    Test that upserting the same file name twice keeps a single record.
+    """
+    with backend(tmp_path / "db") as storage:
+        storage.upsert(make_record("memo_a", title="First"))
+        storage.upsert(make_record("memo_b", datetime_created="2024-10-15T09:00:00"))
+        storage.upsert(make_record("memo_a", title="Second"))
+
+        assert len(storage) == 2
+        assert storage.get("memo_a")["transcript_title"] == "Second"
+        assert [r["file_name"] for r in storage.all()] == ["memo_b", "memo_a"]
+        assert storage.get("missing") is None
+
+
+def test_sqlite_storage_batches_and_persists(tmp_path):
+    """
+    Test that buffered upserts are committed on close and survive a reopen.
+    """
+    path = tmp_path / "voice2md.sqlite"
+    storage = SQLiteStorage(path, batch_size=10)
+    for i in range(25):
+        storage.upsert(make_record(f"memo_{i:02d}"))
+    storage.close()
+
+    with SQLiteStorage(path) as reopened:
+        assert len(reopened) == 25
+        mode = reopened._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+
+def test_open_storage_migrates_tinydb_once(tmp_path):
+    """
+    Test the one-shot migration of an existing db.json with duplicate rows.
+    """
+    db_json = {
+        "_default": {
+            "1": make_record("memo_a", title="Old"),
+            "2": make_record("memo_b"),
+            "3": make_record("memo_a", title="New"),
+        }
+    }
+    (tmp_path / "db.json").write_text(json.dumps(db_json))
+
+    with open_storage(tmp_path) as storage:
+        assert len(storage) == 2
+        assert storage.get("memo_a")["transcript_title"] == "New"
+        storage.upsert(make_record("memo_c"))
+
+    with open_storage(tmp_path) as storage:
+        assert len(storage) == 3
+
+
+def test_open_storage_retries_a_failed_migration(tmp_path):
+    """
+    Test that a migration that failed is run again on the next open, and the
+    schema version only advances once it succeeded.
+    """
+    db_json = tmp_path / "db.json"
+    db_json.write_text('{"_default": {"1": ')
+
+    with open_storage(tmp_path) as storage:
+        assert len(storage) == 0
+        assert storage.schema_version == 0
+
+    db_json.write_text(json.dumps({"_default": {"1": make_record("memo_a")}}))
+    with open_storage(tmp_path) as storage:
+        assert len(storage) == 1
+        assert storage.schema_version == len(MIGRATIONS)
+
+
+def test_open_storage_keeps_newer_records_of_unversioned_databases(tmp_path):
+    """
+    Test that migrating a database from before versioning adds the missing
+    db.json records without replacing the ones processed since.
+    """
+    with SQLiteStorage(tmp_path / "voice2md.sqlite") as storage:
+        storage.upsert(make_record("memo_a", title="Reprocessed"))
+    db_json = {
+        "_default": {
+            "1": make_record("memo_a", title="Old"),
+            "2": make_record("memo_b"),
+        }
+    }
+    (tmp_path / "db.json").write_text(json.dumps(db_json))
+
+    with open_storage(tmp_path) as storage:
+        assert len(storage) == 2
+        assert storage.get("memo_a")["transcript_title"] == "Reprocessed"
+        assert storage.schema_version == len(MIGRATIONS)
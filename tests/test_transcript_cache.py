@@ -0,0 +1,125 @@
+import os
+import time
+
+import pytest
+
+from voice2md.disk_cache import DiskCache
+from voice2md.lazy import LazyModel
+from voice2md.transcript_cache import TranscriptCache, model_cache_name
+from voice2md.voice_memo import VoiceMemo
+
+
+class CountingASRModel:
+    """
+    Fake ASR model that counts how often it is called.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, **options):
+        self.calls += 1
+        return {"text": " hello world ", "segments": [], "language": "en"}
+
+
+@pytest.fixture
+def voice_memo(tmp_path):
+    """
+    Create a voice memo whose processed file exists.
+    """
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    vm = VoiceMemo(tmp_path / "20241016 101010-ABCD.m4a", processed, tmp_path)
+    vm.file_path_voice_memo_processed = processed / "2024-10-16_101010_ABCD.m4a"
+    vm.file_path_voice_memo_processed.write_bytes(b"audio bytes")
+    return vm
+
+
+def test_transcribe_uses_cache(tmp_path, voice_memo):
+    """
+    Test that a second transcription of the same audio is served from the cache.
+    """
+    cache = TranscriptCache(tmp_path / "cache")
+    asr_model = CountingASRModel()
+
+    voice_memo.transcribe(asr_model, cache, "medium")
+    voice_memo.transcript = None
+    voice_memo.transcribe(asr_model, cache, "medium")
+
+    assert asr_model.calls == 1
+    assert voice_memo.transcript["text"] == "hello world"
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_transcribe_cache_key_includes_model_and_options(tmp_path, voice_memo):
+    """
+    Test that a different model or options miss the cache.
+    """
+    cache = TranscriptCache(tmp_path / "cache")
+    asr_model = CountingASRModel()
+
+    voice_memo.transcribe(asr_model, cache, "medium")
+    voice_memo.transcribe(asr_model, cache, "small")
+    voice_memo.transcribe(asr_model, cache, "medium", language="de")
+
+    assert asr_model.calls == 3
+
+
+def test_transcribe_cache_key_comes_from_the_model(tmp_path, voice_memo):
+    """
+    Test that without a model name the key uses the model's cache_name, without
+    loading a lazy model, and that a model without any name is refused.
+    """
+    cache = TranscriptCache(tmp_path / "cache")
+    asr_model = CountingASRModel()
+    small = LazyModel(lambda: asr_model, "small", cache_name="small")
+    medium = LazyModel(lambda: asr_model, "medium", cache_name="medium")
+
+    assert model_cache_name(small) == "small"
+    assert not small.loaded
+    voice_memo.transcribe(small, cache)
+    voice_memo.transcribe(medium, cache)
+    voice_memo.transcribe(medium, cache)
+
+    assert asr_model.calls == 2
+    with pytest.raises(ValueError, match="CountingASRModel"):
+        voice_memo.transcribe(asr_model, cache)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    """
+    Test that eviction removes the least recently used entries first.
+    """
+    cache = DiskCache(tmp_path / "cache")
+    for key in ("aa1", "bb2", "cc3"):
+        cache.set(key, "x" * 1000)
+    # mark entries as used in a known order, "aa1" most recently
+    for age, key in ((30, "bb2"), (20, "cc3"), (10, "aa1")):
+        path = cache.path_for(key)
+        os.utime(path, (time.time() - age, path.stat().st_mtime))
+
+    removed = cache.evict(max_size_mb=2500 / (1024 * 1024))
+
+    assert removed == 1
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") is not None
+    assert cache.get("cc3") is not None
+
+
+def test_disk_cache_ttl_and_stats(tmp_path):
+    """
+    Test that expired entries miss and that counters are persisted.
+    """
+    cache = DiskCache(tmp_path / "cache", ttl_seconds=60)
+    cache.set("key", {"value": 1})
+    assert cache.get("key") == {"value": 1}
+
+    path = cache.path_for("key")
+    os.utime(path, (time.time(), time.time() - 120))
+    assert cache.get("key") is None
+
+    totals = cache.flush_stats()
+    assert totals["hits"] == 1
+    assert totals["misses"] == 1
+    assert DiskCache(tmp_path / "cache").stats()["hit_rate"] == 0.5
@@ -0,0 +1,97 @@
+import copy
+import json
+import random
+
+from voice2md.storage import SQLiteStorage
+from voice2md.transcript_store import SegmentStore, compact_records
+
+
+def whisper_transcript(segment_count=100, seed=0):
+    """
+    Build a transcript shaped like openai-whisper's result, with word timestamps.
+    """
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    for i in range(segment_count):
+        end = round(start + rng.uniform(1.0, 6.0), 2)
+        text = " " + " ".join(
+            rng.choice(["Hallo", "über", "idea", "plan"]) for _ in range(8)
+        )
+        segment = {
+            "id": i,
+            "seek": i * 3000,
+            "start": start,
+            "end": end,
+            "text": text,
+            "tokens": [rng.randrange(50257) for _ in range(rng.randrange(0, 40))],
+            "temperature": rng.choice([0.0, 0.2]),
+            "avg_logprob": rng.uniform(-1.5, 0.0),
+            "compression_ratio": rng.uniform(0.5, 2.5),
+            "no_speech_prob": rng.random(),
+        }
+        if i % 10 == 0:
+            segment["words"] = [{"word": " Hallo", "start": start, "end": end}]
+        segments.append(segment)
+        start = end
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": "de",
+    }
+
+
+def test_segment_store_round_trip_is_lossless(tmp_path):
+    """
+    Test that a compacted transcript expands to exactly the original one.
+    """
+    store = SegmentStore(tmp_path)
+    transcript = whisper_transcript()
+    original = copy.deepcopy(transcript)
+
+    compact = store.compact("2024-10-05_081500_ABCD1234", transcript)
+
+    assert set(compact) == {"text", "language", "segments_file"}
+    assert (tmp_path / compact["segments_file"]).exists()
+    expanded = store.expand(compact)
+    assert expanded == original
+    assert [list(s) for s in expanded["segments"]] == [
+        list(s) for s in original["segments"]
+    ]
+    assert json.dumps(expanded) == json.dumps(original)
+
+
+def test_segment_store_reads_only_requested_fields(tmp_path):
+    """
+    Test that segments can be loaded with a subset of their fields.
+    """
+    store = SegmentStore(tmp_path)
+    transcript = whisper_transcript(segment_count=5)
+    compact = store.compact("memo", transcript)
+
+    segments = store.load(compact["segments_file"], fields=["start", "end", "text"])
+
+    assert segments == [
+        {"start": s["start"], "end": s["end"], "text": s["text"]}
+        for s in transcript["segments"]
+    ]
+
+
+def test_compact_records_shrinks_stored_records(tmp_path):
+    """
+    Test that compacting moves segments out of the database records.
+    """
+    transcript = whisper_transcript()
+    store = SegmentStore(tmp_path)
+    with SQLiteStorage(tmp_path / "voice2md.sqlite") as storage:
+        storage.upsert({"file_name": "memo", "transcript": transcript})
+        inline_size = len(json.dumps(storage.get("memo")))
+
+        assert compact_records(storage, store) == 1
+        assert compact_records(storage, store) == 0
+
+        record = storage.get("memo")
+        assert len(json.dumps(record)) * 3 < inline_size
+        sidecar_size = (tmp_path / record["transcript"]["segments_file"]).stat().st_size
+        assert len(json.dumps(record)) + sidecar_size < inline_size
+        assert store.expand(record["transcript"]) == transcript
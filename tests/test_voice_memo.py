@@ -0,0 +1,194 @@
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from app import process_voice_memos
+from benchmarks.bench_pipeline import make_corpus
+from voice2md.llm import estimate_tokens
+from voice2md.stubs import FakeASRModel
+from voice2md.voice_memo import VoiceMemo, parse_summary_and_title
+
+
+class ScriptedChatClient:
+    """
+    Fake OpenAI client returning scripted response contents in order.
+    """
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.contents.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def make_voice_memo(text):
+    vm = VoiceMemo(Path("20241016 101010-ABCD.m4a"), Path("."), Path("."))
+    vm.transcript = {"text": text}
+    return vm
+
+
+def test_parse_summary_and_title_json_and_tags():
+    """
+    Test parsing of JSON, fenced JSON and tagged combined responses.
+    """
+    assert parse_summary_and_title(
+        '{"tldr_summary": "A summary.", "title": "A title"}'
+    ) == ("A summary.", "A title")
+    assert parse_summary_and_title(
+        '```json\n{"title": "A title", "tldr_summary": "A summary."}\n```'
+    ) == ("A summary.", "A title")
+    assert parse_summary_and_title(
+        "<tldr_summary>A summary.</tldr_summary>\n<title>A title</title>"
+    ) == ("A summary.", "A title")
+    assert parse_summary_and_title('{"tldr_summary": "only a summary"}') is None
+    assert parse_summary_and_title("no structure at all") is None
+
+
+def test_summarize_and_title_single_call():
+    """
+    Test that summary and title come from one structured response.
+    """
+    client = ScriptedChatClient(
+        ['{"tldr_summary": "Taxes in Germany.", "title": "Taxation in Germany!"}']
+    )
+    vm = make_voice_memo(
+        "I am reading from the Wiki article about taxation in Germany."
+    )
+
+    vm.summarize_and_title(client, "llama3.2:3b")
+
+    assert client.calls == 1
+    assert vm.transcript_tldr == "Taxes in Germany."
+    assert vm.transcript_title == "Taxation-in-Germany"
+
+
+def test_summarize_and_title_falls_back_to_two_calls():
+    """
+    Test the fallback to separate calls when the combined response is unparseable.
+    """
+    client = ScriptedChatClient(
+        [
+            "Sure! Here is a summary and a title.",
+            "<tldr_summary>Taxes in Germany.</tldr_summary>",
+            "<title>Taxation in Germany</title>",
+        ]
+    )
+    vm = make_voice_memo(
+        "I am reading from the Wiki article about taxation in Germany."
+    )
+
+    vm.summarize_and_title(client, "llama3.2:3b")
+
+    assert client.calls == 3
+    assert vm.transcript_tldr == "Taxes in Germany."
+    assert vm.transcript_title == "Taxation-in-Germany"
+
+
+class MapReduceChatClient:
+    """
+    Fake OpenAI client answering map and reduce prompts of map-reduce summarization.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.user_messages = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        user_message = messages[-1]["content"]
+        with self._lock:
+            self.user_messages.append(user_message)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        if user_message.startswith("Voice memo part:"):
+            content = (
+                f"<chunk_summary>part of {len(user_message)} chars</chunk_summary>"
+            )
+        else:
+            content = "<tldr_summary>A long meeting.</tldr_summary><title>Long meeting</title>"
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_summarize_and_title_map_reduce_for_long_transcripts():
+    """
+    Test that a transcript over the token budget is summarized in chunks.
+    """
+    segments = [{"text": " " + "word " * 40} for _ in range(20)]
+    vm = make_voice_memo(" ".join(s["text"] for s in segments))
+    vm.transcript["segments"] = segments
+    client = MapReduceChatClient()
+
+    vm.summarize_and_title(client, "llama3.2:3b", token_budget=120, map_workers=3)
+
+    map_calls = [m for m in client.user_messages if m.startswith("Voice memo part:")]
+    assert len(map_calls) == 10
+    assert len(client.user_messages) == 11
+    assert "Part 10:" in client.user_messages[-1]
+    assert vm.transcript_tldr == "A long meeting."
+    assert vm.transcript_title == "Long-meeting"
+
+
+def test_map_reduce_reduces_summaries_until_they_fit_the_budget():
+    """
+    Test that chunk summaries too long for one reduce prompt are summarized
+    again in groups first.
+    """
+    segments = [{"text": " " + "word " * 40} for _ in range(40)]
+    vm = make_voice_memo(" ".join(s["text"] for s in segments))
+    vm.transcript["segments"] = segments
+    client = MapReduceChatClient()
+
+    vm.summarize_and_title(client, "llama3.2:3b", token_budget=60)
+
+    map_calls = [m for m in client.user_messages if m.startswith("Voice memo part:")]
+    reduce_prompt = client.user_messages[-1]
+    summaries = [line.split(": ", 1)[1] for line in reduce_prompt.splitlines()[1:]]
+    assert len(map_calls) > 40
+    assert 1 < len(summaries) < 40
+    assert estimate_tokens("\n".join(summaries)) <= 60
+    assert vm.transcript_tldr == "A long meeting."
+
+
+def test_process_voice_memos_summarizes_chunks_concurrently(tmp_path):
+    """
+    Test that the map calls of a long transcript overlap, also with the
+    synchronous LLM client and a single LLM stage worker.
+    """
+    paths = {
+        name: tmp_path / name for name in ("original", "processed", "markdown", "db")
+    }
+    for path in paths.values():
+        path.mkdir()
+    make_corpus(paths["original"], 1, size_kb=160)
+    client = MapReduceChatClient(latency=0.1)
+
+    result = process_voice_memos(
+        path_voice_memos_original=paths["original"],
+        path_voice_memos_processed=paths["processed"],
+        path_markdown=paths["markdown"],
+        path_db=paths["db"],
+        asr_model=FakeASRModel(),
+        llm_client=client,
+        llm_model="stub",
+        max_file_size_mb=None,
+        map_reduce_token_budget=8,
+    )
+
+    assert len(result["completed"]) == 1
+    map_calls = [m for m in client.user_messages if m.startswith("Voice memo part:")]
+    assert len(map_calls) >= 4
+    assert client.max_in_flight == 4
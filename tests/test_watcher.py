@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+import pytest
+
+import app
+from app import watch_voice_memos
+from benchmarks.bench_pipeline import make_corpus
+from tests.conftest import SummaryChatClient
+from voice2md.stubs import FakeASRModel
+from voice2md.watcher import create_watcher, watch_settled_files
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_watch_settled_files_debounces_writes(tmp_path, use_inotify):
+    """
+    Test that a file is reported once, after it stopped being written.
+    """
+    watcher = create_watcher(tmp_path, use_inotify=use_inotify)
+    stop = threading.Event()
+    batches = []
+
+    def collect():
+        for batch in watch_settled_files(
+            watcher, settle_seconds=0.3, poll_interval=0.05, stop_event=stop
+        ):
+            batches.append((time.monotonic(), batch))
+
+    thread = threading.Thread(target=collect)
+    thread.start()
+    try:
+        path = tmp_path / "20241016 101010-ABCD.m4a"
+        with open(path, "wb") as f:
+            for i in range(5):
+                if i:
+                    time.sleep(0.1)
+                f.write(b"0" * 1024)
+                f.flush()
+        finished_writing = time.monotonic()
+        (tmp_path / "ignored.txt").write_text("not a voice memo")
+
+        deadline = time.monotonic() + 5
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+        watcher.close()
+
+    assert len(batches) == 1
+    reported_at, batch = batches[0]
+    assert batch == [path]
+    assert reported_at - finished_writing >= 0.25
+
+
+class ArrivalASRModel(FakeASRModel):
+    """
+    FakeASRModel that drops a new voice memo into a directory on its first call
+    and fails on memos with FAIL in their name.
+    """
+
+    def __init__(self, path_new_memo=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path_new_memo = path_new_memo
+        self.transcribed = []
+
+    def transcribe(self, audio, **options):
+        name = os.path.basename(str(audio))
+        if not self.transcribed and self.path_new_memo is not None:
+            self.path_new_memo.write_bytes(b"0" * 4096)
+        self.transcribed.append(name)
+        if "FAIL" in name:
+            raise RuntimeError(f"cannot transcribe {name}")
+        return super().transcribe(audio, **options)
+
+
+def make_run_kwargs(root, asr_model, **kwargs):
+    paths = {name: root / name for name in ("original", "processed", "markdown", "db")}
+    for path in paths.values():
+        path.mkdir(exist_ok=True)
+    return dict(
+        path_voice_memos_original=paths["original"],
+        path_voice_memos_processed=paths["processed"],
+        path_markdown=paths["markdown"],
+        path_db=paths["db"],
+        asr_model=asr_model,
+        llm_client=SummaryChatClient(),
+        llm_model="stub",
+        max_file_size_mb=None,
+        **kwargs,
+    )
+
+
+def watch_until(run_kwargs, done, timeout=10):
+    """Run watch_voice_memos with catch-up in a thread until done() or the timeout."""
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=watch_voice_memos,
+        args=(run_kwargs,),
+        kwargs=dict(settle_seconds=0.2, catch_up=True, stop_event=stop),
+    )
+    thread.start()
+    try:
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+    assert not thread.is_alive()
+
+
+def test_watch_voice_memos_processes_memos_arriving_during_catch_up(tmp_path):
+    """
+    Test that a memo written while the catch-up run transcribes is picked up
+    by the watcher afterwards, and that a failing memo does not stop the daemon.
+    """
+    (tmp_path / "original").mkdir()
+    (existing,) = make_corpus(tmp_path / "original", 1, size_kb=4)
+    failing = tmp_path / "original" / "20240101 070000-FAIL.m4a"
+    failing.write_bytes(b"0" * 4096)
+    arriving = tmp_path / "original" / "20241016 101010-ABCD.m4a"
+    asr_model = ArrivalASRModel(arriving)
+    run_kwargs = make_run_kwargs(tmp_path, asr_model)
+
+    watch_until(run_kwargs, lambda: arriving.name in asr_model.transcribed)
+
+    assert asr_model.transcribed == [failing.name, existing.name, arriving.name]
+    assert len(list((tmp_path / "markdown").glob("*.md"))) == 2
+
+
+def test_watch_voice_memos_skips_memos_the_catch_up_processed(tmp_path, monkeypatch):
+    """
+    Test that a memo written between starting the watcher and the catch-up
+    scan is processed once, even when overwriting.
+    """
+    (tmp_path / "original").mkdir()
+    memo = tmp_path / "original" / "20241016 101010-ABCD.m4a"
+
+    def create_watcher_then_write(directory):
+        watcher = create_watcher(directory)
+        memo.write_bytes(b"0" * 4096)
+        return watcher
+
+    batches = []
+
+    def recording_watch_settled_files(watcher, **kwargs):
+        for batch in watch_settled_files(watcher, **kwargs):
+            batches.append(batch)
+            yield batch
+
+    monkeypatch.setattr(app, "create_watcher", create_watcher_then_write)
+    monkeypatch.setattr(app, "watch_settled_files", recording_watch_settled_files)
+    asr_model = ArrivalASRModel()
+    run_kwargs = make_run_kwargs(tmp_path, asr_model, overwrite=True)
+
+    watch_until(run_kwargs, lambda: batches)
+
+    assert batches == [[memo]]
+    assert asr_model.transcribed == [memo.name]
@@ -0,0 +1,193 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+
+from app import run_worker
+from benchmarks.bench_pipeline import make_corpus
+from tests.conftest import SummaryChatClient
+from voice2md.storage import open_storage
+from voice2md.stubs import FakeASRModel
+from voice2md.work_queue import WorkQueue
+
+
+class LoggingASRModel(FakeASRModel):
+    """
+    FakeASRModel that appends the name of every transcribed file to a log shared by processes.
+    """
+
+    def __init__(self, log_path, **kwargs):
+        super().__init__(**kwargs)
+        self.log_path = log_path
+
+    def transcribe(self, audio, **options):
+        with open(self.log_path, "a") as f:
+            f.write(f"{os.path.basename(str(audio))}\n")
+        return super().transcribe(audio, **options)
+
+
+def work(root):
+    """Run one worker process over the memos in root."""
+    root = Path(root)
+    run_worker(
+        dict(
+            path_voice_memos_original=root / "original",
+            path_voice_memos_processed=root / "processed",
+            path_markdown=root / "markdown",
+            path_db=root / "db",
+            asr_model=LoggingASRModel(root / "asr.log", latency=0.3),
+            llm_client=SummaryChatClient(),
+            llm_model="stub",
+            max_file_size_mb=None,
+            journal_mode="DELETE",
+        ),
+        WorkQueue(root / "original", lease_seconds=2.0),
+        batch_size=2,
+    )
+
+
+def expire_lease(queue, name):
+    """Age the lease files of a memo as if their holder stopped its heartbeat."""
+    stale = time.time() - 600
+    for path in (queue.path / "leases" / name).iterdir():
+        os.utime(path, (stale, stale))
+
+
+def test_work_queue_claims_exclusively_and_takes_over_expired_leases(tmp_path):
+    """
+    Test that a claimed memo cannot be claimed twice until its lease expires.
+    """
+    crashed = WorkQueue(tmp_path, worker_id="crashed", lease_seconds=10)
+    other = WorkQueue(tmp_path, worker_id="other", lease_seconds=10)
+
+    assert crashed.claim("memo.m4a")
+    assert not other.claim("memo.m4a")
+
+    crashed.heartbeat()
+    assert not other.claim("memo.m4a")
+
+    # no heartbeat for longer than the lease
+    expire_lease(crashed, "memo.m4a")
+    assert other.claim("memo.m4a")
+    assert other.holds("memo.m4a") and not crashed.holds("memo.m4a")
+
+    # the old holder can neither refresh nor release the new lease
+    crashed.heartbeat()
+    crashed.release("memo.m4a")
+    assert other.holds("memo.m4a")
+    assert not WorkQueue(tmp_path, worker_id="third").claim("memo.m4a")
+
+    other.mark_done("memo.m4a")
+    assert not crashed.claim("memo.m4a")
+    assert list((other.path / "leases" / "memo.m4a").iterdir()) == []
+
+
+def test_work_queue_take_over_is_won_by_one_worker(tmp_path):
+    """
+    Test that of many workers taking over an expired lease at once, exactly one wins.
+    """
+    crashed = WorkQueue(tmp_path, worker_id="crashed", lease_seconds=10)
+    assert crashed.claim("memo.m4a")
+    expire_lease(crashed, "memo.m4a")
+    queues = [
+        WorkQueue(tmp_path, worker_id=f"w{i}", lease_seconds=10) for i in range(8)
+    ]
+    barrier = threading.Barrier(len(queues))
+    claimed = []
+
+    def claim(queue):
+        barrier.wait()
+        if queue.claim("memo.m4a"):
+            claimed.append(queue.worker_id)
+
+    threads = [threading.Thread(target=claim, args=(queue,)) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == 1
+    assert [queue.worker_id for queue in queues if queue.holds("memo.m4a")] == claimed
+
+
+class TakeOverASRModel(FakeASRModel):
+    """
+    FakeASRModel during whose call another worker takes over and finishes the memo.
+    """
+
+    def __init__(self, queue, other):
+        super().__init__()
+        self.queue = queue
+        self.other = other
+
+    def transcribe(self, audio, **options):
+        name = os.path.basename(str(audio))
+        expire_lease(self.queue, name)
+        assert self.other.claim(name)
+        self.other.mark_done(name)
+        return super().transcribe(audio, **options)
+
+
+def test_worker_drops_result_of_lost_lease(tmp_path):
+    """
+    Test that a worker whose lease was taken over neither stores nor marks the memo.
+    """
+    for name in ("original", "processed", "markdown", "db"):
+        (tmp_path / name).mkdir()
+    make_corpus(tmp_path / "original", 1, size_kb=4)
+    queue = WorkQueue(tmp_path / "original", worker_id="slow")
+    other = WorkQueue(tmp_path / "original", worker_id="other")
+
+    counts = run_worker(
+        dict(
+            path_voice_memos_original=tmp_path / "original",
+            path_voice_memos_processed=tmp_path / "processed",
+            path_markdown=tmp_path / "markdown",
+            path_db=tmp_path / "db",
+            asr_model=TakeOverASRModel(queue, other),
+            llm_client=SummaryChatClient(),
+            llm_model="stub",
+            max_file_size_mb=None,
+        ),
+        queue,
+    )
+
+    assert counts == {"done": 0, "failed": 0}
+    (done,) = (tmp_path / "original" / ".voice2md-queue" / "done").iterdir()
+    assert json.loads(done.read_text())["worker"] == "other"
+    with open_storage(tmp_path / "db") as storage:
+        assert len(storage) == 0
+    assert list((tmp_path / "markdown").glob("*.md")) == []
+
+
+def test_workers_in_several_processes_share_the_queue(tmp_path):
+    """
+    Test that three worker processes process every memo exactly once, including
+    one leased by a worker that crashed.
+    """
+    for name in ("original", "processed", "markdown", "db"):
+        (tmp_path / name).mkdir()
+    make_corpus(tmp_path / "original", 8, size_kb=4)
+    memos = sorted(path.name for path in (tmp_path / "original").glob("*.m4a"))
+    crashed = WorkQueue(tmp_path / "original", worker_id="crashed")
+    assert crashed.claim(memos[0])
+    expire_lease(crashed, memos[0])
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=work, args=(str(tmp_path),)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    transcribed = (tmp_path / "asr.log").read_text().splitlines()
+    assert sorted(transcribed) == memos
+    done = tmp_path / "original" / ".voice2md-queue" / "done"
+    assert sorted(path.name for path in done.iterdir()) == memos
+    assert len({json.loads(path.read_text())["worker"] for path in done.iterdir()}) > 1
+    with open_storage(tmp_path / "db") as storage:
+        assert len(storage) == len(memos)
+    assert len(list((tmp_path / "markdown").glob("*.md"))) == len(memos)
@@ -0,0 +1,232 @@
+import threading
+import time
+
+import numpy as np
+
+from voice2md.logger_config import setup_logger
+from voice2md.segmenter import SAMPLE_RATE, stream_audio
+
+logger = setup_logger(__name__)
+
+# Relative speed of the Whisper models, from the openai-whisper README
+MODEL_SPEED = {"tiny": 10, "base": 7, "small": 4, "medium": 2, "large": 1, "turbo": 8}
+DETECTION_SECONDS = 30  # Whisper detects the language on one 30 s window
+
+
+def whisper_detect_language(model, audio, languages):
+    """
+    Detect the language of a waveform with a Whisper model, among the allowed languages.
+
+    Args:
+        model: Whisper model (or LazyModel of one).
+        audio (np.ndarray): float32 waveform, of which the first 30 s are used.
+        languages (tuple[str]): Allowed language codes, e.g. ("en", "de").
+
+    Returns:
+        str: The most probable allowed language.
+    """
+    import whisper
+
+    window = whisper.pad_or_trim(np.asarray(audio, dtype=np.float32))
+    mel = whisper.log_mel_spectrogram(window, n_mels=model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(languages, key=lambda language: probs.get(language, 0.0))
+
+
+class AdaptiveASRModel:
+    """
+    Whisper-compatible model that picks the cheapest model tier per memo.
+
+    The language is detected once on the first 30 s with a small model and
+    passed explicitly. Short memos are transcribed with the short tier (tiny),
+    the others with the fast tier (base). Segments that look unreliable
+    (avg_logprob below min_avg_logprob while no_speech_prob says it is speech)
+    are transcribed again with the escalation tier (medium); if they make up
+    more than max_escalated_fraction of the memo, the whole memo is.
+
+    The returned transcript has an "asr" entry with the language, the tiers
+    used and the estimated seconds saved against transcribing everything with
+    the escalation tier. Not safe for concurrent calls, like a Whisper model.
+    """
+
+    def __init__(
+        self,
+        models,
+        short_tier="tiny",
+        fast_tier="base",
+        escalation_tier="medium",
+        detection_tier="tiny",
+        languages=("en", "de"),
+        short_seconds=30.0,
+        min_avg_logprob=-0.8,
+        no_speech_threshold=0.6,
+        max_escalated_fraction=0.5,
+        detect_language=whisper_detect_language,
+    ):
+        """
+        Initialize the model.
+
+        Args:
+            models (dict): Model per tier name, e.g. LazyModels from load_whisper_model.
+            short_tier (str): Tier of memos up to short_seconds. Defaults to "tiny".
+            fast_tier (str): Tier of all other memos. Defaults to "base".
+            escalation_tier (str): Tier of unreliable segments. Defaults to "medium".
+            detection_tier (str): Tier detecting the language. Defaults to "tiny".
+            languages (tuple[str]): Languages of the memos. Defaults to ("en", "de").
+            short_seconds (float): Length up to which a memo is short. Defaults to 30.
+            min_avg_logprob (float): Segments below this average log probability
+                are escalated. Defaults to -0.8.
+            no_speech_threshold (float): Segments with a higher no_speech_prob are
+                silence and never escalated. Defaults to 0.6.
+            max_escalated_fraction (float): Fraction of unreliable audio above which
+                the whole memo is escalated. Defaults to 0.5.
+            detect_language (callable): Function (model, waveform, languages) -> code.
+        """
+        self.models = models
+        self.short_tier = short_tier
+        self.fast_tier = fast_tier
+        self.escalation_tier = escalation_tier
+        self.detection_tier = detection_tier
+        self.languages = tuple(languages)
+        self.short_seconds = short_seconds
+        self.min_avg_logprob = min_avg_logprob
+        self.no_speech_threshold = no_speech_threshold
+        self.max_escalated_fraction = max_escalated_fraction
+        self.detect_language = detect_language
+        self._lock = threading.Lock()
+
+    @property
+    def cache_name(self):
+        """
+        Name for the transcript cache key, covering the tiers and every setting
+        that changes the transcript, e.g. "adaptive:tiny/base/medium:detect=tiny:...".
+        """
+        tiers = "/".join((self.short_tier, self.fast_tier, self.escalation_tier))
+        return (
+            f"adaptive:{tiers}:detect={self.detection_tier}"
+            f":lang={','.join(self.languages)}:short={self.short_seconds}"
+            f":logprob={self.min_avg_logprob}:no_speech={self.no_speech_threshold}"
+            f":escalate={self.max_escalated_fraction}"
+        )
+
+    def _head(self, audio):
+        """Return the first samples of the audio and whether they are all of it."""
+        if not isinstance(audio, str):
+            return audio, True
+        limit = int(max(DETECTION_SECONDS, self.short_seconds) * SAMPLE_RATE)
+        blocks = stream_audio(audio, block_seconds=limit / SAMPLE_RATE)
+        try:
+            head = next(blocks, np.zeros(0, dtype=np.float32))
+            complete = next(blocks, None) is None
+        finally:
+            blocks.close()
+        return head, complete
+
+    def _is_unreliable(self, segment):
+        return (
+            segment.get("avg_logprob", 0.0) < self.min_avg_logprob
+            and segment.get("no_speech_prob", 0.0) < self.no_speech_threshold
+        )
+
+    def _unreliable_ranges(self, segments):
+        """Merge the time ranges of consecutive unreliable segments."""
+        ranges = []
+        for segment in segments:
+            if not self._is_unreliable(segment):
+                continue
+            if ranges and segment["start"] - ranges[-1][1] < 1.0:
+                ranges[-1][1] = segment["end"]
+            else:
+                ranges.append([segment["start"], segment["end"]])
+        return ranges
+
+    def _timed(self, tier, audio, **options):
+        start = time.perf_counter()
+        transcript = self.models[tier].transcribe(audio, **options)
+        return transcript, time.perf_counter() - start
+
+    def transcribe(self, audio, **options):
+        """
+        Transcribe an audio file or waveform with the cheapest sufficient tier.
+
+        Args:
+            audio (str or np.ndarray): Path of the audio file or 16 kHz waveform.
+            **options: Keyword arguments passed to whisper's transcribe. An
+                explicit language skips language detection.
+
+        Returns:
+            dict: Whisper transcript dict with an additional "asr" entry.
+        """
+        with self._lock:
+            return self._transcribe(audio, **options)
+
+    def _transcribe(self, audio, **options):
+        start = time.perf_counter()
+        head, complete = self._head(audio)
+        if not options.get("language"):
+            options["language"] = self.detect_language(
+                self.models[self.detection_tier],
+                head[: DETECTION_SECONDS * SAMPLE_RATE],
+                self.languages,
+            )
+        short = complete and len(head) <= self.short_seconds * SAMPLE_RATE
+        if short:
+            # the whole memo is decoded already
+            audio = head
+        tier = self.short_tier if short else self.fast_tier
+        transcript, seconds = self._timed(tier, audio, **options)
+        tiers = [tier]
+        segments = transcript.get("segments", [])
+        duration = (
+            len(audio) / SAMPLE_RATE
+            if not isinstance(audio, str)
+            else (segments[-1]["end"] if segments else 0.0)
+        )
+        # what the escalation tier alone would have taken
+        baseline = (
+            seconds
+            * MODEL_SPEED.get(tier, 1)
+            / MODEL_SPEED.get(self.escalation_tier, 1)
+        )
+
+        ranges = self._unreliable_ranges(segments)
+        escalated_seconds = sum(end - begin for begin, end in ranges)
+        if ranges and escalated_seconds > self.max_escalated_fraction * max(
+            duration, 1e-9
+        ):
+            transcript, _ = self._timed(self.escalation_tier, audio, **options)
+            tiers.append(self.escalation_tier)
+            escalated_seconds = duration
+        elif ranges:
+            clip = [t for begin, end in ranges for t in (begin, end)]
+            partial, _ = self._timed(
+                self.escalation_tier, audio, clip_timestamps=clip, **options
+            )
+            kept = [s for s in segments if not self._is_unreliable(s)]
+            merged = sorted(
+                kept + partial.get("segments", []), key=lambda s: s["start"]
+            )
+            for i, segment in enumerate(merged):
+                segment["id"] = i
+            transcript = dict(
+                transcript,
+                segments=merged,
+                text="".join(segment["text"] for segment in merged),
+            )
+            tiers.append(self.escalation_tier)
+
+        total = time.perf_counter() - start
+        transcript["language"] = transcript.get("language") or options["language"]
+        transcript["asr"] = {
+            "language": options["language"],
+            "tiers": tiers,
+            "audio_seconds": round(duration, 2),
+            "escalated_seconds": round(escalated_seconds, 2),
+            "seconds": round(total, 3),
+            "estimated_seconds_saved": round(baseline - total, 3),
+        }
+        logger.info(
+            f"Transcribed {duration:.0f}s of {options['language']} audio with "
+            f"{'+'.join(tiers)} in {total:.1f}s"
+        )
+        return transcript
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def load_pinned_whisper_model(model_name, torch_threads):
+    """Pin the torch threads of this process and load a Whisper model."""
+    import torch
+    import whisper
+
+    torch.set_num_threads(torch_threads)
+    return whisper.load_model(model_name)
+
+
+def _init_worker(load_model, model_name, torch_threads):
+    """Load the model once per worker process."""
+    global _worker_model
+    _worker_model = load_model(model_name, torch_threads)
+    logger.info(
+        f"Worker {os.getpid()} loaded whisper model {model_name} with {torch_threads} torch threads"
+    )
+
+
+def _transcribe(job):
+    """Transcribe one audio file (or memory-mapped .npy waveform) in a worker process."""
+    audio, options = job
+    if isinstance(audio, str) and audio.endswith(".npy"):
+        import numpy as np
+
+        return audio, _worker_model.transcribe(np.load(audio, mmap_mode="c"), **options)
+    return audio, _worker_model.transcribe(audio, **options)
+
+
+class TranscriptionPool:
+    """
+    Pool of worker processes that each hold a resident Whisper model.
+
+    Exposes the same transcribe() call as a Whisper model, so it can be passed
+    wherever an ASR model is expected (e.g. VoiceMemo.transcribe). All callers
+    share the pool's work queue; feeding the longest memos first
+    (process_voice_memos(longest_first=True)) keeps the workers evenly busy.
+    If a worker process dies (e.g. killed for running out of memory), the
+    pending calls raise BrokenProcessPool and the next call starts a new pool.
+    processes x torch_threads should match the number of cores, so the
+    workers do not oversubscribe the CPU.
+    Decoded waveforms can be passed as .npy paths, which workers memory-map.
+    """
+
+    accepts_npy_paths = True
+
+    def __init__(
+        self,
+        model_name="medium",
+        processes=2,
+        torch_threads=None,
+        load_model=load_pinned_whisper_model,
+    ):
+        """
+        Initialize the pool. Worker processes are started on first use.
+
+        Args:
+            model_name (str): Whisper model name. Defaults to "medium".
+            processes (int): Number of worker processes. Defaults to 2.
+            torch_threads (int, optional): Torch threads per worker. Defaults to
+                the number of cores divided by the number of processes.
+            load_model (callable): Picklable function (model_name, torch_threads)
+                -> model, called once in every worker process. Defaults to
+                load_pinned_whisper_model.
+        """
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.torch_threads = torch_threads or max(
+            1, (os.cpu_count() or 1) // self.processes
+        )
+        self.load_model = load_model
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_name(self):
+        """Name of the model in transcript cache keys."""
+        return self.model_name
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                logger.info(
+                    f"Starting {self.processes} transcription worker(s) x {self.torch_threads} torch thread(s)"
+                )
+                # spawn avoids forking a parent that may already hold torch state
+                self._pool = ProcessPoolExecutor(
+                    self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.load_model, self.model_name, self.torch_threads),
+                )
+            return self._pool
+
+    def _discard(self, pool):
+        """Drop a pool whose worker died, unless another caller already did."""
+        with self._lock:
+            if self._pool is pool:
+                logger.error("A transcription worker died, restarting the pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def transcribe(self, audio, **options):
+        """
+        Transcribe a single audio file on the next free worker.
+
+        Args:
+            audio (str or np.ndarray): Path of the audio file or .npy waveform, or
+                the waveform itself.
+            **options: Keyword arguments passed to whisper's transcribe.
+
+        Returns:
+            dict: Whisper transcript dict.
+
+        Raises:
+            BrokenProcessPool: A worker process died while the call was pending.
+        """
+        pool = self._get_pool()
+        try:
+            _, transcript = pool.submit(_transcribe, (audio, options)).result()
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+        return transcript
+
+    def close(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,86 @@
+from voice2md.disk_cache import DiskCache, make_key
+from voice2md.logger_config import setup_logger
+from voice2md.sync_manifest import file_digest
+
+logger = setup_logger(__name__)
+
+
+class AudioCache(DiskCache):
+    """
+    Size-bounded cache of decoded 16 kHz mono float32 waveforms as .npy files.
+
+    Each audio file is decoded with ffmpeg once; later transcriptions load the
+    waveform memory-mapped (copy-on-write, since torch expects writable
+    arrays), so retries, reruns and model comparisons spawn no
+    ffmpeg process, and several worker processes share the page cache of the
+    same waveform.
+    """
+
+    def __init__(self, directory, max_size_mb=None):
+        """
+        Initialize the cache.
+
+        Args:
+            directory (Path): Cache directory, created if missing.
+            max_size_mb (float, optional): Size bound of the cache. Defaults to unbounded.
+        """
+        super().__init__(directory, max_size_mb=max_size_mb, suffix=".npy")
+
+    def waveform_path(self, audio_path):
+        """
+        Return the .npy sidecar of an audio file, decoding it on a miss.
+
+        Args:
+            audio_path (Path): Audio file.
+
+        Returns:
+            Path: Path of the cached waveform.
+        """
+        # numpy is imported on first use, so runs with nothing to do stay fast
+        import numpy as np
+
+        from voice2md.segmenter import SAMPLE_RATE, stream_audio
+
+        key = make_key(file_digest(audio_path), SAMPLE_RATE)
+        path = self.lookup(key)
+        if path is None:
+            audio = np.concatenate(list(stream_audio(audio_path)) or [np.zeros(0)])
+            with self.writer(key, "wb") as f:
+                np.save(f, audio.astype(np.float32, copy=False))
+            logger.info(f"Decoded {audio_path} ({len(audio) / SAMPLE_RATE:.1f}s)")
+            path = self.path_for(key)
+        return path
+
+    def load(self, audio_path):
+        """
+        Return the decoded waveform of an audio file, memory-mapped copy-on-write.
+
+        Args:
+            audio_path (Path): Audio file.
+
+        Returns:
+            np.ndarray: float32 waveform at 16 kHz.
+        """
+        import numpy as np
+
+        return np.load(self.waveform_path(audio_path), mmap_mode="c")
+
+    def audio_for(self, asr_model, audio_path):
+        """
+        Return the cached audio in the form the ASR model takes best.
+
+        Models that load .npy files themselves (TranscriptionPool workers) get
+        the path, so each process maps the file instead of receiving a pickled
+        copy; in-process models get the memory-mapped array.
+
+        Args:
+            asr_model: ASR model.
+            audio_path (Path): Audio file.
+
+        Returns:
+            str or np.ndarray: Path of the .npy file or memory-mapped waveform.
+        """
+        # looked up on the class, so a LazyModel is not loaded just to answer
+        if getattr(type(asr_model), "accepts_npy_paths", False):
+            return str(self.waveform_path(audio_path))
+        return self.load(audio_path)
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+STATS_FILE_NAME = "_stats.json"
+
+
+def make_key(*parts):
+    """
+    Build a cache key from JSON-serializable parts.
+
+    Args:
+        *parts: Values identifying the cached result (digests, model names, options).
+
+    Returns:
+        str: SHA-256 hex digest of the canonical JSON encoding of the parts.
+    """
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _json_default(obj):
+    """Convert NumPy scalars and arrays (e.g. in Whisper results) to builtins."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class DiskCache:
+    """
+    Size-bounded on-disk cache with LRU eviction.
+
+    Each entry is one file under the cache directory, sharded by the first two
+    characters of its key. An entry's mtime is its creation time (used for the
+    TTL) and its atime is refreshed on every hit, so eviction can remove the
+    least recently used files first. Hit/miss counters are kept for
+    the current process and accumulated in a stats file on flush_stats().
+    """
+
+    def __init__(self, directory, max_size_mb=None, ttl_seconds=None, suffix=".json"):
+        """
+        Initialize the cache.
+
+        Args:
+            directory (Path): Cache directory, created if missing.
+            max_size_mb (float, optional): Size bound of the cache. Defaults to unbounded.
+            ttl_seconds (float, optional): Maximum age of an entry. Defaults to no expiry.
+            suffix (str): File suffix of the entries. Defaults to ".json".
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = (
+            int(max_size_mb * 1024 * 1024) if max_size_mb is not None else None
+        )
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._size_bytes = None
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        """Return the file path of the entry for a key."""
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def _record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, key):
+        """
+        Return the path of a live entry and mark it as recently used, or None.
+
+        Counts a hit or a miss.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Path: Entry path, or None on a miss or an expired entry.
+        """
+        path = self.path_for(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._record(False)
+            return None
+        now = time.time()
+        if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+            self._remove(path)
+            self._record(False)
+            return None
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            self._record(False)
+            return None
+        self._record(True)
+        return path
+
+    def get(self, key):
+        """
+        Return the cached value for a key, or None.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Cached JSON value, or None on a miss.
+        """
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value under a key.
+
+        Args:
+            key (str): Cache key.
+            value: JSON-serializable value.
+        """
+        with self.writer(key) as f:
+            json.dump(value, f, default=_json_default)
+
+    def writer(self, key, mode="w"):
+        """
+        Open an atomic writer for the entry of a key.
+
+        The entry becomes visible only once the returned context manager exits
+        without error; the cache is then evicted down to its size bound.
+
+        Args:
+            key (str): Cache key.
+            mode (str): File mode, "w" or "wb". Defaults to "w".
+
+        Returns:
+            Context manager yielding a file object.
+        """
+        return _AtomicEntryWriter(self, self.path_for(key), mode)
+
+    def _added(self, path):
+        size = path.stat().st_size
+        with self._lock:
+            if self._size_bytes is not None:
+                self._size_bytes += size
+            over_limit = self.max_size_bytes is not None and (
+                self._size_bytes is None or self._size_bytes > self.max_size_bytes
+            )
+        if over_limit:
+            # an entry larger than the bound stays until the next one is added,
+            # so the caller can still read it
+            self.evict(keep=path)
+
+    def _remove(self, path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._size_bytes is not None:
+                self._size_bytes -= size
+
+    def entries(self):
+        """
+        List the cache entries.
+
+        Returns:
+            list[tuple]: (path, size in bytes, last used, created) per entry.
+        """
+        result = []
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            result.append((path, stat.st_size, stat.st_atime, stat.st_mtime))
+        return result
+
+    def evict(self, max_size_mb=None, keep=None):
+        """
+        Remove expired entries, then least recently used ones until the size bound holds.
+
+        Args:
+            max_size_mb (float, optional): Size bound to evict to. Defaults to the
+                bound the cache was created with.
+            keep (Path, optional): Entry not to remove, e.g. the one just written.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        max_size_bytes = (
+            int(max_size_mb * 1024 * 1024)
+            if max_size_mb is not None
+            else self.max_size_bytes
+        )
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(entry[1] for entry in entries)
+        removed = 0
+        now = time.time()
+        for path, size, _, created in entries:
+            if path == keep:
+                continue
+            expired = self.ttl_seconds is not None and now - created > self.ttl_seconds
+            if not expired and (max_size_bytes is None or total <= max_size_bytes):
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size_bytes = total
+        if removed:
+            logger.info(f"Evicted {removed} entries from {self.directory}")
+        return removed
+
+    def clear(self):
+        """Remove all entries."""
+        for path, *_ in self.entries():
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._size_bytes = 0
+
+    def flush_stats(self, **extra):
+        """
+        Add the counters of this process to the persisted totals and reset them.
+
+        Args:
+            **extra: Additional numeric counters to accumulate (e.g. seconds saved).
+
+        Returns:
+            dict: The persisted totals.
+        """
+        with self._lock:
+            counters = {"hits": self.hits, "misses": self.misses, **extra}
+            self.hits = 0
+            self.misses = 0
+        totals = self.persisted_stats()
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+        tmp_path = self.directory / f"{STATS_FILE_NAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(totals, f)
+        os.replace(tmp_path, self.directory / STATS_FILE_NAME)
+        return totals
+
+    def persisted_stats(self):
+        """Return the accumulated counters from the stats file."""
+        try:
+            with open(self.directory / STATS_FILE_NAME, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def stats(self):
+        """
+        Summarize the cache content and counters.
+
+        Returns:
+            dict: Number of entries, size in MB, and hit/miss counters including
+                the ones of the current process.
+        """
+        entries = self.entries()
+        totals = self.persisted_stats()
+        hits = totals.get("hits", 0) + self.hits
+        misses = totals.get("misses", 0) + self.misses
+        return {
+            **totals,
+            "entries": len(entries),
+            "size_mb": round(sum(entry[1] for entry in entries) / (1024 * 1024), 2),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+
+
+class _AtomicEntryWriter:
+    """Writes a cache entry to a temporary file and renames it into place."""
+
+    def __init__(self, cache, path, mode):
+        self.cache = cache
+        self.path = path
+        self.mode = mode
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_name = tempfile.mkstemp(
+            dir=self.path.parent, prefix=".", suffix=".tmp"
+        )
+        self.file = os.fdopen(fd, self.mode)
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is not None:
+            os.unlink(self.tmp_name)
+            return False
+        os.replace(self.tmp_name, self.path)
+        self.cache._added(self.path)
+        return False
@@ -0,0 +1,379 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+JOBS_FILE_NAME = "jobs.sqlite"
+# Stages of a voice memo, in processing order
+STAGES = ("copied", "transcribed", "summarized", "titled", "rendered", "persisted")
+
+
+class QuarantinedError(RuntimeError):
+    """A voice memo failed too often and is set aside until it is requeued."""
+
+
+class RetryLaterError(RuntimeError):
+    """A stage of a voice memo failed and is retried by a later run."""
+
+
+def is_unavailable(error):
+    """
+    Return whether an error means that a service (e.g. Ollama) is unreachable or
+    overloaded, rather than that the memo cannot be processed.
+    """
+    import openai
+
+    while error is not None:
+        if isinstance(
+            error, (ConnectionError, TimeoutError, openai.APIConnectionError)
+        ) or (
+            isinstance(error, openai.APIStatusError)
+            and error.status_code in (429, 502, 503, 504)
+        ):
+            return True
+        error = error.__cause__
+    return False
+
+
+class JobStore:
+    """
+    Persistent per-memo processing state, for resuming interrupted runs.
+
+    Each voice memo (by processed file name) has a job with the last stage it
+    completed, the artifacts of the completed stages (transcript, summary,
+    title) and the attempts at its next stage. An attempt is counted before
+    the stage runs, so a memo that crashes the whole process is counted too.
+    A failed stage is not retried in place, which would hold up a pipeline
+    worker: the memo is left for a later run, after an exponential backoff.
+    Failures because a service is unavailable are not counted as attempts.
+    A memo whose next stage failed max_attempts times is quarantined: it is
+    skipped by later runs until requeued.
+
+    Jobs live in a SQLite file in WAL mode; every change is committed at once,
+    so the state survives a crash of the process.
+    """
+
+    def __init__(self, path, max_attempts=3, backoff_seconds=5.0):
+        """
+        Open (and if needed create) the job database.
+
+        Args:
+            path (Path): Path of the SQLite file.
+            max_attempts (int): Attempts at a stage before the memo is quarantined.
+                Defaults to 3.
+            backoff_seconds (float): Earliest retry of a failed stage after the
+                first failure, doubled for every further failure. Defaults to 5.
+        """
+        self.path = Path(path)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    file_name TEXT PRIMARY KEY,
+                    file_path_original TEXT NOT NULL,
+                    stage TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    quarantined INTEGER NOT NULL DEFAULT 0,
+                    artifacts TEXT NOT NULL DEFAULT '{}',
+                    updated_at REAL NOT NULL,
+                    retry_after REAL
+                )
+                """)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+            if "retry_after" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN retry_after REAL")
+
+    @staticmethod
+    def _job(row):
+        return {
+            "file_name": row[0],
+            "file_path_original": row[1],
+            "stage": row[2],
+            "attempts": row[3],
+            "last_error": row[4],
+            "quarantined": bool(row[5]),
+            "artifacts": json.loads(row[6]),
+            "updated_at": row[7],
+            "retry_after": row[8],
+        }
+
+    def get(self, file_name):
+        """Return the job of a file name, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def _update(self, file_name, **columns):
+        columns["updated_at"] = time.time()
+        if "artifacts" in columns:
+            columns["artifacts"] = json.dumps(columns["artifacts"])
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE file_name = ?",
+                (*columns.values(), file_name),
+            )
+
+    def begin(self, file_name, file_path_original):
+        """
+        Return the job of a memo about to be processed, creating it if needed.
+
+        The job of a memo that was persisted before starts over, so that a
+        memo processed again (e.g. with overwrite) goes through every stage.
+
+        Args:
+            file_name (str): Processed file name of the memo.
+            file_path_original (Path): Path of the original voice memo.
+
+        Returns:
+            dict: The job.
+        """
+        with self._lock:
+            job = self.get(file_name)
+            if job is None or job["stage"] == STAGES[-1]:
+                with self._conn:
+                    self._conn.execute(
+                        """
+                        INSERT INTO jobs (file_name, file_path_original, updated_at)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT (file_name) DO UPDATE SET
+                            file_path_original = excluded.file_path_original,
+                            stage = NULL, attempts = 0, last_error = NULL,
+                            quarantined = 0, artifacts = '{}', retry_after = NULL,
+                            updated_at = excluded.updated_at
+                        """,
+                        (file_name, str(file_path_original), time.time()),
+                    )
+                job = self.get(file_name)
+            return job
+
+    def reached(self, file_name, stage):
+        """Return whether a memo completed the given stage."""
+        job = self.get(file_name)
+        return (
+            job is not None
+            and job["stage"] is not None
+            and STAGES.index(job["stage"]) >= STAGES.index(stage)
+        )
+
+    def advance(self, file_name, stage, **artifacts):
+        """
+        Record that a memo completed a stage, with the artifacts it produced.
+
+        Moving to a later stage resets the attempt count; the stage never moves
+        backwards.
+
+        Args:
+            file_name (str): Processed file name of the memo.
+            stage (str): Completed stage, one of STAGES.
+            **artifacts: JSON-serializable results to resume from, e.g. transcript.
+        """
+        with self._lock:
+            job = self.get(file_name)
+            merged = {**job["artifacts"], **artifacts}
+            if stage == STAGES[-1]:
+                # the stored record holds everything from here on
+                merged = {}
+            if self.reached(file_name, stage):
+                self._update(file_name, artifacts=merged)
+            else:
+                self._update(
+                    file_name,
+                    stage=stage,
+                    attempts=0,
+                    last_error=None,
+                    retry_after=None,
+                    artifacts=merged,
+                )
+
+    def save_artifacts(self, file_name, **artifacts):
+        """
+        Keep artifacts of a stage that did not complete, e.g. the summary when
+        only the title failed, without changing the stage or its attempts.
+        """
+        with self._lock:
+            job = self.get(file_name)
+            self._update(file_name, artifacts={**job["artifacts"], **artifacts})
+
+    def _start_attempt(self, file_name):
+        with self._lock:
+            job = self.get(file_name)
+            if job["quarantined"]:
+                raise QuarantinedError(
+                    f"{file_name} is quarantined: {job['last_error']}"
+                )
+            if job["attempts"] >= self.max_attempts:
+                # the earlier attempts died with the process
+                self._update(
+                    file_name,
+                    quarantined=1,
+                    last_error=job["last_error"] or "interrupted",
+                )
+                raise QuarantinedError(
+                    f"{file_name} was interrupted {job['attempts']} times"
+                )
+            self._update(file_name, attempts=job["attempts"] + 1)
+            return job["attempts"] + 1
+
+    def run(self, file_name, stage, func, artifacts=None):
+        """
+        Run a stage of a memo and checkpoint it, or record its failure.
+
+        Args:
+            file_name (str): Processed file name of the memo.
+            stage (str): Stage the function completes, one of STAGES.
+            func (callable): Function without arguments running the stage.
+            artifacts (callable, optional): Returns the artifacts to checkpoint
+                after func succeeded, as a dict.
+
+        Returns:
+            The result of func.
+
+        Raises:
+            RetryLaterError: The stage failed and is retried by a later run.
+            QuarantinedError: The stage failed max_attempts times, or the memo
+                was quarantined before.
+        """
+        attempt = self._start_attempt(file_name)
+        try:
+            result = func()
+        except Exception as e:
+            error = f"{stage}: {type(e).__name__}: {e}"
+            if is_unavailable(e):
+                with self._lock:
+                    self._update(file_name, attempts=attempt - 1, last_error=error)
+                logger.warning(
+                    f"{stage} of {file_name} failed because a service is "
+                    f"unavailable ({e}), retrying next run"
+                )
+                raise RetryLaterError(f"{file_name} failed at {stage}") from e
+            if attempt >= self.max_attempts:
+                with self._lock:
+                    self._update(file_name, last_error=error, quarantined=1)
+                logger.error(
+                    f"Quarantined {file_name} after {attempt} failed attempt(s) "
+                    f"at {stage}: {e}"
+                )
+                raise QuarantinedError(f"{file_name} failed at {stage}") from e
+            delay = self.backoff_seconds * 2 ** (attempt - 1)
+            with self._lock:
+                self._update(
+                    file_name, last_error=error, retry_after=time.time() + delay
+                )
+            logger.warning(
+                f"Attempt {attempt} at {stage} of {file_name} failed ({e}), "
+                f"retrying in a run after {delay:.0f}s"
+            )
+            raise RetryLaterError(f"{file_name} failed at {stage}") from e
+        self.advance(file_name, stage, **(artifacts() if artifacts else {}))
+        return result
+
+    def pending(self):
+        """Return the jobs that were started but not persisted, except quarantined ones."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE (stage IS NULL OR stage != ?) "
+                "AND quarantined = 0 ORDER BY file_name",
+                (STAGES[-1],),
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def quarantined(self):
+        """Return the quarantined jobs."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE quarantined = 1 ORDER BY file_name"
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def requeue(self, file_name):
+        """
+        Release a memo from quarantine, to be resumed by the next run.
+
+        Returns:
+            bool: Whether the memo was quarantined.
+        """
+        with self._lock:
+            job = self.get(file_name)
+            if job is None or not job["quarantined"]:
+                return False
+            self._update(file_name, quarantined=0, attempts=0)
+            return True
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_job_store(path_db, **kwargs):
+    """
+    Open the job database in a database directory.
+
+    Args:
+        path_db (Path): Database directory.
+        **kwargs: Keyword arguments for JobStore.
+
+    Returns:
+        JobStore: The job store.
+    """
+    return JobStore(Path(path_db) / JOBS_FILE_NAME, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List or requeue quarantined voice memos"
+    )
+    parser.add_argument(
+        "--path-db",
+        type=Path,
+        default=None,
+        help="Database directory (default: $PATH_DB)",
+    )
+    parser.add_argument(
+        "--requeue",
+        nargs="+",
+        default=[],
+        metavar="FILE_NAME",
+        help="Release these memos from quarantine",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    path_db = args.path_db or Path(os.getenv("PATH_DB"))
+    with open_job_store(path_db) as jobs:
+        for file_name in args.requeue:
+            if jobs.requeue(file_name):
+                print(f"Requeued {file_name}")
+            else:
+                print(f"{file_name} is not quarantined")
+        if not args.requeue:
+            for job in jobs.quarantined():
+                print(f"{job['file_name']}\t{job['stage'] or '-'}\t{job['last_error']}")
+
+
+if __name__ == "__main__":
+    main()
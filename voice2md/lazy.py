@@ -0,0 +1,103 @@
+import importlib
+import threading
+import time
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def timed_import(module_name):
+    """
+    Import a module and log how long the import took.
+
+    Args:
+        module_name (str): Name of the module.
+
+    Returns:
+        module: The imported module.
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    logger.info(f"Imported {module_name} in {time.perf_counter() - start:.2f}s")
+    return module
+
+
+class LazyModel:
+    """
+    Proxy that constructs an expensive object (ASR model, LLM client) on first use.
+
+    Attribute access is forwarded to the object, which is built by the loader
+    the first time it is needed, so a run with nothing to do never pays for
+    heavy imports or model loading. cache_name is answered by the proxy, so
+    building a cache key does not load the model.
+    """
+
+    def __init__(self, loader, name, cache_name=None):
+        """
+        Initialize the proxy.
+
+        Args:
+            loader (callable): Function without arguments returning the object.
+            name (str): Name used in the timing log.
+            cache_name (str, optional): Name of the model in cache keys.
+        """
+        self._loader = loader
+        self._name = name
+        self.cache_name = cache_name
+        self._obj = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """Whether the object has been constructed."""
+        return self._obj is not None
+
+    def get(self):
+        """Return the object, constructing it on first call."""
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    start = time.perf_counter()
+                    self._obj = self._loader()
+                    logger.info(
+                        f"Loaded {self._name} in {time.perf_counter() - start:.2f}s"
+                    )
+        return self._obj
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+
+def load_whisper_model(model_name):
+    """
+    Return a LazyModel that imports whisper and loads the model on first use.
+
+    Args:
+        model_name (str): Whisper model name.
+
+    Returns:
+        LazyModel: Proxy of the Whisper model.
+    """
+    return LazyModel(
+        lambda: timed_import("whisper").load_model(model_name),
+        f"whisper model {model_name}",
+        cache_name=model_name,
+    )
+
+
+def load_openai_client(base_url, api_key):
+    """
+    Return a LazyModel that imports openai and builds the client on first use.
+
+    Args:
+        base_url (str): Base URL of the OpenAI-compatible server.
+        api_key (str): API key.
+
+    Returns:
+        LazyModel: Proxy of the OpenAI client.
+    """
+    return LazyModel(
+        lambda: timed_import("openai").OpenAI(base_url=base_url, api_key=api_key),
+        "OpenAI client",
+    )
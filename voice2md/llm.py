@@ -1,94 +1,389 @@
-import ollama
+import contextvars
+import json
+import math
+import re
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
+from voice2md.logger_config import setup_logger
+from voice2md.metrics import record_llm_usage
+from voice2md.prompts import system_prompt
 
-def llm_summarize_transcript(client, transcript, model="llama3.2:1b"):
+logger = setup_logger(__name__)
 
-    few_shots = """
 
-    <example>
-    <voice memo>"more this is a cool set up the four most dangerous words in investing is this time is different the twelve most dangerous words in investing is the four most dangerous words in investing is this time is different interesting"</voice memo>
-    <tldr_summary>"The four most dangerous words in investing are 'this time is different'."</tldr_summary>
-    </example>
+def chat_completion(
+    client, model, system_message, user_message, llm_cache=None, response_format=None
+):
+    """
+    Send a chat-completion request, served from the LLM cache when possible.
+
+    Clients that support it are streamed, to measure the time to first token;
+    the streamed chunks are assembled into a regular ChatCompletion.
 
-    <example>
-    <voice memo>"I am reading from the Wiki article about taxation in Germany. Taxes in Germany are levied at various government levels, the federal government, the 16 states and numerous municipalities. The structured tax system has evolved significantly since the reunification of Germany in 1990 and the integration within the European Union, which has influenced tax policies. Today, income tax and valued added tax, VAT, are the primary sources of tax revenue. These taxes reflect Germany's commitment to a balanced approach between direct and indirect taxation, essentially for funding extensive social welfare programs and public infrastructure. The modern German tax system accentuate on fairness and efficiency, adapting to global economic trends and domestic fiscal needs."</voice memo>
-    <tldr_summary>"Germany's tax system operates at federal, state, and local levels, with income tax and VAT as primary revenue sources. It aims for fairness and efficiency while funding social programs and adapting to economic trends."</tldr_summary>
-    </example>
+    Args:
+        client: OpenAI-compatible client.
+        model (str): Model name.
+        system_message (str): System prompt.
+        user_message (str): User message.
+        llm_cache (LLMCache, optional): Cache of responses.
+        response_format (dict, optional): Structured output mode, e.g. {"type": "json_object"}.
 
-    <example>
-    <voice memo>"Ich lese aus der Wiki vor und zwar über die Einkommenssteuer. Die Einkommenssteuer in Deutschland, Abkürzung EST, ist eine Gemeinschaftssteuer, die auf das Einkommen natürlicher Personen erhoben wird. Rechtsgrundlage für die Berechnung und Erhebung der Einkommenssteuer ist, neben weiteren Gesetzen, das Einkommenssteuergesetz, in Klammern ESTG. Der Einkommenssteuertarif regelt die Berechnungsvorschriften. Bemessungsgrundlage ist das zu versteuernde Einkommen. Im Jahr 2021 nahm der deutsche Staat rund 290 Milliarden Euro Lohn- und Einkommenssteuer ein. Das entspricht über einem Drittel der gesamten Steuereinnahmen Deutschlands. Der ebenfalls vorkommende Ausdruck Einkommenssteuer mit Fugen S wird in der juristischen Fachsprache nicht verwendet. Allgemeines Erhebungsformen der Einkommenssteuer sind die Lohnsteuer, die Kapitalertragsteuer, die Bauabzugsteuer und die Aufsichtsratsteuer. Sie werden auch als Quellensteuersteuern bezeichnet, da sie direkt an der Quelle abgezogen werden. Die Abgeltungssteuer dient seit 2009 als bestimmte Anwendung der Kapitalertragsteuer. Nach dem Welteinkommensprinzip sind die in Deutschland Steuerpflichtigen mit ihrem weltweiten Einkommen steuerpflichtig."</voice memo>
-    <tldr_summary>"Income tax in Germany is a major source of government revenue, accounting for over a third of total tax income. It's levied on individuals' worldwide income and collected through various forms including wage tax, capital gains tax, and withholding taxes."</tldr_summary>
-    </example>
+    Returns:
+        ChatCompletion: The model response.
     """
+    if llm_cache is not None:
+        key = llm_cache.key_for(model, system_message, user_message, response_format)
+        cached = llm_cache.get_response(key)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion
+
+            response = ChatCompletion.model_validate(cached)
+            record_llm_usage(response, cached=True)
+            return response
+
+    kwargs = {}
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+    start = time.perf_counter()
+    ttft = None
+    if getattr(client, "supports_streaming", True):
+        response, ttft = _streamed_completion(client, model, messages, **kwargs)
+    elif hasattr(client, "create_timed"):
+        # e.g. AsyncLLMClient, which streams on its own event loop
+        response, ttft = client.create_timed(model=model, messages=messages, **kwargs)
+    else:
+        response = client.chat.completions.create(
+            model=model, messages=messages, **kwargs
+        )
+    if llm_cache is not None:
+        llm_cache.set_response(key, response.model_dump(), time.perf_counter() - start)
+    record_llm_usage(response, ttft=ttft)
+    return response
 
-    system_message = f"""
-    You task is to summarize raw transcripts of voice memos, which can be 
-    lengthy, unstructured and can even contain errors. Here are some examples
-    of how you should format your response.
-    {few_shots}
 
-    Your task is to summarize the following voice memo in a concise and structured manner. 
-    The recording will be in English or in German. Provide a summary in English.
-    Be short and precise. No yabbering. Don't invent stuff. At maximum, this can 
-    be two sentences. Summarize what you can understand from the content of the 
-    following voice memo. 
-    Don't add any explanations or whatsoever. Your response is used as a summary 
-    only and should be between <tldr_summary> and </tldr_summary> tags. 
+def _streamed_completion(client, model, messages, **kwargs):
     """
+    Stream a chat completion and assemble the chunks.
 
-    response = client.chat.completions.create(
+    Returns:
+        tuple: (ChatCompletion, seconds until the first content token or None).
+    """
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
         model=model,
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": f"Voice memo: {transcript['text']}"},
-        ],
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    )
+    if hasattr(stream, "choices"):
+        # the client ignored stream=True and answered in one piece
+        return stream, None
+    ttft = None
+    chunks = []
+    for chunk in stream:
+        if ttft is None and any(choice.delta.content for choice in chunk.choices):
+            ttft = time.perf_counter() - start
+        chunks.append(chunk)
+    return completion_from_chunks(chunks, model), ttft
+
+
+def completion_from_chunks(chunks, model):
+    """
+    Assemble the chunks of a streamed chat completion into one response.
+
+    Args:
+        chunks (list[ChatCompletionChunk]): The streamed chunks.
+        model (str): Model name, used if no chunk names one.
+
+    Returns:
+        ChatCompletion: The complete response, with usage if the stream had it.
+    """
+    from openai.types.chat import ChatCompletion
+
+    content = []
+    payload = {"id": "", "created": 0, "model": model, "usage": None}
+    finish_reason = None
+    for chunk in chunks:
+        payload.update(id=chunk.id, created=chunk.created, model=chunk.model)
+        if chunk.usage is not None:
+            payload["usage"] = chunk.usage.model_dump()
+        for choice in chunk.choices:
+            if choice.delta.content:
+                content.append(choice.delta.content)
+            finish_reason = choice.finish_reason or finish_reason
+    payload["object"] = "chat.completion"
+    payload["choices"] = [
+        {
+            "index": 0,
+            "finish_reason": finish_reason or "stop",
+            "message": {"role": "assistant", "content": "".join(content)},
+        }
+    ]
+    return ChatCompletion.model_validate(payload)
+
+
+def preload_model(host, model, keep_alive="30m", timeout=300):
+    """
+    Load a model into Ollama's memory and keep it there, before the first request.
+
+    Sends an empty generate request to Ollama's native API, which loads the
+    model and sets how long it stays loaded after the last request.
+
+    Args:
+        host (str): Ollama host, e.g. "http://localhost:11434".
+        model (str): Model name.
+        keep_alive (str): Duration the model stays loaded, e.g. "30m". Defaults to "30m".
+        timeout (float): Seconds to wait for the model to load. Defaults to 300.
+
+    Returns:
+        bool: Whether the model was loaded.
+    """
+    request = urllib.request.Request(
+        f"{host.rstrip('/')}/api/generate",
+        data=json.dumps({"model": model, "keep_alive": keep_alive}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    except OSError as e:
+        logger.warning(f"Could not preload {model} at {host}: {e}")
+        return False
+    logger.info(f"Preloaded {model} in {time.perf_counter() - start:.2f}s")
+    return True
+
+
+def llm_summarize_transcript(client, transcript, model="llama3.2:1b", llm_cache=None):
+    system_message = system_prompt("summary")
+
+    response = chat_completion(
+        client,
+        model,
+        system_message,
+        f"Voice memo: {transcript['text']}",
+        llm_cache=llm_cache,
+    )
+
+    return response
+
+
+def llm_generate_note_title(client, transcript, model="llama3.2:1b", llm_cache=None):
+    system_message = system_prompt("title")
+
+    response = chat_completion(
+        client,
+        model,
+        system_message,
+        f"Voice memo: {transcript['text']}",
+        llm_cache=llm_cache,
+    )
+
+    return response
+
+
+def llm_summarize_and_title(client, transcript, model="llama3.2:1b", llm_cache=None):
+    """
+    Request TLDR summary and note title together in one structured JSON response.
+
+    Args:
+        client: OpenAI-compatible client.
+        transcript (dict): Whisper transcript.
+        model (str): Model name.
+        llm_cache (LLMCache, optional): Cache of responses.
+
+    Returns:
+        ChatCompletion: Response whose content is a JSON object with the keys
+            "tldr_summary" and "title".
+    """
+    system_message = system_prompt("summary_and_title")
+
+    response = chat_completion(
+        client,
+        model,
+        system_message,
+        f"Voice memo: {transcript['text']}",
+        llm_cache=llm_cache,
+        response_format={"type": "json_object"},
     )
 
     return response
 
 
-# TODO: move these private examples to a separate file in ~/data/raw
-def llm_generate_note_title(client, transcript, model="llama3.2:1b"):
+def estimate_tokens(text):
+    """Roughly estimate the number of LLM tokens of a text (about 4 characters per token)."""
+    return math.ceil(len(text) / 4)
+
 
-    few_shots = """
+def chunk_transcript(transcript, token_budget):
+    """
+    Split a transcript into chunks of at most token_budget estimated tokens.
 
-    <example>
-    <voice memo>"more this is a cool set up the four most dangerous words in investing is this time is different the twelve most dangerous words in investing is the four most dangerous words in investing is this time is different interesting"</voice memo>
-    <title>"The four most dangerous words in investing"</title>
-    </example>
+    Chunks follow Whisper's segment boundaries; a single segment that exceeds
+    the budget on its own is split on word boundaries.
 
-    <example>
-    <voice memo>"I am reading from the Wiki article about taxation in Germany. Taxes in Germany are levied at various government levels, the federal government, the 16 states and numerous municipalities. The structured tax system has evolved significantly since the reunification of Germany in 1990 and the integration within the European Union, which has influenced tax policies. Today, income tax and valued added tax, VAT, are the primary sources of tax revenue. These taxes reflect Germany's commitment to a balanced approach between direct and indirect taxation, essentially for funding extensive social welfare programs and public infrastructure. The modern German tax system accentuate on fairness and efficiency, adapting to global economic trends and domestic fiscal needs."</voice memo>
-    <title>"Taxation in Germany"</title>
-    </example>
+    Args:
+        transcript (dict): Whisper transcript.
+        token_budget (int): Maximum estimated tokens per chunk.
 
-    <example>
-    <voice memo>"Ich lese aus der Wiki vor und zwar über die Einkommenssteuer. Die Einkommenssteuer in Deutschland, Abkürzung EST, ist eine Gemeinschaftssteuer, die auf das Einkommen natürlicher Personen erhoben wird. Rechtsgrundlage für die Berechnung und Erhebung der Einkommenssteuer ist, neben weiteren Gesetzen, das Einkommenssteuergesetz, in Klammern ESTG. Der Einkommenssteuertarif regelt die Berechnungsvorschriften. Bemessungsgrundlage ist das zu versteuernde Einkommen. Im Jahr 2021 nahm der deutsche Staat rund 290 Milliarden Euro Lohn- und Einkommenssteuer ein. Das entspricht über einem Drittel der gesamten Steuereinnahmen Deutschlands. Der ebenfalls vorkommende Ausdruck Einkommenssteuer mit Fugen S wird in der juristischen Fachsprache nicht verwendet. Allgemeines Erhebungsformen der Einkommenssteuer sind die Lohnsteuer, die Kapitalertragsteuer, die Bauabzugsteuer und die Aufsichtsratsteuer. Sie werden auch als Quellensteuersteuern bezeichnet, da sie direkt an der Quelle abgezogen werden. Die Abgeltungssteuer dient seit 2009 als bestimmte Anwendung der Kapitalertragsteuer. Nach dem Welteinkommensprinzip sind die in Deutschland Steuerpflichtigen mit ihrem weltweiten Einkommen steuerpflichtig."</voice memo>
-    <title>"Income Tax in Germany"</title>
-    </example>
+    Returns:
+        list[str]: Chunk texts in order.
     """
+    pieces = [s["text"].strip() for s in transcript.get("segments") or []]
+    if not pieces:
+        pieces = [transcript["text"]]
 
-    system_message = f"""
-    Your task is to provide a fitting short note title for a raw transcripts of 
-    voice memos, which can be lengthy, unstructured and sometimes even contain errors. 
-    Here are some examples of raw transcripts and a fitting title for each.
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        if estimate_tokens(piece) > token_budget:
+            sub_pieces = []
+            sub = []
+            sub_chars = 0
+            for word in piece.split():
+                if sub and math.ceil((sub_chars + len(word)) / 4) > token_budget:
+                    sub_pieces.append(" ".join(sub))
+                    sub = []
+                    sub_chars = 0
+                sub.append(word)
+                sub_chars += len(word) + 1
+            if sub:
+                sub_pieces.append(" ".join(sub))
+        else:
+            sub_pieces = [piece]
+        for sub_piece in sub_pieces:
+            tokens = estimate_tokens(sub_piece) + 1
+            if current and current_tokens + tokens > token_budget:
+                chunks.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            if sub_piece:
+                current.append(sub_piece)
+                current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
 
-    {few_shots}
 
-    
-    The recording will be in English or in German. Provide a note title in English.
-    Be short, max 5 words. No yabbering. Don't invent stuff. 
-    Just a title without special letters for the user's voice memo content. 
-    Don't add any explanations or whatsoever. Your response is used as a title only 
-    and should be between <title> and </title> tags. 
+def llm_summarize_chunk(client, chunk, model="llama3.2:1b", llm_cache=None):
     """
+    Summarize one part of a long voice memo (map step).
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": f"Voice memo: {transcript['text']}"},
-        ],
+    Args:
+        client: OpenAI-compatible client.
+        chunk (str): Transcript text of the part.
+        model (str): Model name.
+        llm_cache (LLMCache, optional): Cache of responses.
+
+    Returns:
+        ChatCompletion: Response with the summary between <chunk_summary> tags.
+    """
+    system_message = system_prompt("chunk")
+
+    return chat_completion(
+        client,
+        model,
+        system_message,
+        f"Voice memo part: {chunk}",
+        llm_cache=llm_cache,
+    )
+
+
+def llm_reduce_summaries(client, summaries, model="llama3.2:1b", llm_cache=None):
+    """
+    Combine the summaries of the parts of a voice memo into TLDR and title (reduce step).
+
+    Args:
+        client: OpenAI-compatible client.
+        summaries (list[str]): Summaries of the parts, in order.
+        model (str): Model name.
+        llm_cache (LLMCache, optional): Cache of responses.
+
+    Returns:
+        ChatCompletion: Response with <tldr_summary> and <title> tags.
+    """
+    system_message = system_prompt("reduce")
+
+    parts = "\n".join(
+        f"Part {i}: {summary}" for i, summary in enumerate(summaries, start=1)
+    )
+    return chat_completion(
+        client,
+        model,
+        system_message,
+        f"Summaries of the voice memo parts:\n{parts}",
+        llm_cache=llm_cache,
     )
 
-    return response
\ No newline at end of file
+
+def _summarize_chunks(client, chunks, model, max_workers, llm_cache):
+    """Summarize chunks concurrently (map step) and return the summary texts."""
+    # run the chunks in the caller's context, so their token usage is recorded
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        responses = list(
+            executor.map(
+                lambda chunk: context.copy().run(
+                    llm_summarize_chunk, client, chunk, model, llm_cache
+                ),
+                chunks,
+            )
+        )
+    summaries = []
+    for response in responses:
+        text = response.choices[0].message.content.strip()
+        match = re.search(r"<chunk_summary>(.*?)</chunk_summary>", text, re.DOTALL)
+        summaries.append(match.group(1).strip() if match else text)
+    return summaries
+
+
+def llm_summarize_map_reduce(
+    client,
+    transcript,
+    model="llama3.2:1b",
+    token_budget=1500,
+    max_workers=4,
+    llm_cache=None,
+):
+    """
+    Summarize and title a transcript too long for a single prompt.
+
+    The transcript is chunked on segment boundaries to fit the token budget,
+    the chunks are summarized concurrently, and a reduce call produces TLDR
+    and title from the chunk summaries. While the summaries together exceed
+    the budget, consecutive ones are grouped and summarized again, so the
+    reduce prompt fits as well. Latency grows linearly with length.
+
+    Args:
+        client: OpenAI-compatible client.
+        transcript (dict): Whisper transcript.
+        model (str): Model name.
+        token_budget (int): Maximum estimated tokens per chunk. Defaults to 1500.
+        max_workers (int): Chunks summarized concurrently. Defaults to 4.
+        llm_cache (LLMCache, optional): Cache of responses.
+
+    Returns:
+        ChatCompletion: Reduce response with <tldr_summary> and <title> tags.
+    """
+    chunks = chunk_transcript(transcript, token_budget)
+    summaries = _summarize_chunks(client, chunks, model, max_workers, llm_cache)
+    while len(summaries) > 1 and estimate_tokens("\n".join(summaries)) > token_budget:
+        groups = chunk_transcript(
+            {"segments": [{"text": summary} for summary in summaries]}, token_budget
+        )
+        if len(groups) >= len(summaries):
+            # every summary fills the budget on its own: combine pairs anyway
+            groups = [
+                " ".join(summaries[i : i + 2]) for i in range(0, len(summaries), 2)
+            ]
+        logger.info(f"Combining {len(summaries)} part summaries into {len(groups)}")
+        summaries = _summarize_chunks(client, groups, model, max_workers, llm_cache)
+    return llm_reduce_summaries(client, summaries, model, llm_cache)
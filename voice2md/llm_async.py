@@ -0,0 +1,214 @@
+import asyncio
+import random
+import threading
+import time
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AsyncLLMClient:
+    """
+    asyncio chat-completions client with a shared connection pool.
+
+    Built on AsyncOpenAI over one pooled HTTP client. A semaphore caps the
+    number of requests in flight; each request has a timeout and is retried
+    with jittered exponential backoff on connection errors, timeouts, rate
+    limits and server errors.
+
+    Coroutines use acreate(). For synchronous callers (the llm.py helpers and
+    the threaded pipeline) the client also exposes chat.completions.create(),
+    which runs the request on a background event loop, so that many threads
+    can have requests outstanding at once, and create_timed(), which also
+    returns the time to the first token.
+    """
+
+    # the sync facade returns complete responses; create_timed() streams them
+    supports_streaming = False
+
+    def __init__(
+        self,
+        base_url="http://localhost:11434/v1",
+        api_key="ollama",
+        max_in_flight=4,
+        timeout=120.0,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=10.0,
+    ):
+        """
+        Initialize the client. Connections are opened on first use.
+
+        Args:
+            base_url (str): Base URL of the OpenAI-compatible server.
+            api_key (str): API key. Defaults to "ollama".
+            max_in_flight (int): Maximum number of concurrent requests. Defaults to 4.
+            timeout (float): Per-request timeout in seconds. Defaults to 120.
+            max_retries (int): Retries after the first attempt. Defaults to 3.
+            backoff_base (float): Backoff of the first retry in seconds. Defaults to 0.5.
+            backoff_max (float): Upper bound of the backoff in seconds. Defaults to 10.
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.chat = _Chat(self)
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_client(self):
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                ),
+                timeout=self.timeout,
+            )
+            self._client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                http_client=http_client,
+                max_retries=0,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._client
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff for a retry attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def _with_retries(self, request):
+        """
+        Run request() under the in-flight limit, retrying transient failures.
+
+        The semaphore is held only while a request is outstanding, not during
+        the backoff, so a failing request does not block the others.
+        """
+        import openai
+
+        retryable = (
+            asyncio.TimeoutError,
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+        )
+        self._ensure_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(request(), self.timeout)
+            except retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(
+                    f"LLM request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def acreate(self, **kwargs):
+        """
+        Send a chat-completion request.
+
+        Args:
+            **kwargs: Arguments of chat.completions.create (model, messages, ...).
+
+        Returns:
+            ChatCompletion: The model response.
+        """
+        client = self._ensure_client()
+        return await self._with_retries(
+            lambda: client.chat.completions.create(**kwargs)
+        )
+
+    async def acreate_timed(self, **kwargs):
+        """
+        Send a chat-completion request as a stream and time the first token.
+
+        Args:
+            **kwargs: Arguments of chat.completions.create (model, messages, ...).
+
+        Returns:
+            tuple: (ChatCompletion, seconds until the first content token or None).
+        """
+        from voice2md.llm import completion_from_chunks
+
+        client = self._ensure_client()
+
+        async def request():
+            start = time.perf_counter()
+            stream = await client.chat.completions.create(
+                stream=True, stream_options={"include_usage": True}, **kwargs
+            )
+            ttft = None
+            chunks = []
+            async for chunk in stream:
+                if ttft is None and any(c.delta.content for c in chunk.choices):
+                    ttft = time.perf_counter() - start
+                chunks.append(chunk)
+            return completion_from_chunks(chunks, kwargs.get("model")), ttft
+
+        return await self._with_retries(request)
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="llm-async-loop", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def create(self, **kwargs):
+        """Synchronous chat-completion request, run on the background event loop."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.acreate(**kwargs), self._get_loop()
+        )
+        return future.result()
+
+    def create_timed(self, **kwargs):
+        """Synchronous acreate_timed(), run on the background event loop."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.acreate_timed(**kwargs), self._get_loop()
+        )
+        return future.result()
+
+    async def aclose(self):
+        """Close the pooled HTTP connections."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def close(self):
+        """Close connections and stop the background event loop, if started."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+class _Completions:
+    def __init__(self, client):
+        self.create = client.create
+
+
+class _Chat:
+    def __init__(self, client):
+        self.completions = _Completions(client)
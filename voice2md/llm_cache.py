@@ -0,0 +1,75 @@
+import threading
+
+from voice2md.disk_cache import DiskCache, make_key
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class LLMCache(DiskCache):
+    """
+    On-disk cache of chat-completion responses.
+
+    Entries are keyed by a hash of (model, system prompt, user message) and
+    store the response together with the time the request took, so hits can
+    report the LLM latency they saved. With refresh=True, cached responses are
+    ignored and overwritten, which forces regeneration.
+    """
+
+    def __init__(self, directory, max_size_mb=None, ttl_seconds=None, refresh=False):
+        """
+        Initialize the cache.
+
+        Args:
+            directory (Path): Cache directory, created if missing.
+            max_size_mb (float, optional): Size bound of the cache. Defaults to unbounded.
+            ttl_seconds (float, optional): Maximum age of an entry. Defaults to no expiry.
+            refresh (bool): Skip cached responses and regenerate them. Defaults to False.
+        """
+        super().__init__(directory, max_size_mb=max_size_mb, ttl_seconds=ttl_seconds)
+        self.refresh = refresh
+        self.seconds_saved = 0.0
+        self._saved_lock = threading.Lock()
+
+    def key_for(self, model, system_message, user_message, response_format=None):
+        """Build the cache key of a chat-completion request."""
+        if response_format is None:
+            return make_key(model, system_message, user_message)
+        return make_key(model, system_message, user_message, response_format)
+
+    def get_response(self, key):
+        """
+        Return the cached response for a key, or None.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            dict: Cached response as returned by model_dump(), or None.
+        """
+        if self.refresh:
+            return None
+        entry = self.get(key)
+        if entry is None:
+            return None
+        with self._saved_lock:
+            self.seconds_saved += entry["elapsed_seconds"]
+        return entry["response"]
+
+    def set_response(self, key, response, elapsed_seconds):
+        """
+        Store a response and the time it took to generate it.
+
+        Args:
+            key (str): Cache key.
+            response (dict): Response as returned by model_dump().
+            elapsed_seconds (float): Request latency.
+        """
+        self.set(key, {"response": response, "elapsed_seconds": elapsed_seconds})
+
+    def flush_stats(self, **extra):
+        """Persist the counters of this process, including the seconds saved by hits."""
+        with self._saved_lock:
+            seconds_saved = self.seconds_saved
+            self.seconds_saved = 0.0
+        return super().flush_stats(seconds_saved=round(seconds_saved, 3), **extra)
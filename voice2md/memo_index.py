@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+from voice2md.voice_memo import parse_datetime_from_file_name
+
+logger = setup_logger(__name__)
+
+STATE_FILE_NAME = "state.json"
+
+
+class StemIndex:
+    """
+    In-memory set of the file stems in a directory.
+
+    Built with a single os.scandir pass and updated as files are written, so
+    membership checks do not list the directory again.
+    """
+
+    def __init__(self, directory):
+        """
+        Build the index.
+
+        Args:
+            directory (Path): Directory to index.
+        """
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        with os.scandir(self.directory) as entries:
+            self._stems = {
+                os.path.splitext(entry.name)[0]
+                for entry in entries
+                if not entry.is_dir()
+            }
+
+    def __contains__(self, stem):
+        with self._lock:
+            return stem in self._stems
+
+    def __len__(self):
+        with self._lock:
+            return len(self._stems)
+
+    def add(self, stem):
+        """Record a newly written file stem."""
+        with self._lock:
+            self._stems.add(stem)
+
+
+def scan_voice_memos(directory, suffix=".m4a"):
+    """
+    List voice memos of a directory with their recording datetime, in one os.scandir pass.
+
+    Files whose name does not follow the "YYYYMMDD HHMMSS-<id>" pattern are ignored.
+
+    Args:
+        directory (Path): Directory of original voice memos.
+        suffix (str): File suffix. Defaults to ".m4a".
+
+    Returns:
+        list[tuple]: (datetime, Path) pairs sorted by recording datetime.
+    """
+    memos = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(suffix) or not entry.is_file():
+                continue
+            try:
+                datetime_created = parse_datetime_from_file_name(entry.name)
+            except ValueError:
+                logger.warning(f"Ignoring {entry.name}: no recording datetime in name")
+                continue
+            memos.append((datetime_created, Path(entry.path)))
+    memos.sort()
+    return memos
+
+
+def select_voice_memos(memos, high_water_mark=None, last_n_files=None, max_files=None):
+    """
+    Select the voice memos to process.
+
+    With a high-water mark, all memos recorded after it are selected, oldest
+    first, so that a capped run is continued by the next one. Without one
+    (first run), the newest last_n_files memos are selected.
+
+    Args:
+        memos (list[tuple]): (datetime, Path) pairs sorted by datetime.
+        high_water_mark (datetime, optional): Recording datetime of the newest
+            memo already handled.
+        last_n_files (int, optional): Number of newest memos on the first run.
+            Defaults to all.
+        max_files (int, optional): Maximum number of memos per run. Defaults to all.
+
+    Returns:
+        list[tuple]: Selected (datetime, Path) pairs, oldest first.
+    """
+    if high_water_mark is None:
+        selected = memos[-last_n_files:] if last_n_files else list(memos)
+    else:
+        selected = [memo for memo in memos if memo[0] > high_water_mark]
+    if max_files is not None:
+        selected = selected[:max_files]
+    return selected
+
+
+class ProcessingState:
+    """
+    Small persisted state of the processing runs, such as the high-water mark.
+
+    Stored as JSON in the database directory.
+    """
+
+    def __init__(self, path_db):
+        """
+        Load the state.
+
+        Args:
+            path_db (Path): Database directory.
+        """
+        self.path = Path(path_db) / STATE_FILE_NAME
+        self.data = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+
+    @property
+    def high_water_mark(self):
+        """Recording datetime of the newest memo handled so far, or None."""
+        value = self.data.get("high_water_mark")
+        return datetime.fromisoformat(value) if value else None
+
+    @high_water_mark.setter
+    def high_water_mark(self, value):
+        self.data["high_water_mark"] = value.isoformat() if value else None
+
+    def save(self):
+        """Atomically write the state to disk."""
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
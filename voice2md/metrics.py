@@ -0,0 +1,387 @@
+import contextvars
+import cProfile
+import functools
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# MemoMetrics of the step running in the current context, for chat_completion
+_current_metrics = contextvars.ContextVar("voice2md_current_metrics", default=None)
+
+
+class MemoMetrics:
+    """
+    Timings and volumes of the processing steps of one voice memo.
+
+    Records wall time and CPU time of the calling thread per step, the audio
+    duration and the LLM tokens in and out. CPU time spent in other processes
+    (e.g. TranscriptionPool workers) is not included.
+    """
+
+    def __init__(self, profiles=None):
+        """
+        Initialize empty metrics.
+
+        Args:
+            profiles (ThreadProfiles, optional): Profiler enabled during every step.
+        """
+        self.steps = {}
+        self.audio_seconds = None
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.llm_calls = 0
+        self.llm_cached_calls = 0
+        self.ttft_seconds = []
+        self.asr = None  # tiers chosen by an AdaptiveASRModel
+        self._profiles = profiles
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, step):
+        """
+        Measure the wall and CPU time of a step, adding up repeated steps.
+
+        Args:
+            step (str): Step name, e.g. "transcribe".
+        """
+        outermost = _current_metrics.get() is not self
+        token = _current_metrics.set(self)
+        profile = self._profiles.get() if self._profiles and outermost else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile at a time across threads
+                profile = None
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            if profile is not None:
+                profile.disable()
+            _current_metrics.reset(token)
+            with self._lock:
+                totals = self.steps.setdefault(
+                    step, {"wall_seconds": 0.0, "cpu_seconds": 0.0}
+                )
+                totals["wall_seconds"] += wall
+                totals["cpu_seconds"] += cpu
+
+    def add_llm_usage(self, usage, cached=False, ttft=None):
+        """
+        Add the token usage of an LLM response.
+
+        Args:
+            usage: Usage object or dict with prompt_tokens and completion_tokens, or None.
+            cached (bool): Whether the response came from the LLM cache; its tokens
+                are not counted, since no model produced them in this run.
+            ttft (float, optional): Seconds until the first token of a streamed response.
+        """
+        with self._lock:
+            if cached:
+                self.llm_cached_calls += 1
+                return
+            self.llm_calls += 1
+            if ttft is not None:
+                self.ttft_seconds.append(ttft)
+            if usage is None:
+                return
+            if not isinstance(usage, dict):
+                usage = usage.model_dump()
+            self.tokens_in += usage.get("prompt_tokens") or 0
+            self.tokens_out += usage.get("completion_tokens") or 0
+
+    def wall_seconds(self, *steps):
+        """Return the summed wall time of the given steps."""
+        return sum(self.steps.get(step, {}).get("wall_seconds", 0.0) for step in steps)
+
+    def llm_wall_seconds(self):
+        """Return the wall time spent waiting for summary and title."""
+        # summarize_and_title contains the separate calls of its fallback
+        return self.wall_seconds("summarize_and_title") or self.wall_seconds(
+            "summarize", "generate_title"
+        )
+
+    def as_dict(self):
+        """
+        Return the metrics as a JSON-serializable dict for the database record.
+
+        Includes the real-time factor (ASR seconds per audio second) and the LLM
+        output tokens per second where they can be computed.
+        """
+        asr_seconds = self.wall_seconds("transcribe")
+        llm_seconds = self.llm_wall_seconds()
+        return {
+            "steps": {
+                step: {name: round(value, 4) for name, value in totals.items()}
+                for step, totals in self.steps.items()
+            },
+            "audio_seconds": self.audio_seconds,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "llm_calls": self.llm_calls,
+            "llm_cached_calls": self.llm_cached_calls,
+            "llm_ttft_seconds": [round(ttft, 4) for ttft in self.ttft_seconds],
+            "asr": self.asr,
+            "asr_realtime_factor": (
+                round(asr_seconds / self.audio_seconds, 4)
+                if self.audio_seconds and asr_seconds
+                else None
+            ),
+            "llm_tokens_per_second": (
+                round(self.tokens_out / llm_seconds, 2)
+                if self.tokens_out and llm_seconds
+                else None
+            ),
+        }
+
+
+def measured(step):
+    """
+    Decorate a VoiceMemo method so its wall and CPU time is recorded in self.metrics.
+
+    Args:
+        step (str): Step name.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.measure(step):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_llm_usage(response, cached=False, ttft=None):
+    """
+    Add the token usage of an LLM response to the memo whose step is running.
+
+    Args:
+        response: ChatCompletion response.
+        cached (bool): Whether the response came from the LLM cache.
+        ttft (float, optional): Seconds until the first token of a streamed response.
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_llm_usage(getattr(response, "usage", None), cached, ttft)
+
+
+class ThreadProfiles:
+    """
+    One cProfile profiler per thread, merged into a single stats dump.
+
+    cProfile only profiles the thread that enabled it, so every pipeline
+    worker thread gets its own profiler. On Python 3.12+ only one of them can
+    be active at a time; steps overlapping a profiled step are not profiled.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the profiler of the calling thread."""
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = cProfile.Profile()
+            self._local.profile = profile
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def dump(self, path):
+        """
+        Write the merged profile, viewable with pstats or snakeviz.
+
+        Args:
+            path (Path): Output file.
+        """
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        logger.info(f"Wrote profile of {len(profiles)} thread(s) to {path}")
+
+
+class RunMetrics:
+    """
+    Aggregate of the MemoMetrics of one run, exported as a Prometheus textfile.
+    """
+
+    def __init__(self, profile=False):
+        """
+        Initialize the aggregate.
+
+        Args:
+            profile (bool): Profile all measured steps with cProfile. Defaults to False.
+        """
+        self.profiles = ThreadProfiles() if profile else None
+        self.memos = 0
+        self.steps = {}
+        self.audio_seconds = 0.0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.llm_calls = 0
+        self.llm_cached_calls = 0
+        self.asr_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.ttft_seconds = []
+        self._lock = threading.Lock()
+
+    def new_memo(self):
+        """Return a MemoMetrics that profiles its steps if this run is profiled."""
+        return MemoMetrics(profiles=self.profiles)
+
+    def add(self, memo_metrics):
+        """
+        Add the metrics of a processed memo.
+
+        Args:
+            memo_metrics (MemoMetrics): Metrics of the memo.
+        """
+        with self._lock:
+            self.memos += 1
+            for step, totals in memo_metrics.steps.items():
+                aggregate = self.steps.setdefault(
+                    step, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "count": 0}
+                )
+                aggregate["wall_seconds"] += totals["wall_seconds"]
+                aggregate["cpu_seconds"] += totals["cpu_seconds"]
+                aggregate["count"] += 1
+            self.tokens_in += memo_metrics.tokens_in
+            self.tokens_out += memo_metrics.tokens_out
+            self.llm_calls += memo_metrics.llm_calls
+            self.llm_cached_calls += memo_metrics.llm_cached_calls
+            self.ttft_seconds.extend(memo_metrics.ttft_seconds)
+            if memo_metrics.audio_seconds:
+                self.audio_seconds += memo_metrics.audio_seconds
+                self.asr_seconds += memo_metrics.wall_seconds("transcribe")
+            if memo_metrics.tokens_out:
+                self.llm_seconds += memo_metrics.llm_wall_seconds()
+
+    def prometheus_text(self):
+        """
+        Return the aggregate in the Prometheus text exposition format.
+
+        Returns:
+            str: Metrics of the last run, as gauges.
+        """
+        lines = []
+
+        def gauge(name, help_text, samples):
+            lines.append(f"# HELP voice2md_{name} {help_text}")
+            lines.append(f"# TYPE voice2md_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"voice2md_{name}{label_text} {value:.6g}")
+
+        with self._lock:
+            gauge(
+                "last_run_timestamp_seconds",
+                "End of the last run.",
+                [({}, time.time())],
+            )
+            gauge("last_run_memos", "Voice memos processed.", [({}, self.memos)])
+            gauge(
+                "last_run_step_seconds",
+                "Seconds spent per step, by clock (wall or cpu).",
+                [
+                    ({"step": step, "clock": clock}, totals[f"{clock}_seconds"])
+                    for step, totals in sorted(self.steps.items())
+                    for clock in ("wall", "cpu")
+                ],
+            )
+            gauge(
+                "last_run_step_count",
+                "Memos that went through each step.",
+                [
+                    ({"step": step}, t["count"])
+                    for step, t in sorted(self.steps.items())
+                ],
+            )
+            gauge(
+                "last_run_audio_seconds",
+                "Seconds of audio transcribed.",
+                [({}, self.audio_seconds)],
+            )
+            gauge(
+                "last_run_llm_tokens",
+                "LLM tokens, by direction (in or out).",
+                [
+                    ({"direction": "in"}, self.tokens_in),
+                    ({"direction": "out"}, self.tokens_out),
+                ],
+            )
+            gauge(
+                "last_run_llm_calls",
+                "LLM calls, by whether they were served from the cache.",
+                [
+                    ({"cached": "false"}, self.llm_calls),
+                    ({"cached": "true"}, self.llm_cached_calls),
+                ],
+            )
+            if self.audio_seconds:
+                gauge(
+                    "last_run_asr_realtime_factor",
+                    "ASR wall seconds per second of audio.",
+                    [({}, self.asr_seconds / self.audio_seconds)],
+                )
+            if self.llm_seconds:
+                gauge(
+                    "last_run_llm_tokens_per_second",
+                    "LLM output tokens per second of LLM wall time.",
+                    [({}, self.tokens_out / self.llm_seconds)],
+                )
+            if self.ttft_seconds:
+                ordered = sorted(self.ttft_seconds)
+                gauge(
+                    "last_run_llm_ttft_seconds",
+                    "Time to first token of streamed LLM calls, by quantile.",
+                    [
+                        ({"quantile": "0.5"}, ordered[(len(ordered) - 1) // 2]),
+                        ({"quantile": "1"}, ordered[-1]),
+                    ],
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_textfile(self, path):
+        """
+        Atomically write the aggregate for the node_exporter textfile collector.
+
+        Args:
+            path (Path): Output file, conventionally ending in .prom.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".part"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.prometheus_text())
+            # mkstemp creates the file with mode 0600; node_exporter may run as another user
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,329 @@
+import ctypes
+import ctypes.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+from voice2md.sync_manifest import file_digest
+
+logger = setup_logger(__name__)
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MiB per kernel copy call
+FICLONE = (
+    0x40049409  # ioctl of Linux CoW filesystems (btrfs, XFS), see ioctl_ficlone(2)
+)
+
+# Materialization strategies, in fallback order from cheapest to most expensive
+MATERIALIZE_STRATEGIES = ("hardlink", "reflink", "symlink", "copy")
+
+
+def _copy_data(fsrc, fdst, size):
+    """
+    Copy file contents using the cheapest mechanism the kernel supports.
+
+    Tries copy_file_range (in-kernel, may reflink on CoW filesystems), then
+    sendfile, and falls back to a userspace buffered copy.
+
+    Args:
+        fsrc: Source file object opened for binary reading.
+        fdst: Destination file object opened for binary writing.
+        size (int): Number of bytes to copy.
+    """
+    src_fd = fsrc.fileno()
+    dst_fd = fdst.fileno()
+    offset = 0
+
+    for kernel_copy in ("copy_file_range", "sendfile"):
+        if not hasattr(os, kernel_copy):
+            continue
+        try:
+            while offset < size:
+                count = min(COPY_CHUNK_SIZE, size - offset)
+                if kernel_copy == "copy_file_range":
+                    sent = os.copy_file_range(src_fd, dst_fd, count)
+                else:
+                    sent = os.sendfile(dst_fd, src_fd, offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+            if offset >= size:
+                return
+        except OSError as e:
+            # Unsupported on this filesystem pair; continue with what is left
+            logger.debug(f"{kernel_copy} unavailable ({e}), falling back")
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+
+    shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+
+
+def copy_file_atomic(source_path, dest_path):
+    """
+    Copy a file with metadata, writing through a temporary file and renaming it into place.
+
+    A partially written copy is never visible under the destination name.
+
+    Args:
+        source_path (Path): File to copy.
+        dest_path (Path): Final destination file path.
+    """
+    dest_path = Path(dest_path)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=dest_path.parent, prefix=f".{dest_path.name}.", suffix=".part"
+    )
+    try:
+        with open(source_path, "rb") as fsrc, os.fdopen(fd, "wb") as fdst:
+            _copy_data(fsrc, fdst, os.fstat(fsrc.fileno()).st_size)
+        shutil.copystat(source_path, tmp_name)
+        os.replace(tmp_name, dest_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _current_umask():
+    """Return the process umask (os.umask can only read it by setting it)."""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# read once at import, as setting it is not thread-safe
+UMASK = _current_umask()
+
+
+def write_if_changed(dest_path, data):
+    """
+    Atomically write bytes to a file, unless it already holds exactly these bytes.
+
+    A replaced file keeps its permissions; a new one gets the default
+    permissions of the umask, like a file created with open().
+
+    Args:
+        dest_path (Path): File to write.
+        data (bytes): New contents.
+
+    Returns:
+        bool: Whether the file was written.
+    """
+    dest_path = Path(dest_path)
+    mode = 0o666 & ~UMASK
+    try:
+        with open(dest_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == len(data) and f.read() == data:
+                return False
+            mode = stat.st_mode & 0o7777
+    except FileNotFoundError:
+        pass
+    fd, tmp_name = tempfile.mkstemp(
+        dir=dest_path.parent, prefix=f".{dest_path.name}.", suffix=".part"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file with mode 0600
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, dest_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return True
+
+
+class ByteBudget:
+    """
+    Limits the number of bytes in flight across concurrent copy/hash workers.
+
+    A single request larger than the whole budget is admitted once nothing else
+    is in flight, so oversized files cannot deadlock the mirror.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Initialize the budget.
+
+        Args:
+            max_bytes (int): Maximum number of bytes allowed in flight.
+        """
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, n_bytes):
+        """Block until n_bytes fit into the budget, then reserve them."""
+        with self._condition:
+            while self.in_flight and self.in_flight + n_bytes > self.max_bytes:
+                self._condition.wait()
+            self.in_flight += n_bytes
+
+    def release(self, n_bytes):
+        """Return n_bytes to the budget."""
+        with self._condition:
+            self.in_flight -= n_bytes
+            self._condition.notify_all()
+
+
+def _temp_path(dest_path):
+    """Return an unused temporary path next to dest_path."""
+    fd, tmp_name = tempfile.mkstemp(
+        dir=dest_path.parent, prefix=f".{dest_path.name}.", suffix=".part"
+    )
+    os.close(fd)
+    os.unlink(tmp_name)
+    return Path(tmp_name)
+
+
+def reflink_file(source_path, dest_path):
+    """
+    Create dest_path as a copy-on-write clone of source_path, sharing its data blocks.
+
+    Uses the FICLONE ioctl on Linux and clonefile(2) on macOS (APFS).
+
+    Args:
+        source_path (Path): File to clone.
+        dest_path (Path): Clone to create; must not exist.
+
+    Raises:
+        OSError: If the platform or filesystem does not support reflinks.
+    """
+    if sys.platform == "darwin":
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if libc.clonefile(os.fsencode(source_path), os.fsencode(dest_path), 0) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(dest_path))
+        return
+    if not sys.platform.startswith("linux"):
+        raise OSError(f"reflinks are not supported on {sys.platform}")
+    import fcntl
+
+    with open(source_path, "rb") as fsrc, open(dest_path, "xb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dest_path)
+            raise
+    shutil.copystat(source_path, dest_path)
+
+
+def has_same_contents(source_path, dest_path):
+    """
+    Check whether dest_path already holds the bytes of source_path.
+
+    True for the same inode, a symlink to the source, or a file with equal size
+    and mtime (as preserved by copies); files of equal size but different mtime
+    are compared by digest.
+
+    Args:
+        source_path (Path): Source file.
+        dest_path (Path): Possibly existing destination.
+
+    Returns:
+        bool: Whether rewriting dest_path can be skipped.
+    """
+    try:
+        if os.path.samefile(source_path, dest_path):
+            return True
+        source_stat = os.stat(source_path)
+        dest_stat = os.lstat(dest_path)
+    except FileNotFoundError:
+        return False
+    if Path(dest_path).is_symlink() or source_stat.st_size != dest_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    return file_digest(source_path) == file_digest(dest_path)
+
+
+def _materialize_with(strategy, source_path, dest_path):
+    """Create dest_path from source_path with one strategy, atomically replacing it."""
+    if strategy == "copy":
+        copy_file_atomic(source_path, dest_path)
+        return
+    tmp_path = _temp_path(dest_path)
+    try:
+        if strategy == "hardlink":
+            os.link(source_path, tmp_path)
+        elif strategy == "reflink":
+            reflink_file(source_path, tmp_path)
+        elif strategy == "symlink":
+            os.symlink(Path(source_path).resolve(), tmp_path)
+        else:
+            raise ValueError(f"Unknown materialization strategy: {strategy}")
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class Materializer:
+    """
+    Places files into a directory by hardlink, reflink, symlink or copy.
+
+    Starting from the configured strategy, cheaper strategies the filesystem
+    does not support are skipped in MATERIALIZE_STRATEGIES order. The first
+    strategy that worked is remembered per pair of devices, so later files do
+    not probe again. Destinations that already hold identical bytes are left
+    untouched.
+    """
+
+    def __init__(self, strategy="auto"):
+        """
+        Initialize the materializer.
+
+        Args:
+            strategy (str): "auto" (same as "hardlink") or one of
+                MATERIALIZE_STRATEGIES, the first strategy tried. Defaults to "auto".
+        """
+        if strategy == "auto":
+            strategy = MATERIALIZE_STRATEGIES[0]
+        if strategy not in MATERIALIZE_STRATEGIES:
+            raise ValueError(f"Unknown materialization strategy: {strategy}")
+        self.strategy = strategy
+        self._working = {}  # (source device, destination device) -> strategy
+        self._lock = threading.Lock()
+
+    def materialize(self, source_path, dest_path):
+        """
+        Make dest_path provide the contents of source_path.
+
+        Args:
+            source_path (Path): Existing file.
+            dest_path (Path): Destination, replaced atomically if it differs.
+
+        Returns:
+            str: Strategy used, or "unchanged" if dest_path was already identical.
+        """
+        if has_same_contents(source_path, dest_path):
+            return "unchanged"
+        devices = (os.stat(source_path).st_dev, os.stat(Path(dest_path).parent).st_dev)
+        with self._lock:
+            first = self._working.get(devices, self.strategy)
+        candidates = MATERIALIZE_STRATEGIES[MATERIALIZE_STRATEGIES.index(first) :]
+        for strategy in candidates:
+            try:
+                _materialize_with(strategy, source_path, dest_path)
+            except OSError as e:
+                if strategy == "copy":
+                    raise
+                logger.debug(f"{strategy} failed for {dest_path} ({e}), falling back")
+                continue
+            if strategy != first:
+                logger.info(f"Materializing files with {strategy} on this filesystem")
+            with self._lock:
+                self._working[devices] = strategy
+            return strategy
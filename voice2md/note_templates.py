@@ -49,3 +49,7 @@ tags: [note, voice_memo]
 
     """
     return note
+
+
+# Note templates by name, selectable for the pipeline and for re-rendering
+NOTE_TEMPLATES = {"default": md_note_builder, "obsidian": md_note_builder_obsidian}
@@ -0,0 +1,142 @@
+import itertools
+import queue
+import threading
+import time
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_END = object()
+
+
+class Stage:
+    """
+    A named processing step of a pipeline, run by a fixed number of worker threads.
+
+    The stage function takes an item and returns the item to pass on to the next
+    stage, or None to drop it (e.g. a memo that should be skipped). With a
+    priority function, the workers take the waiting item with the lowest
+    priority first instead of the oldest one.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=2, priority=None):
+        """
+        Initialize the stage.
+
+        Args:
+            name (str): Stage name, used in logs and error reports.
+            func (callable): Function applied to each item.
+            workers (int): Number of worker threads. Defaults to 1.
+            queue_size (int): Capacity of the input queue of this stage. Defaults to 2.
+            priority (callable, optional): Sort key of the waiting items, e.g. the
+                negated file size to take the largest first. Defaults to FIFO.
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.priority = priority
+
+
+class _PriorityQueue(queue.PriorityQueue):
+    """Bounded queue handing out the item with the lowest key first, end markers last."""
+
+    def __init__(self, maxsize, key):
+        super().__init__(maxsize)
+        self._key = key
+        self._order = itertools.count()
+
+    def put(self, item):
+        rank = (1, 0) if item is _END else (0, self._key(item))
+        super().put((*rank, next(self._order), item))
+
+    def get(self):
+        return super().get()[-1]
+
+
+def run_pipeline(items, stages):
+    """
+    Run items through a sequence of stages connected by bounded queues.
+
+    Every stage runs concurrently with the others, so while item N+1 is in one
+    stage, item N can be in the next. A full queue blocks the upstream stage,
+    which bounds the number of items in flight.
+
+    Args:
+        items (iterable): Input items fed to the first stage.
+        stages (list[Stage]): Stages in processing order.
+
+    Returns:
+        dict: "completed" (items that left the last stage), "errors"
+            (list of (item, stage name, exception) tuples) and "timings"
+            (seconds spent per item, by stage name).
+    """
+    queues = [
+        (
+            queue.Queue(maxsize=stage.queue_size)
+            if stage.priority is None
+            else _PriorityQueue(stage.queue_size, stage.priority)
+        )
+        for stage in stages
+    ]
+    completed = []
+    errors = []
+    timings = {stage.name: [] for stage in stages}
+    lock = threading.Lock()
+    remaining_workers = [stage.workers for stage in stages]
+
+    def feed():
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            for _ in range(stages[0].workers):
+                queues[0].put(_END)
+
+    def work(index):
+        stage = stages[index]
+        is_last = index == len(stages) - 1
+        while True:
+            item = queues[index].get()
+            if item is _END:
+                with lock:
+                    remaining_workers[index] -= 1
+                    last_worker = remaining_workers[index] == 0
+                if last_worker and not is_last:
+                    for _ in range(stages[index + 1].workers):
+                        queues[index + 1].put(_END)
+                return
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                logger.error(f"Stage {stage.name} failed for {item}: {e}")
+                with lock:
+                    errors.append((item, stage.name, e))
+                continue
+            finally:
+                with lock:
+                    timings[stage.name].append(time.perf_counter() - start)
+            if result is None:
+                continue
+            if is_last:
+                with lock:
+                    completed.append(result)
+            else:
+                queues[index + 1].put(result)
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for index, stage in enumerate(stages):
+        for n in range(stage.workers):
+            threads.append(
+                threading.Thread(
+                    target=work, args=(index,), name=f"{stage.name}-{n}", daemon=True
+                )
+            )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {"completed": completed, "errors": errors, "timings": timings}
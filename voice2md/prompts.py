@@ -0,0 +1,145 @@
+import functools
+import json
+import os
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_EXAMPLES_PATH = Path(__file__).parent / "few_shot_examples.json"
+# Set to a private examples file, e.g. in ~/data/raw, to replace the defaults
+EXAMPLES_ENV_VAR = "VOICE2MD_FEW_SHOTS"
+
+SUMMARY_INSTRUCTIONS = """\
+You task is to summarize raw transcripts of voice memos, which can be lengthy,
+unstructured and can even contain errors. Here are some examples of how you
+should format your response.
+{examples}
+Your task is to summarize the following voice memo in a concise and structured manner.
+The recording will be in English or in German. Provide a summary in English.
+Be short and precise. No yabbering. Don't invent stuff. At maximum, this can
+be two sentences. Summarize what you can understand from the content of the
+following voice memo.
+Don't add any explanations or whatsoever. Your response is used as a summary
+only and should be between <tldr_summary> and </tldr_summary> tags.
+"""
+
+TITLE_INSTRUCTIONS = """\
+Your task is to provide a fitting short note title for a raw transcripts of
+voice memos, which can be lengthy, unstructured and sometimes even contain errors.
+Here are some examples of raw transcripts and a fitting title for each.
+{examples}
+The recording will be in English or in German. Provide a note title in English.
+Be short, max 5 words. No yabbering. Don't invent stuff.
+Just a title without special letters for the user's voice memo content.
+Don't add any explanations or whatsoever. Your response is used as a title only
+and should be between <title> and </title> tags.
+"""
+
+SUMMARY_AND_TITLE_INSTRUCTIONS = """\
+You task is to summarize raw transcripts of voice memos, which can be lengthy,
+unstructured and can even contain errors, and to give each a fitting short
+note title. Here are some examples of how you should format your response.
+{examples}
+The recording will be in English or in German. Provide summary and title in English.
+Be short and precise. No yabbering. Don't invent stuff. The summary is at maximum
+two sentences, the title at maximum 5 words without special letters.
+Respond with a JSON object with exactly the keys "tldr_summary" and "title"
+and nothing else.
+"""
+
+CHUNK_INSTRUCTIONS = """\
+You are given one part of a raw transcript of a long voice memo, which can
+be unstructured and can even contain errors. The recording will be in
+English or in German. Summarize the content of this part in English in at
+most three sentences. Don't invent stuff. Don't add any explanations or
+whatsoever. Your response should be between <chunk_summary> and
+</chunk_summary> tags.
+"""
+
+REDUCE_INSTRUCTIONS = """\
+You are given the summaries of consecutive parts of one long voice memo.
+Your task is to summarize the whole voice memo in a concise and structured
+manner and to give it a fitting short note title.
+Be short and precise. No yabbering. Don't invent stuff. At maximum, the
+summary can be two sentences; the title is at maximum 5 words without
+special letters. Both in English.
+Don't add any explanations or whatsoever. Put the summary between
+<tldr_summary> and </tldr_summary> tags and the title between <title> and
+</title> tags.
+"""
+
+
+def examples_path():
+    """Return the few-shot examples file: $VOICE2MD_FEW_SHOTS or the bundled defaults."""
+    return Path(os.getenv(EXAMPLES_ENV_VAR) or DEFAULT_EXAMPLES_PATH).expanduser()
+
+
+def load_examples(path):
+    """
+    Load few-shot examples from a JSON file.
+
+    Args:
+        path (Path): File with {"examples": [{"voice_memo", "tldr_summary", "title"}, ...]}.
+
+    Returns:
+        list[dict]: The examples.
+    """
+    with open(path, encoding="utf-8") as f:
+        examples = json.load(f)["examples"]
+    logger.info(f"Loaded {len(examples)} few-shot example(s) from {path}")
+    return examples
+
+
+def _render_examples(examples, render_answer):
+    blocks = [
+        f'<example>\n<voice memo>"{example["voice_memo"]}"</voice memo>\n'
+        f"{render_answer(example)}\n</example>"
+        for example in examples
+    ]
+    return "\n" + "\n\n".join(blocks) + "\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _system_prompts(path):
+    examples = load_examples(path)
+    summary_examples = _render_examples(
+        examples, lambda e: f'<tldr_summary>"{e["tldr_summary"]}"</tldr_summary>'
+    )
+    title_examples = _render_examples(
+        examples, lambda e: f'<title>"{e["title"]}"</title>'
+    )
+    json_examples = _render_examples(
+        examples,
+        lambda e: json.dumps(
+            {"tldr_summary": e["tldr_summary"], "title": e["title"]},
+            ensure_ascii=False,
+        ),
+    )
+    return {
+        "summary": SUMMARY_INSTRUCTIONS.format(examples=summary_examples),
+        "title": TITLE_INSTRUCTIONS.format(examples=title_examples),
+        "summary_and_title": SUMMARY_AND_TITLE_INSTRUCTIONS.format(
+            examples=json_examples
+        ),
+        "chunk": CHUNK_INSTRUCTIONS,
+        "reduce": REDUCE_INSTRUCTIONS,
+    }
+
+
+def system_prompt(kind):
+    """
+    Return the system prompt of a task, built once per examples file.
+
+    The prompt is the same string for every voice memo and the transcript only
+    follows it in the user message, so the server can reuse the evaluated
+    prefix (KV cache) from one call to the next.
+
+    Args:
+        kind (str): "summary", "title", "summary_and_title", "chunk" or "reduce".
+
+    Returns:
+        str: The system prompt.
+    """
+    return _system_prompts(examples_path())[kind]
@@ -0,0 +1,191 @@
+import argparse
+import fnmatch
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from voice2md.logger_config import setup_logger
+from voice2md.mirror import write_if_changed
+from voice2md.note_templates import NOTE_TEMPLATES
+from voice2md.storage import open_storage
+
+logger = setup_logger(__name__)
+
+
+def select_records(records, since=None, until=None, pattern=None):
+    """
+    Filter stored voice memo records.
+
+    Args:
+        records (list[dict]): Stored records.
+        since (datetime, optional): Keep memos recorded at or after this time.
+        until (datetime, optional): Keep memos recorded before this time.
+        pattern (str, optional): Glob the memo file name must match,
+            e.g. "2024-10-*".
+
+    Returns:
+        list[dict]: Matching records.
+    """
+    selected = []
+    for record in records:
+        created = datetime.fromisoformat(record["datetime_created"])
+        if since is not None and created < since:
+            continue
+        if until is not None and created >= until:
+            continue
+        if pattern is not None and not fnmatch.fnmatch(record["file_name"], pattern):
+            continue
+        selected.append(record)
+    return selected
+
+
+def render_record(record, note_template, path_markdown=None):
+    """
+    Render the markdown note of a stored record.
+
+    Args:
+        record (dict): Stored voice memo record.
+        note_template (callable): Note builder from note_templates.
+        path_markdown (Path, optional): Directory to write the note to instead
+            of the stored path's directory.
+
+    Returns:
+        tuple: (note path, note contents).
+    """
+    path = Path(record["file_path_markdown"])
+    if path_markdown is not None:
+        path = Path(path_markdown) / path.name
+    note = note_template(
+        datetime_created=datetime.fromisoformat(record["datetime_created"]),
+        transcript=record["transcript"],
+        transcript_tldr=record["transcript_tldr"],
+        file_path_voice_memo_processed=Path(record["file_path_voice_memo_processed"]),
+    )
+    return path, note
+
+
+def rerender_notes(
+    records, note_template, path_markdown=None, workers=8, dry_run=False
+):
+    """
+    Rebuild markdown notes from stored records, without ASR or LLM calls.
+
+    Notes are rendered on a thread pool. Only notes whose contents changed are
+    written, each atomically through a temporary file.
+
+    Args:
+        records (list[dict]): Stored voice memo records.
+        note_template (callable): Note builder from note_templates.
+        path_markdown (Path, optional): Directory to write the notes to.
+            Defaults to the stored note paths.
+        workers (int): Worker threads. Defaults to 8.
+        dry_run (bool): Only count the notes that would change. Defaults to False.
+
+    Returns:
+        dict: Counts of "rendered", "written", "unchanged" and "failed" notes
+            and the "errors" per file name.
+    """
+
+    def rerender(record):
+        path, note = render_record(record, note_template, path_markdown)
+        data = note.encode("utf-8")
+        if dry_run:
+            try:
+                return path.read_bytes() != data
+            except FileNotFoundError:
+                return True
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return write_if_changed(path, data)
+
+    summary = {"rendered": 0, "written": 0, "unchanged": 0, "failed": 0, "errors": {}}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [(record, executor.submit(rerender, record)) for record in records]
+        for record, future in futures:
+            try:
+                written = future.result()
+            except (OSError, KeyError, ValueError) as e:
+                logger.error(f"Could not re-render {record.get('file_name')}: {e}")
+                summary["failed"] += 1
+                summary["errors"][record.get("file_name")] = str(e)
+                continue
+            summary["rendered"] += 1
+            summary["written" if written else "unchanged"] += 1
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-render markdown notes from the stored transcripts"
+    )
+    parser.add_argument(
+        "--path-db",
+        type=Path,
+        default=None,
+        help="Database directory (default: $PATH_DB)",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=("sqlite", "tinydb"),
+        default="sqlite",
+        help="Database backend (default: sqlite)",
+    )
+    parser.add_argument(
+        "--template",
+        choices=sorted(NOTE_TEMPLATES),
+        default="default",
+        help="Note template (default: default)",
+    )
+    parser.add_argument(
+        "--markdown-dir",
+        type=Path,
+        default=None,
+        help="Write the notes here instead of their stored paths",
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Only memos recorded at or after this date, e.g. 2024-10-01",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Only memos recorded before this date",
+    )
+    parser.add_argument(
+        "--match",
+        default=None,
+        help='Only memos whose file name matches this glob, e.g. "2024-10-*"',
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Worker threads (default: 8)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report how many notes would change",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    path_db = args.path_db or Path(os.getenv("PATH_DB"))
+    with open_storage(path_db, backend=args.storage) as storage:
+        records = storage.all()
+    records = select_records(records, args.since, args.until, args.match)
+    summary = rerender_notes(
+        records,
+        NOTE_TEMPLATES[args.template],
+        path_markdown=args.markdown_dir,
+        workers=args.workers,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
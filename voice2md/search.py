@@ -0,0 +1,346 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from voice2md.logger_config import setup_logger
+from voice2md.storage import open_storage
+from voice2md.transcript_store import SegmentStore
+
+logger = setup_logger(__name__)
+
+SEARCH_FILE_NAME = "search.sqlite"
+# unicode61 folds case and, with remove_diacritics 2, umlauts and accents, so
+# "uber" finds "über". It does no stemming or compound splitting, in German or
+# English: "Haus" finds neither "Häuser" nor "Hausaufgaben", only prefix
+# queries like "haus*" do.
+TOKENIZER = "unicode61 remove_diacritics 2"
+# bm25 weights of title, summary and transcript
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+def to_fts_query(text):
+    """
+    Turn free text into an FTS5 query matching all of its words.
+
+    Every word is quoted, so FTS5 operators and punctuation in the text are
+    taken literally. A trailing * on a word keeps it a prefix query.
+
+    Args:
+        text (str): Search text, e.g. "meeting über Budget*".
+
+    Returns:
+        str: FTS5 query, e.g. '"meeting" "über" "Budget"*'.
+    """
+    terms = []
+    for word in re.findall(r"\w+\*?", text):
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Full-text index of the voice memos in SQLite FTS5, ranked with BM25.
+
+    One row per memo indexes title, TLDR summary and transcript; one row per
+    Whisper segment indexes the segment text with its start and end in
+    milliseconds, to point at where in the recording a hit is.
+
+    The FTS5 tables only hold the indexed text. Their rowids are keys of the
+    regular tables docs (one per memo, unique by file name) and spans (one per
+    segment, indexed by memo), so replacing a memo finds its rows by index
+    instead of scanning the FTS5 tables.
+    """
+
+    def __init__(self, path, journal_mode="WAL"):
+        """
+        Open (and if needed create) the index.
+
+        Args:
+            path (Path): Path of the SQLite file.
+            journal_mode (str): SQLite journal mode. Defaults to "WAL".
+        """
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS docs (
+                    id INTEGER PRIMARY KEY,
+                    file_name TEXT NOT NULL UNIQUE,
+                    datetime_created TEXT
+                );
+                CREATE TABLE IF NOT EXISTS spans (
+                    id INTEGER PRIMARY KEY,
+                    doc_id INTEGER NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS spans_doc_id ON spans (doc_id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS doc_text USING fts5(
+                    title, tldr, transcript, tokenize = '{TOKENIZER}'
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS span_text USING fts5(
+                    text, tokenize = '{TOKENIZER}'
+                );
+                """)
+
+    def _delete(self, file_name):
+        """Delete the rows of a memo; return the id it had, if any."""
+        row = self._conn.execute(
+            "SELECT id FROM docs WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        (doc_id,) = row
+        self._conn.execute(
+            "DELETE FROM span_text WHERE rowid IN "
+            "(SELECT id FROM spans WHERE doc_id = ?)",
+            (doc_id,),
+        )
+        self._conn.execute("DELETE FROM spans WHERE doc_id = ?", (doc_id,))
+        self._conn.execute("DELETE FROM doc_text WHERE rowid = ?", (doc_id,))
+        self._conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+        return doc_id
+
+    def add(self, record, segments=None):
+        """
+        Index a voice memo record, replacing an earlier version of it.
+
+        Args:
+            record (dict): Stored record with file_name, datetime_created,
+                transcript, transcript_tldr and transcript_title.
+            segments (list[dict], optional): Whisper segments of the transcript.
+                Defaults to the segments in the record's transcript, if any.
+        """
+        transcript = record.get("transcript") or {}
+        if segments is None:
+            segments = transcript.get("segments") or []
+        with self._lock, self._conn:
+            self._delete(record["file_name"])
+            doc_id = self._conn.execute(
+                "INSERT INTO docs (file_name, datetime_created) VALUES (?, ?)",
+                (record["file_name"], record.get("datetime_created")),
+            ).lastrowid
+            self._conn.execute(
+                "INSERT INTO doc_text (rowid, title, tldr, transcript) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    doc_id,
+                    record.get("transcript_title") or "",
+                    record.get("transcript_tldr") or "",
+                    transcript.get("text") or "",
+                ),
+            )
+            for segment in segments:
+                span_id = self._conn.execute(
+                    "INSERT INTO spans (doc_id, start_ms, end_ms) VALUES (?, ?, ?)",
+                    (
+                        doc_id,
+                        round(segment["start"] * 1000),
+                        round(segment["end"] * 1000),
+                    ),
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO span_text (rowid, text) VALUES (?, ?)",
+                    (span_id, segment["text"].strip()),
+                )
+
+    def remove(self, file_name):
+        """Remove a voice memo from the index."""
+        with self._lock, self._conn:
+            self._delete(file_name)
+
+    def search(self, query, limit=10, segments_per_hit=3, raw=False):
+        """
+        Find the voice memos matching a query, best first.
+
+        Args:
+            query (str): Search text, or an FTS5 query if raw.
+            limit (int): Maximum number of memos. Defaults to 10.
+            segments_per_hit (int): Maximum matching segments per memo. Defaults to 3.
+            raw (bool): Pass the query to FTS5 unchanged. Defaults to False.
+
+        Returns:
+            list[dict]: Hits with file_name, datetime_created, title, score
+                (BM25, lower is better), snippet and the matching "segments"
+                with start_ms, end_ms and snippet.
+        """
+        fts_query = query if raw else to_fts_query(query)
+        if not fts_query:
+            return []
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT docs.id, docs.file_name, docs.datetime_created,
+                       doc_text.title, bm25(doc_text, {weights}) AS score,
+                       snippet(doc_text, -1, '[', ']', '…', 12)
+                FROM doc_text JOIN docs ON docs.id = doc_text.rowid
+                WHERE doc_text MATCH ?
+                ORDER BY score LIMIT ?
+                """,
+                (fts_query, limit),
+            ).fetchall()
+            if not rows:
+                return []
+            # the matching segments of all hits in one query, best first
+            doc_ids = [row[0] for row in rows]
+            span_rows = self._conn.execute(
+                f"""
+                SELECT spans.doc_id, spans.start_ms, spans.end_ms,
+                       snippet(span_text, 0, '[', ']', '…', 12)
+                FROM span_text JOIN spans ON spans.id = span_text.rowid
+                WHERE span_text MATCH ?
+                  AND spans.doc_id IN ({", ".join("?" * len(doc_ids))})
+                ORDER BY rank
+                """,
+                (fts_query, *doc_ids),
+            ).fetchall()
+        segments = {doc_id: [] for doc_id in doc_ids}
+        for doc_id, start_ms, end_ms, snippet in span_rows:
+            if len(segments[doc_id]) < segments_per_hit:
+                segments[doc_id].append(
+                    {"start_ms": start_ms, "end_ms": end_ms, "snippet": snippet}
+                )
+        return [
+            {
+                "file_name": file_name,
+                "datetime_created": datetime_created,
+                "title": title,
+                "score": score,
+                "snippet": snippet,
+                "segments": segments[doc_id],
+            }
+            for doc_id, file_name, datetime_created, title, score, snippet in rows
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        """Close the index."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_search_index(path_db, **kwargs):
+    """
+    Open the search index in a database directory.
+
+    Args:
+        path_db (Path): Database directory.
+        **kwargs: Keyword arguments for SearchIndex.
+
+    Returns:
+        SearchIndex: The index.
+    """
+    return SearchIndex(Path(path_db) / SEARCH_FILE_NAME, **kwargs)
+
+
+def rebuild_index(search_index, records, segment_store=None):
+    """
+    Index stored records, e.g. those persisted before the index existed.
+
+    Args:
+        search_index (SearchIndex): The index.
+        records (list[dict]): Stored voice memo records.
+        segment_store (SegmentStore, optional): Store of segments moved to sidecars.
+
+    Returns:
+        int: Number of indexed records.
+    """
+    for record in records:
+        segments = None
+        pointer = (record.get("transcript") or {}).get("segments_file")
+        if pointer and segment_store is not None:
+            segments = segment_store.load(pointer, fields=["start", "end", "text"])
+        search_index.add(record, segments)
+    return len(records)
+
+
+def format_ms(ms):
+    """Format milliseconds as [h:]mm:ss."""
+    minutes, seconds = divmod(ms // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    return (
+        f"{hours}:{minutes:02d}:{seconds:02d}"
+        if hours
+        else f"{minutes:02d}:{seconds:02d}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the voice memo transcripts")
+    parser.add_argument("query", nargs="?", help="Words to search for")
+    parser.add_argument(
+        "--path-db",
+        type=Path,
+        default=None,
+        help="Database directory (default: $PATH_DB)",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=10, help="Maximum number of memos (default: 10)"
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Pass the query to FTS5 unchanged, e.g. 'title:budget OR \"next week\"'",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the hits as JSON")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Index all stored records first",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=("sqlite", "tinydb"),
+        default="sqlite",
+        help="Database backend for --rebuild (default: sqlite)",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    path_db = args.path_db or Path(os.getenv("PATH_DB"))
+    with open_search_index(path_db) as search_index:
+        if args.rebuild:
+            with open_storage(path_db, backend=args.storage) as storage:
+                count = rebuild_index(
+                    search_index, storage.all(), SegmentStore(path_db)
+                )
+            print(f"Indexed {count} record(s)")
+        if not args.query:
+            return
+        hits = search_index.search(args.query, limit=args.limit, raw=args.raw)
+    if args.json:
+        print(json.dumps(hits, indent=2, ensure_ascii=False))
+        return
+    for i, hit in enumerate(hits, start=1):
+        print(f"{i}. {hit['title']} ({hit['file_name']}, score {hit['score']:.2f})")
+        print(f"   {hit['snippet']}")
+        for segment in hit["segments"]:
+            print(
+                f"   {format_ms(segment['start_ms'])}-{format_ms(segment['end_ms'])} "
+                f"[{segment['start_ms']}-{segment['end_ms']} ms] {segment['snippet']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
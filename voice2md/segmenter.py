@@ -0,0 +1,225 @@
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+SAMPLE_RATE = 16000  # Whisper expects 16 kHz mono float32
+FRAMES_PER_SECOND = 100  # Whisper mel frames per second, the unit of "seek"
+
+
+def stream_audio(path, sample_rate=SAMPLE_RATE, block_seconds=30.0):
+    """
+    Decode an audio file with ffmpeg and yield it in fixed-size blocks.
+
+    Decodes to the same 16 kHz mono signal as whisper.audio.load_audio, but
+    never holds more than one block in memory.
+
+    Args:
+        path (Path): Audio file.
+        sample_rate (int): Output sample rate. Defaults to 16000.
+        block_seconds (float): Length of the yielded blocks. Defaults to 30.
+
+    Yields:
+        np.ndarray: float32 samples in [-1, 1].
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads",
+        "0",
+        "-i",
+        str(path),
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(sample_rate),
+        "-",
+    ]
+    block_bytes = int(block_seconds * sample_rate) * 2
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        finished = True
+    finally:
+        process.stdout.close()
+        # a consumer that stops early makes ffmpeg fail on the closed pipe
+        if process.wait() != 0 and finished:
+            raise RuntimeError(f"ffmpeg failed to decode {path}")
+
+
+def waveform_blocks(audio, sample_rate=SAMPLE_RATE, block_seconds=30.0):
+    """
+    Yield an in-memory or memory-mapped waveform in fixed-size blocks.
+
+    Args:
+        audio (np.ndarray): float32 waveform.
+        sample_rate (int): Sample rate. Defaults to 16000.
+        block_seconds (float): Length of the yielded blocks. Defaults to 30.
+
+    Yields:
+        np.ndarray: Consecutive views of the waveform.
+    """
+    size = int(block_seconds * sample_rate)
+    for start in range(0, len(audio), size):
+        yield audio[start : start + size]
+
+
+def quietest_point(audio, sample_rate=SAMPLE_RATE, frame_ms=30, smooth_frames=10):
+    """
+    Find the sample index of the quietest stretch of a waveform.
+
+    Computes per-frame RMS energy with vectorized NumPy, smooths it with a
+    moving average and returns the center of the minimum.
+
+    Args:
+        audio (np.ndarray): float32 waveform.
+        sample_rate (int): Sample rate. Defaults to 16000.
+        frame_ms (int): Frame length in milliseconds. Defaults to 30.
+        smooth_frames (int): Moving-average window in frames. Defaults to 10.
+
+    Returns:
+        int: Sample index to split at.
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return len(audio) // 2
+    frames = audio[: n_frames * frame].reshape(n_frames, frame)
+    energy = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    window = min(smooth_frames, n_frames)
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+    return int(np.argmin(smoothed)) * frame + frame // 2
+
+
+def split_at_silence(
+    blocks, sample_rate=SAMPLE_RATE, max_segment_seconds=300.0, search_seconds=30.0
+):
+    """
+    Cut a stream of audio blocks into segments at quiet points.
+
+    Each segment is at most max_segment_seconds long; the cut is placed at the
+    quietest point within the last search_seconds of that limit. At most one
+    segment plus one block is held in memory, regardless of recording length.
+
+    Args:
+        blocks (iterable[np.ndarray]): Consecutive float32 waveform blocks.
+        sample_rate (int): Sample rate. Defaults to 16000.
+        max_segment_seconds (float): Maximum segment length. Defaults to 300.
+        search_seconds (float): Window searched for a quiet cut. Defaults to 30.
+
+    Yields:
+        tuple: (offset in seconds, float32 segment waveform).
+    """
+    max_samples = int(max_segment_seconds * sample_rate)
+    search_samples = min(int(search_seconds * sample_rate), max_samples // 2)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) > max_samples:
+            search_start = max_samples - search_samples
+            cut = search_start + quietest_point(
+                buffer[search_start:max_samples], sample_rate
+            )
+            yield offset / sample_rate, buffer[:cut].copy()
+            buffer = buffer[cut:]
+            offset += cut
+    if len(buffer):
+        yield offset / sample_rate, buffer
+
+
+def stitch_transcripts(parts):
+    """
+    Join segment transcripts into one transcript dict of Whisper's shape.
+
+    Segment timestamps and seek positions are shifted by the segment offset
+    and segment ids renumbered.
+
+    Args:
+        parts (list[tuple]): (offset in seconds, transcript dict) in order.
+
+    Returns:
+        dict: Transcript with "text", "segments" and "language".
+    """
+    texts = []
+    segments = []
+    language = None
+    for offset, transcript in parts:
+        text = transcript["text"].strip()
+        if text:
+            texts.append(text)
+        language = language or transcript.get("language")
+        for segment in transcript.get("segments", []):
+            shifted = dict(segment)
+            shifted["id"] = len(segments)
+            shifted["seek"] = segment.get("seek", 0) + int(offset * FRAMES_PER_SECOND)
+            shifted["start"] = segment["start"] + offset
+            shifted["end"] = segment["end"] + offset
+            segments.append(shifted)
+    stitched = {"text": " ".join(texts), "segments": segments, "language": language}
+    asr = [transcript["asr"] for _, transcript in parts if "asr" in transcript]
+    if asr:
+        # model tiers chosen per segment by an AdaptiveASRModel
+        stitched["asr"] = asr
+    return stitched
+
+
+def transcribe_segmented(
+    asr_model,
+    audio_path,
+    max_segment_seconds=300.0,
+    workers=1,
+    blocks=None,
+    **options,
+):
+    """
+    Transcribe a long recording segment by segment.
+
+    Segments are cut at silence and transcribed with up to `workers` segments
+    in flight, so peak memory stays bounded. Parallel segments need an ASR
+    model that supports concurrent calls, such as a TranscriptionPool; an
+    in-process Whisper model should be used with workers=1.
+
+    Args:
+        asr_model: Object with a Whisper-compatible transcribe(audio, **options).
+        audio_path (Path): Audio file.
+        max_segment_seconds (float): Maximum segment length. Defaults to 300.
+        workers (int): Segments transcribed concurrently. Defaults to 1.
+        blocks (iterable[np.ndarray], optional): Pre-decoded waveform blocks.
+            Defaults to streaming the file through ffmpeg.
+        **options: Keyword arguments passed to the model's transcribe.
+
+    Returns:
+        dict: Stitched transcript with "text", "segments" and "language".
+    """
+    if blocks is None:
+        blocks = stream_audio(audio_path)
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        in_flight = set()
+        for offset, segment in split_at_silence(
+            blocks, max_segment_seconds=max_segment_seconds
+        ):
+            if len(in_flight) >= max(1, workers):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            future = executor.submit(asr_model.transcribe, segment, **options)
+            futures.append((offset, future))
+            in_flight.add(future)
+    parts = [(offset, future.result()) for offset, future in futures]
+    logger.info(f"Transcribed {audio_path} in {len(parts)} segment(s)")
+    return stitch_transcripts(parts)
@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+SQLITE_FILE_NAME = "voice2md.sqlite"
+TINYDB_FILE_NAME = "db.json"
+
+
+class SQLiteStorage:
+    """
+    Voice memo records in SQLite, one row per file_name.
+
+    The database runs in WAL mode, so readers do not block the writer.
+    upsert() replaces an existing record of the same file_name instead of
+    appending a duplicate; writes are buffered and committed in batches of
+    one transaction each.
+    """
+
+    def __init__(self, path, batch_size=50, journal_mode="WAL"):
+        """
+        Open (and if needed create) the database.
+
+        Args:
+            path (Path): Path of the SQLite file.
+            batch_size (int): Number of upserts committed per transaction. Defaults to 50.
+            journal_mode (str): SQLite journal mode. WAL needs shared memory and
+                so a local filesystem; use "DELETE" for a database shared over
+                the network. Defaults to "WAL".
+        """
+        self.path = Path(path)
+        self.batch_size = max(1, batch_size)
+        self._pending = []
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS voice_memos (
+                    id INTEGER PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    datetime_created TEXT,
+                    record TEXT NOT NULL
+                )
+                """)
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_voice_memos_file_name "
+                "ON voice_memos (file_name)"
+            )
+
+    @property
+    def schema_version(self):
+        """Version of the database (PRAGMA user_version), raised by each migration."""
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @schema_version.setter
+    def schema_version(self, version):
+        self.flush()
+        with self._lock, self._conn:
+            self._conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def upsert(self, record):
+        """
+        Insert or replace the record of a voice memo.
+
+        Args:
+            record (dict): Record with at least a "file_name" key.
+        """
+        with self._lock:
+            self._pending.append(
+                (
+                    record["file_name"],
+                    record.get("datetime_created"),
+                    json.dumps(record),
+                )
+            )
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Commit all buffered upserts in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    """
+                    INSERT INTO voice_memos (file_name, datetime_created, record)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (file_name) DO UPDATE SET
+                        datetime_created = excluded.datetime_created,
+                        record = excluded.record
+                    """,
+                    self._pending,
+                )
+            self._pending = []
+
+    def get(self, file_name):
+        """Return the record of a file name, or None."""
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM voice_memos WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all(self):
+        """Return all records, ordered by recording datetime."""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM voice_memos ORDER BY datetime_created, file_name"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM voice_memos").fetchone()[0]
+
+    def close(self):
+        """Commit pending writes and close the database."""
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TinyDBStorage:
+    """
+    Voice memo records in a TinyDB JSON file, behind the same interface as SQLiteStorage.
+
+    TinyDB rewrites the whole file on every write; prefer SQLiteStorage for
+    growing archives.
+    """
+
+    def __init__(self, path):
+        """
+        Open (and if needed create) the database.
+
+        Args:
+            path (Path): Path of the JSON file.
+        """
+        from tinydb import Query, TinyDB
+
+        self.path = Path(path)
+        self._db = TinyDB(self.path)
+        self._query = Query()
+        self._lock = threading.Lock()
+
+    def upsert(self, record):
+        """Insert or replace the record of a voice memo."""
+        with self._lock:
+            self._db.upsert(record, self._query.file_name == record["file_name"])
+
+    def flush(self):
+        """Writes are not buffered; nothing to do."""
+
+    def get(self, file_name):
+        """Return the record of a file name, or None."""
+        with self._lock:
+            return self._db.get(self._query.file_name == file_name)
+
+    def all(self):
+        """Return all records, ordered by recording datetime."""
+        with self._lock:
+            records = [dict(record) for record in self._db.all()]
+        return sorted(
+            records,
+            key=lambda r: (r.get("datetime_created") or "", r["file_name"]),
+        )
+
+    def __len__(self):
+        with self._lock:
+            return len(self._db)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_tinydb_records(json_path):
+    """
+    Read the records of a TinyDB db.json file without requiring TinyDB.
+
+    Args:
+        json_path (Path): Path of the db.json file.
+
+    Returns:
+        list[dict]: Records in insertion order.
+    """
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    records = []
+    for table in data.values():
+        for doc_id in sorted(table, key=int):
+            records.append(table[doc_id])
+    return records
+
+
+def migrate_tinydb(json_path, storage, overwrite=True):
+    """
+    Copy all records of a TinyDB db.json file into a storage backend.
+
+    Records are upserted in insertion order, so for duplicated file names
+    the most recent record wins.
+
+    Args:
+        json_path (Path): Path of the db.json file.
+        storage: Target storage backend.
+        overwrite (bool): Replace records the backend already has. Without,
+            only missing records are added, so that running the migration
+            again does not undo later changes. Defaults to True.
+
+    Returns:
+        int: Number of migrated records.
+    """
+    records = read_tinydb_records(json_path)
+    existing = set() if overwrite else {r["file_name"] for r in storage.all()}
+    for record in records:
+        if record["file_name"] not in existing:
+            storage.upsert(record)
+    storage.flush()
+    logger.info(
+        f"Migrated {len(records)} records from {json_path} ({len(storage)} unique voice memos)"
+    )
+    return len(records)
+
+
+def _import_tinydb(storage, path_db):
+    """Migration to version 1: import the records of an existing db.json."""
+    tinydb_path = Path(path_db) / TINYDB_FILE_NAME
+    if tinydb_path.exists():
+        # databases from before versioning may have newer records already
+        migrate_tinydb(tinydb_path, storage, overwrite=False)
+
+
+# Migration i brings a SQLite database from version i to version i + 1
+MIGRATIONS = [_import_tinydb]
+
+
+def open_storage(path_db, backend="sqlite", batch_size=50, journal_mode="WAL"):
+    """
+    Open the storage backend in the database directory.
+
+    A SQLite database is brought to the latest schema version (PRAGMA
+    user_version) by running the MIGRATIONS it has not had yet, e.g. the
+    import of an existing db.json. A failed migration is logged and retried
+    the next time the database is opened.
+
+    Args:
+        path_db (Path): Database directory.
+        backend (str): "sqlite" or "tinydb". Defaults to "sqlite".
+        batch_size (int): Upserts per transaction for SQLite. Defaults to 50.
+        journal_mode (str): SQLite journal mode. Defaults to "WAL".
+
+    Returns:
+        SQLiteStorage or TinyDBStorage: The storage backend.
+    """
+    path_db = Path(path_db)
+    path_db.mkdir(parents=True, exist_ok=True)
+    if backend == "tinydb":
+        return TinyDBStorage(path_db / TINYDB_FILE_NAME)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    storage = SQLiteStorage(
+        path_db / SQLITE_FILE_NAME, batch_size=batch_size, journal_mode=journal_mode
+    )
+    for version in range(storage.schema_version, len(MIGRATIONS)):
+        try:
+            MIGRATIONS[version](storage, path_db)
+        except Exception as e:
+            logger.error(
+                f"Migration of {storage.path} to version {version + 1} failed, "
+                f"retrying on next open: {e}"
+            )
+            break
+        storage.schema_version = version + 1
+    return storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the voice memo database")
+    parser.add_argument(
+        "--path-db",
+        type=Path,
+        default=None,
+        help="Database directory (default: $PATH_DB)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="Import db.json into the SQLite database")
+    subparsers.add_parser("count", help="Show the number of stored voice memos")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    path_db = args.path_db or Path(os.getenv("PATH_DB"))
+    with SQLiteStorage(path_db / SQLITE_FILE_NAME) as storage:
+        if args.command == "migrate":
+            migrate_tinydb(path_db / TINYDB_FILE_NAME, storage)
+        print(len(storage))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def default_reply(messages):
+    """Answer every request with a combined JSON summary/title response."""
+    return json.dumps({"tldr_summary": "A stub summary.", "title": "Stub title"})
+
+
+class StubChatServer:
+    """
+    Local HTTP server imitating the OpenAI chat-completions endpoint of Ollama.
+
+    Used in tests and benchmarks in place of a real LLM server. It answers
+    POST /v1/chat/completions after a configurable latency, can fail the first
+    requests with HTTP 503 to exercise retries, and records how many requests
+    were in flight at once. Streamed requests are answered with server-sent
+    events, and POST /api/generate imitates Ollama's model preloading.
+    """
+
+    def __init__(self, latency=0.0, reply=default_reply, fail_first=0):
+        """
+        Initialize the server. It is started with start() or as a context manager.
+
+        Args:
+            latency (float): Seconds to wait before answering. Defaults to 0.
+            reply (callable): Function of the request messages returning the
+                response content. Defaults to a fixed JSON summary/title.
+            fail_first (int): Number of initial requests answered with HTTP 503.
+        """
+        self.latency = latency
+        self.reply = reply
+        self.fail_first = fail_first
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.system_prompts = []
+        self.preloads = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def host(self):
+        """Host URL, as used by Ollama's native API."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        """Base URL to pass to an OpenAI-compatible client."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handle(self, handler):
+        length = int(handler.headers.get("Content-Length", 0))
+        body = json.loads(handler.rfile.read(length) or b"{}")
+        with self._lock:
+            self.requests += 1
+            request_number = self.requests
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if request_number <= self.fail_first:
+                payload = {"error": {"message": "stub overloaded"}}
+                status = 503
+            else:
+                content = self.reply(body.get("messages", []))
+                prompt_chars = sum(
+                    len(m.get("content", "")) for m in body.get("messages", [])
+                )
+                payload = {
+                    "id": f"chatcmpl-stub-{request_number}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": content},
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_chars // 4,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": (prompt_chars + len(content)) // 4,
+                    },
+                }
+                status = 200
+            self.system_prompts.append(
+                next(
+                    (
+                        m["content"]
+                        for m in body.get("messages", [])
+                        if m["role"] == "system"
+                    ),
+                    None,
+                )
+            )
+            if status == 200 and body.get("stream"):
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                self._send_stream(handler, payload, include_usage)
+                return
+            data = json.dumps(payload).encode()
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request (e.g. its timeout expired)
+            pass
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _send_stream(self, handler, payload, include_usage):
+        """Send a completion as server-sent chat.completion.chunk events."""
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        content = payload["choices"][0]["message"]["content"]
+        pieces = [content[i : i + 16] for i in range(0, len(content), 16)]
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": piece} for piece in pieces]
+        base = {key: payload[key] for key in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+        events = [
+            dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            for delta in deltas
+        ]
+        events.append(
+            dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        )
+        if include_usage:
+            events.append(dict(base, choices=[], usage=payload["usage"]))
+        for event in events:
+            handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            handler.wfile.flush()
+        handler.wfile.write(b"data: [DONE]\n\n")
+
+    def _handle_generate(self, handler):
+        """Answer Ollama's native /api/generate, as used to preload a model."""
+        length = int(handler.headers.get("Content-Length", 0))
+        body = json.loads(handler.rfile.read(length) or b"{}")
+        with self._lock:
+            self.preloads.append(body)
+        data = json.dumps({"model": body.get("model"), "response": "", "done": True})
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data.encode())
+
+    def start(self):
+        """Start serving on a free localhost port in a background thread."""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path.rstrip("/").endswith("/chat/completions"):
+                    stub._handle(self)
+                elif self.path.rstrip("/") == "/api/generate":
+                    stub._handle_generate(self)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class FakeASRModel:
+    """
+    Deterministic stand-in for a Whisper model, used in tests and benchmarks.
+
+    Returns a transcript of Whisper's shape whose words depend only on the
+    input, after a fixed latency plus an optional real-time factor. The audio
+    duration of a file is estimated from its size at a nominal bitrate.
+    """
+
+    WORDS = ["voice", "memo", "idea", "meeting", "note", "project", "call", "plan"]
+    cache_name = "fake"
+
+    def __init__(self, latency=0.0, realtime_factor=0.0, bytes_per_second=16000):
+        """
+        Initialize the model.
+
+        Args:
+            latency (float): Seconds every call takes. Defaults to 0.
+            realtime_factor (float): Extra seconds per second of audio. Defaults to 0.
+            bytes_per_second (int): Bitrate used to estimate the duration of a
+                file. Defaults to 16000 (128 kbit/s AAC).
+        """
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+        self.bytes_per_second = bytes_per_second
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, **options):
+        """
+        Return a fake transcript of an audio file path or waveform.
+
+        Args:
+            audio (str or np.ndarray): Path of the audio file or 16 kHz waveform.
+            **options: Ignored Whisper options.
+
+        Returns:
+            dict: Transcript with "text", "segments" and "language".
+        """
+        with self._lock:
+            self.calls += 1
+        if isinstance(audio, str):
+            duration = os.path.getsize(audio) / self.bytes_per_second
+            seed = os.path.basename(audio).encode()
+        else:
+            duration = len(audio) / 16000
+            seed = str(len(audio)).encode()
+        time.sleep(self.latency + self.realtime_factor * duration)
+
+        digest = hashlib.sha256(seed).digest()
+        segments = []
+        for second in range(max(1, int(duration))):
+            words = [
+                self.WORDS[digest[(second + i) % len(digest)] % len(self.WORDS)]
+                for i in range(3)
+            ]
+            segments.append(
+                {
+                    "id": second,
+                    "seek": 0,
+                    "start": float(second),
+                    "end": float(min(second + 1, max(duration, 1))),
+                    "text": " " + " ".join(words),
+                }
+            )
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": "en",
+        }
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MANIFEST_FILE_NAME = ".voice2md_manifest.json"
+
+
+def file_digest(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Compute a BLAKE2b digest of a file by streaming it in fixed-size chunks.
+
+    Args:
+        file_path (Path): File to hash.
+        chunk_size (int): Number of bytes read per chunk. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def stat_signature(stat_result):
+    """
+    Reduce an os.stat_result to the fields used for change detection.
+
+    Args:
+        stat_result (os.stat_result): Result of Path.stat().
+
+    Returns:
+        dict: size, mtime_ns and inode of the file.
+    """
+    return {
+        "size": stat_result.st_size,
+        "mtime_ns": stat_result.st_mtime_ns,
+        "inode": stat_result.st_ino,
+    }
+
+
+class SyncManifest:
+    """
+    Persistent record of mirrored files, used to skip unchanged files from stat() alone.
+
+    Each entry is keyed by file name and stores the stat signature of the source
+    and destination file at the time of the last sync, plus the content digest
+    (filled in lazily, only once a file had to be hashed).
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the manifest and load existing entries from disk.
+
+        Args:
+            path (Path): Path of the manifest JSON file.
+        """
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable sync manifest {self.path}: {e}")
+                self.entries = {}
+
+    @classmethod
+    def for_directory(cls, directory):
+        """Return the manifest stored in the given destination directory."""
+        return cls(Path(directory) / MANIFEST_FILE_NAME)
+
+    def get(self, name):
+        """Return the manifest entry for a file name, or None."""
+        return self.entries.get(name)
+
+    def is_unchanged(self, name, source_stat, dest_stat):
+        """
+        Check whether source and destination still match the last recorded sync.
+
+        Args:
+            name (str): File name.
+            source_stat (os.stat_result): Current stat of the source file.
+            dest_stat (os.stat_result): Current stat of the destination file.
+
+        Returns:
+            bool: True if neither file changed since it was recorded.
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return False
+        return entry["source"] == stat_signature(source_stat) and entry[
+            "destination"
+        ] == stat_signature(dest_stat)
+
+    def record(self, name, source_stat, dest_stat, digest=None):
+        """
+        Record the state of a mirrored file.
+
+        Args:
+            name (str): File name.
+            source_stat (os.stat_result): Stat of the source file.
+            dest_stat (os.stat_result): Stat of the destination file.
+            digest (str, optional): Content digest, if known.
+        """
+        self.entries[name] = {
+            "source": stat_signature(source_stat),
+            "destination": stat_signature(dest_stat),
+            "digest": digest,
+        }
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from voice2md.disk_cache import DiskCache, make_key
+from voice2md.logger_config import setup_logger
+from voice2md.sync_manifest import file_digest
+
+logger = setup_logger(__name__)
+
+
+class TranscriptCache(DiskCache):
+    """
+    Content-addressed cache of Whisper transcription results.
+
+    Entries are keyed by the audio content digest plus the ASR model name and
+    transcribe options, so renamed or re-copied files still hit, while a change
+    of model or options misses.
+    """
+
+    def key_for(self, audio_path, model_name, options=None):
+        """
+        Build the cache key for transcribing an audio file.
+
+        Args:
+            audio_path (Path): Audio file to transcribe.
+            model_name (str): ASR model name.
+            options (dict, optional): Transcribe options.
+
+        Returns:
+            str: Cache key.
+        """
+        return make_key(file_digest(audio_path), model_name, options or {})
+
+
+def model_cache_name(asr_model, model_name=None):
+    """
+    Return the name identifying an ASR model in transcript cache keys.
+
+    The model's own cache_name wins, since it covers every setting that changes
+    the transcript; model_name is for models without one.
+
+    Args:
+        asr_model: ASR model.
+        model_name (str, optional): Name of the model.
+
+    Returns:
+        str: Model name for the cache key.
+
+    Raises:
+        ValueError: Neither the model nor the caller names the model, so
+            transcripts of different models would share cache entries.
+    """
+    name = getattr(asr_model, "cache_name", None) or model_name
+    if name is None:
+        raise ValueError(
+            f"The transcript cache needs the name of the ASR model "
+            f"({type(asr_model).__name__})"
+        )
+    return name
+
+
+def default_cache_dir():
+    """Return the transcript cache directory below PATH_DB."""
+    load_dotenv()
+    return Path(os.getenv("PATH_DB")) / "cache" / "transcripts"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Inspect and prune the transcript cache"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Cache directory (default: $PATH_DB/cache/transcripts)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show cache size and hit/miss counters")
+    prune = subparsers.add_parser("prune", help="Evict least recently used entries")
+    prune.add_argument(
+        "--max-size-mb", type=float, required=True, help="Size to prune the cache to"
+    )
+    subparsers.add_parser("clear", help="Remove all entries")
+    args = parser.parse_args(argv)
+
+    cache = TranscriptCache(args.cache_dir or default_cache_dir())
+    if args.command == "prune":
+        removed = cache.evict(max_size_mb=args.max_size_mb)
+        logger.info(f"Removed {removed} entries")
+    elif args.command == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
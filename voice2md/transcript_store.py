@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from voice2md.logger_config import setup_logger
+from voice2md.storage import open_storage
+
+logger = setup_logger(__name__)
+
+SEGMENTS_DIR_NAME = "segments"
+FORMAT_VERSION = 1
+INT64_RANGE = (-(2**63), 2**63 - 1)
+_MISSING = object()
+
+
+def _column_kind(values):
+    """Return how a segment field is stored: int, float, text, tokens or None (JSON)."""
+    if all(type(value) is int for value in values):
+        if all(INT64_RANGE[0] <= value <= INT64_RANGE[1] for value in values):
+            return "int"
+    elif all(type(value) is float for value in values):
+        return "float"
+    elif all(type(value) is str for value in values):
+        return "text"
+    elif all(
+        type(value) is list and all(type(item) is int for item in value)
+        for value in values
+    ):
+        if all(-(2**31) <= item < 2**31 for value in values for item in value):
+            return "tokens"
+    return None
+
+
+def _pack_texts(np, texts):
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_texts(data, offsets):
+    data = data.tobytes()
+    return [
+        data[begin:end].decode("utf-8")
+        for begin, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def pack_segments(segments, position=None):
+    """
+    Pack Whisper segments into compressible columns.
+
+    Fields present in every segment with one type become typed columns:
+    start/end/avg_logprob etc. as float64, id/seek as int64, the texts as one
+    UTF-8 buffer with offsets and the token lists as one int32 array with
+    offsets. Anything else (e.g. word timestamps) is kept as JSON per segment,
+    so unpack_segments reconstructs the segments exactly.
+
+    Args:
+        segments (list[dict]): Whisper segments.
+        position (int, optional): Index of "segments" among the keys of the
+            transcript, so the transcript is rebuilt with its original key order.
+
+    Returns:
+        dict: Arrays by name, for np.savez_compressed.
+    """
+    import numpy as np
+
+    fields = []
+    for segment in segments:
+        for field in segment:
+            if field not in fields:
+                fields.append(field)
+    columns = {}
+    arrays = {}
+    for field in fields:
+        values = [segment.get(field, _MISSING) for segment in segments]
+        if any(value is _MISSING for value in values):
+            continue
+        kind = _column_kind(values)
+        if kind is None:
+            continue
+        columns[field] = kind
+        if kind == "int":
+            arrays[field] = np.array(values, dtype=np.int64)
+        elif kind == "float":
+            arrays[field] = np.array(values, dtype=np.float64)
+        elif kind == "text":
+            arrays[f"{field}.data"], arrays[f"{field}.offsets"] = _pack_texts(
+                np, values
+            )
+        else:
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(value) for value in values])
+            arrays[f"{field}.offsets"] = offsets
+            arrays[f"{field}.data"] = np.array(
+                [item for value in values for item in value], dtype=np.int32
+            )
+    extras = [
+        json.dumps({k: v for k, v in segment.items() if k not in columns})
+        for segment in segments
+    ]
+    if any(extra != "{}" for extra in extras):
+        arrays["_extra.data"], arrays["_extra.offsets"] = _pack_texts(np, extras)
+    layout = {
+        "version": FORMAT_VERSION,
+        "count": len(segments),
+        "fields": fields,
+        "columns": columns,
+        "position": position,
+    }
+    arrays["_layout"] = np.array(json.dumps(layout))
+    return arrays
+
+
+def unpack_segments(arrays, fields=None):
+    """
+    Rebuild Whisper segments from packed columns.
+
+    Args:
+        arrays (Mapping): Arrays by name, e.g. an opened .npz file.
+        fields (list[str], optional): Only rebuild these fields, reading only
+            their columns. Defaults to all fields.
+
+    Returns:
+        list[dict]: The segments, equal to the packed ones.
+    """
+    layout = json.loads(str(arrays["_layout"]))
+    count = layout["count"]
+    wanted = layout["fields"] if fields is None else list(fields)
+    values = {}
+    for field, kind in layout["columns"].items():
+        if field not in wanted:
+            continue
+        if kind in ("int", "float"):
+            values[field] = arrays[field].tolist()
+        elif kind == "text":
+            values[field] = _unpack_texts(
+                arrays[f"{field}.data"], arrays[f"{field}.offsets"]
+            )
+        else:
+            data = arrays[f"{field}.data"].tolist()
+            offsets = arrays[f"{field}.offsets"].tolist()
+            values[field] = [
+                data[begin:end] for begin, end in zip(offsets[:-1], offsets[1:])
+            ]
+    extras = [{}] * count
+    if "_extra.data" in arrays and any(f not in layout["columns"] for f in wanted):
+        extras = [
+            json.loads(extra)
+            for extra in _unpack_texts(arrays["_extra.data"], arrays["_extra.offsets"])
+        ]
+    segments = []
+    for i in range(count):
+        segment = {}
+        for field in wanted:
+            if field in values:
+                segment[field] = values[field][i]
+            elif field in extras[i]:
+                segment[field] = extras[i][field]
+        segments.append(segment)
+    return segments
+
+
+class SegmentStore:
+    """
+    Whisper segments of the stored transcripts, one compressed .npz sidecar per memo.
+
+    Database records keep the transcript text, language and a pointer to the
+    sidecar (relative to the database directory); the segments are only read
+    when needed, and then only the requested columns.
+    """
+
+    def __init__(self, path_db):
+        """
+        Initialize the store.
+
+        Args:
+            path_db (Path): Database directory; sidecars go to its segments/ directory.
+        """
+        self.path_db = Path(path_db)
+        self.path = self.path_db / SEGMENTS_DIR_NAME
+
+    def save(self, file_name, segments, position=None):
+        """
+        Atomically write the segments of a memo.
+
+        Args:
+            file_name (str): Processed file name of the memo.
+            segments (list[dict]): Whisper segments.
+            position (int, optional): Index of "segments" among the transcript keys.
+
+        Returns:
+            str: Pointer to the sidecar, for the database record.
+        """
+        import numpy as np
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        pointer = f"{SEGMENTS_DIR_NAME}/{file_name}.npz"
+        path = self.path_db / pointer
+        fd, tmp = tempfile.mkstemp(
+            dir=self.path, prefix=f".{path.name}.", suffix=".part"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **pack_segments(segments, position))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return pointer
+
+    def load(self, pointer, fields=None):
+        """
+        Read the segments of a memo.
+
+        Args:
+            pointer (str): Pointer returned by save.
+            fields (list[str], optional): Only read these fields, e.g.
+                ["start", "end", "text"]. Defaults to all fields.
+
+        Returns:
+            list[dict]: The segments.
+        """
+        return self._read(pointer, fields)[0]
+
+    def _read(self, pointer, fields=None):
+        import numpy as np
+
+        with np.load(self.path_db / pointer, allow_pickle=False) as arrays:
+            layout = json.loads(str(arrays["_layout"]))
+            return unpack_segments(arrays, fields), layout
+
+    def compact(self, file_name, transcript):
+        """
+        Move the segments of a transcript to a sidecar.
+
+        Args:
+            file_name (str): Processed file name of the memo.
+            transcript (dict): Whisper transcript.
+
+        Returns:
+            dict: The transcript without "segments" and with a "segments_file"
+                pointer; other keys (text, language, asr) are kept.
+        """
+        if "segments" not in transcript:
+            return transcript
+        compact = {k: v for k, v in transcript.items() if k != "segments"}
+        compact["segments_file"] = self.save(
+            file_name, transcript["segments"], list(transcript).index("segments")
+        )
+        return compact
+
+    def expand(self, transcript, fields=None):
+        """
+        Reconstruct the full transcript of a compacted one.
+
+        Args:
+            transcript (dict): Transcript as stored in the database record.
+            fields (list[str], optional): Only read these segment fields.
+
+        Returns:
+            dict: The transcript with its "segments", as before compact.
+        """
+        if "segments_file" not in transcript:
+            return transcript
+        segments, layout = self._read(transcript["segments_file"], fields)
+        items = [(k, v) for k, v in transcript.items() if k != "segments_file"]
+        position = layout.get("position")
+        if position is None:
+            position = len(items)
+        items.insert(position, ("segments", segments))
+        return dict(items)
+
+
+def compact_records(storage, segment_store):
+    """
+    Move the segments of all stored records with inline segments to sidecars.
+
+    Args:
+        storage: SQLiteStorage or TinyDBStorage.
+        segment_store (SegmentStore): Sidecar store.
+
+    Returns:
+        int: Number of compacted records.
+    """
+    count = 0
+    for record in storage.all():
+        transcript = record.get("transcript") or {}
+        if "segments" not in transcript:
+            continue
+        record["transcript"] = segment_store.compact(record["file_name"], transcript)
+        storage.upsert(record)
+        count += 1
+    storage.flush()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Move the transcript segments of stored records to compressed sidecars"
+    )
+    parser.add_argument(
+        "--path-db",
+        type=Path,
+        default=None,
+        help="Database directory (default: $PATH_DB)",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=("sqlite", "tinydb"),
+        default="sqlite",
+        help="Database backend (default: sqlite)",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    path_db = args.path_db or Path(os.getenv("PATH_DB"))
+    with open_storage(path_db, backend=args.storage) as storage:
+        count = compact_records(storage, SegmentStore(path_db))
+    print(f"Compacted {count} record(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,69 @@
-import shutil
+import json
 import re
 from datetime import datetime
 
-from voice2md.llm import llm_generate_note_title, llm_summarize_transcript
+from voice2md.llm import (
+    estimate_tokens,
+    llm_generate_note_title,
+    llm_summarize_and_title,
+    llm_summarize_map_reduce,
+    llm_summarize_transcript,
+)
+from voice2md.logger_config import setup_logger
+from voice2md.metrics import MemoMetrics, measured
+from voice2md.mirror import Materializer, write_if_changed
 from voice2md.note_templates import md_note_builder
+from voice2md.transcript_cache import model_cache_name
+
+logger = setup_logger(__name__)
+
+
+def parse_datetime_from_file_name(file_name):
+    """
+    Parse the recording datetime from a voice memo file name.
+
+    Args:
+        file_name (str): File name like "20241016 101010-ABCD.m4a".
+
+    Returns:
+        datetime: Recording datetime.
+    """
+    datetime_str = str(file_name).split("/")[-1].split("-")[0]
+    return datetime.strptime(datetime_str, "%Y%m%d %H%M%S")
+
+
+def parse_summary_and_title(text):
+    """
+    Parse a combined summary/title response, as JSON or as tagged output.
+
+    Args:
+        text (str): Raw LLM response content.
+
+    Returns:
+        tuple: (tldr_summary, title), or None if the response cannot be parsed.
+    """
+    # JSON object, possibly wrapped in a code fence or surrounded by chatter
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            tldr = data.get("tldr_summary")
+            title = data.get("title")
+            if isinstance(tldr, str) and isinstance(title, str):
+                if tldr.strip() and title.strip():
+                    return tldr.strip(), title.strip()
+
+    tldr_match = re.search(r"<tldr_summary>(.*?)</tldr_summary>", text, re.DOTALL)
+    title_match = re.search(r"<title>(.*?)</title>", text, re.DOTALL)
+    if tldr_match and title_match:
+        tldr = tldr_match.group(1).strip()
+        title = title_match.group(1).strip()
+        if tldr and title:
+            return tldr, title
+    return None
 
 
 class VoiceMemo:
@@ -31,13 +91,15 @@ class VoiceMemo:
         self.transcript_title = None
         self.file_name_datetime = None
         self.file_path_voice_memo_processed = None
+        self.file_path_audio = None
+        self.materialized_as = None
         self.file_path_markdown = None
         self.md_note = None
+        self.metrics = MemoMetrics()
 
     def parse_datetime_created(self):
         """Parse the creation datetime from the original file name."""
-        datetime_str = str(self.file_path_original).split("/")[-1].split("-")[0]
-        self.datetime_created = datetime.strptime(datetime_str, "%Y%m%d %H%M%S")
+        self.datetime_created = parse_datetime_from_file_name(self.file_path_original)
 
     def get_file_size_mb(self):
         """Calculate and store the file size in megabytes."""
@@ -59,33 +121,121 @@ class VoiceMemo:
             self.path_markdown / f"{self.file_name_datetime}_{self.transcript_title}.md"
         )
 
-    def save_voice_memo_processed(self):
-        """Save a copy of the processed voice memo file."""
-        shutil.copy2(self.file_path_original, self.file_path_voice_memo_processed)
+    @measured("copy")
+    def save_voice_memo_processed(self, materializer=None):
+        """
+        Place the processed voice memo file, by hardlink, reflink, symlink or copy.
+
+        Identical existing files are not rewritten. Transcription then reads the
+        original, which the processed file links to or whose pages are still
+        cached from the mirror copy.
 
-    def transcribe(self, asr_model):
+        Args:
+            materializer (Materializer, optional): Materialization strategy.
+                Defaults to the cheapest one the filesystem supports.
+        """
+        materializer = materializer or Materializer()
+        self.materialized_as = materializer.materialize(
+            self.file_path_original, self.file_path_voice_memo_processed
+        )
+        self.file_path_audio = self.file_path_original
+
+    @measured("transcribe")
+    def transcribe(
+        self,
+        asr_model,
+        transcript_cache=None,
+        asr_model_name=None,
+        segment_seconds=None,
+        segment_workers=1,
+        audio_cache=None,
+        **options,
+    ):
         """
         Transcribe the voice memo using the provided ASR model.
 
+        If a transcript cache is given, it is checked before the model is called
+        and filled afterwards. With segment_seconds, the recording is split at
+        silence into segments of at most that length, which are transcribed
+        separately and stitched together (for long recordings).
+
         Args:
             asr_model: ASR model for transcription.
+            transcript_cache (TranscriptCache, optional): Cache of transcription results.
+            asr_model_name (str, optional): Name of the ASR model, part of the cache
+                key. Required with a cache if the model has no cache_name.
+            segment_seconds (float, optional): Maximum segment length for segmented
+                transcription. Defaults to transcribing the file in one call.
+            segment_workers (int): Segments transcribed concurrently. Defaults to 1.
+            audio_cache (AudioCache, optional): Cache of decoded waveforms, so the
+                audio is decoded by ffmpeg only once.
+            **options: Keyword arguments passed to the model's transcribe.
         """
-        transcript = asr_model.transcribe(str(self.file_path_voice_memo_processed))
+        audio_path = self.file_path_audio or self.file_path_voice_memo_processed
+        cache_key = None
+        if transcript_cache is not None:
+            key_options = dict(options)
+            if segment_seconds:
+                key_options["segment_seconds"] = segment_seconds
+            cache_key = transcript_cache.key_for(
+                audio_path, model_cache_name(asr_model, asr_model_name), key_options
+            )
+            transcript = transcript_cache.get(cache_key)
+            if transcript is not None:
+                self.transcript = transcript
+                return
+
+        samples = None
+        if segment_seconds:
+            from voice2md.segmenter import transcribe_segmented, waveform_blocks
+
+            blocks = None
+            if audio_cache is not None:
+                waveform = audio_cache.load(audio_path)
+                samples = len(waveform)
+                blocks = waveform_blocks(waveform)
+            transcript = transcribe_segmented(
+                asr_model,
+                audio_path,
+                max_segment_seconds=segment_seconds,
+                workers=segment_workers,
+                blocks=blocks,
+                **options,
+            )
+        else:
+            audio = str(audio_path)
+            if audio_cache is not None:
+                audio = audio_cache.audio_for(asr_model, audio_path)
+                if not isinstance(audio, str):
+                    samples = len(audio)
+            transcript = asr_model.transcribe(audio, **options)
+        # exact with a decoded waveform, else up to the end of the last segment
+        if samples is not None:
+            self.metrics.audio_seconds = samples / 16000
+        elif transcript.get("segments"):
+            self.metrics.audio_seconds = transcript["segments"][-1]["end"]
+        self.metrics.asr = transcript.get("asr")
         transcript["text"] = transcript["text"].strip()
         self.transcript = transcript
+        if cache_key is not None:
+            transcript_cache.set(cache_key, transcript)
 
-    def summarize(self, llm_client, model):
+    @measured("summarize")
+    def summarize(self, llm_client, model, llm_cache=None):
         """
         Generate a summary of the transcript.
 
         Args:
             llm_client: LLM client for summarization.
             model (str): Model for summarization.
+            llm_cache (LLMCache, optional): Cache of LLM responses.
         """
         if len(self.transcript["text"]) <= 20:
             self.transcript_tldr = self.transcript["text"]
         else:
-            res = llm_summarize_transcript(llm_client, self.transcript, model=model)
+            res = llm_summarize_transcript(
+                llm_client, self.transcript, model=model, llm_cache=llm_cache
+            )
             res_text = res.choices[0].message.content.strip()
             # Extract content within tldr_summary tags
             match = re.search(r'<tldr_summary>(.*?)</tldr_summary>', res_text, re.DOTALL)
@@ -96,15 +246,19 @@ class VoiceMemo:
                 res_text = res_text.strip()
             self.transcript_tldr = res_text
 
-    def generate_title(self, llm_client, model):
+    @measured("generate_title")
+    def generate_title(self, llm_client, model, llm_cache=None):
         """
         Generate a title for the transcript.
 
         Args:
             llm_client: LLM client for title generation.
             model (str): Model for title generation.
+            llm_cache (LLMCache, optional): Cache of LLM responses.
         """
-        res = llm_generate_note_title(llm_client, self.transcript, model=model)
+        res = llm_generate_note_title(
+            llm_client, self.transcript, model=model, llm_cache=llm_cache
+        )
         res_text = res.choices[0].message.content.strip()[:80]
         # Extract content within title tags
         match = re.search(r'<title>(.*?)</title>', res_text, re.DOTALL)
@@ -115,6 +269,100 @@ class VoiceMemo:
             res_text = res_text.strip()
         self.transcript_title = self.clean_title(res_text)
 
+    @measured("summarize_and_title")
+    def summarize_and_title(
+        self, llm_client, model, llm_cache=None, token_budget=None, map_workers=4
+    ):
+        """
+        Generate summary and title of the transcript with a single LLM call.
+
+        Falls back to separate summarize and generate_title calls for very short
+        transcripts and when the structured response cannot be parsed.
+        Transcripts longer than token_budget are summarized map-reduce style
+        over chunks instead.
+
+        Args:
+            llm_client: LLM client.
+            model (str): Model for summarization and title generation.
+            llm_cache (LLMCache, optional): Cache of LLM responses.
+            token_budget (int, optional): Estimated token count above which the
+                transcript is summarized in chunks. Defaults to never chunking.
+            map_workers (int): Chunks summarized concurrently. Defaults to 4.
+        """
+        if token_budget and estimate_tokens(self.transcript["text"]) > token_budget:
+            self.summarize_and_title_map_reduce(
+                llm_client, model, llm_cache, token_budget, map_workers
+            )
+            return
+
+        parsed = None
+        if len(self.transcript["text"]) > 20:
+            res = llm_summarize_and_title(
+                llm_client, self.transcript, model=model, llm_cache=llm_cache
+            )
+            parsed = parse_summary_and_title(res.choices[0].message.content)
+            if parsed is None:
+                logger.warning(
+                    f"Could not parse combined summary/title for {self.file_path_original}, "
+                    "falling back to separate calls"
+                )
+        if parsed is not None:
+            tldr, title = parsed
+            title = self.clean_title(title.strip('"')[:80])
+            if title:
+                self.transcript_tldr = tldr.strip('"')
+                self.transcript_title = title
+                return
+
+        self.summarize(llm_client, model, llm_cache)
+        self.generate_title(llm_client, model, llm_cache)
+
+    def summarize_and_title_map_reduce(
+        self, llm_client, model, llm_cache=None, token_budget=1500, map_workers=4
+    ):
+        """
+        Generate summary and title of a long transcript from concurrently summarized chunks.
+
+        Args:
+            llm_client: LLM client.
+            model (str): Model for summarization and title generation.
+            llm_cache (LLMCache, optional): Cache of LLM responses.
+            token_budget (int): Maximum estimated tokens per chunk. Defaults to 1500.
+            map_workers (int): Chunks summarized concurrently. Defaults to 4.
+        """
+        res = llm_summarize_map_reduce(
+            llm_client,
+            self.transcript,
+            model=model,
+            token_budget=token_budget,
+            max_workers=map_workers,
+            llm_cache=llm_cache,
+        )
+        res_text = res.choices[0].message.content.strip()
+        parsed = parse_summary_and_title(res_text)
+        if parsed is not None:
+            tldr, title = parsed
+            self.transcript_tldr = tldr.strip('"')
+            self.transcript_title = self.clean_title(title.strip('"')[:80])
+        else:
+            match = re.search(
+                r"<tldr_summary>(.*?)</tldr_summary>", res_text, re.DOTALL
+            )
+            self.transcript_tldr = match.group(1).strip() if match else res_text
+        if not self.transcript_title:
+            # title from the (short) summary instead of the long transcript
+            res = llm_generate_note_title(
+                llm_client,
+                {"text": self.transcript_tldr},
+                model=model,
+                llm_cache=llm_cache,
+            )
+            res_text = res.choices[0].message.content.strip()[:80]
+            match = re.search(r"<title>(.*?)</title>", res_text, re.DOTALL)
+            self.transcript_title = self.clean_title(
+                match.group(1).strip() if match else res_text
+            )
+
     def clean_title(self, transcript_title):
         """
         Clean the generated title by removing non-alphanumeric characters and replacing spaces with hyphens.
@@ -129,13 +377,21 @@ class VoiceMemo:
         cleaned_title = re.sub(r"\s+", "-", cleaned_title)
         return cleaned_title.strip("-")
 
-    def save_transcription(self):
-        """Generate and save the markdown note with the transcription and summary."""
-        self.md_note = md_note_builder(
+    @measured("save_transcription")
+    def save_transcription(self, note_template=md_note_builder):
+        """
+        Generate and save the markdown note with the transcription and summary.
+
+        The note is written atomically, and not at all if it is unchanged.
+
+        Args:
+            note_template (callable): Note builder from note_templates.
+                Defaults to md_note_builder.
+        """
+        self.md_note = note_template(
             datetime_created=self.datetime_created,
             transcript=self.transcript,
             transcript_tldr=self.transcript_tldr,
             file_path_voice_memo_processed=self.file_path_voice_memo_processed,
         )
-        with open(str(self.file_path_markdown), "w") as file:
-            file.write(self.md_note)
+        write_if_changed(self.file_path_markdown, self.md_note.encode("utf-8"))
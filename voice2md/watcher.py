@@ -0,0 +1,197 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """
+    Reports changed file names of a directory using Linux inotify (via ctypes).
+    """
+
+    def __init__(self, directory, suffix=".m4a"):
+        """
+        Start watching a directory.
+
+        Args:
+            directory (Path): Directory to watch.
+            suffix (str): Only report files with this suffix. Defaults to ".m4a".
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        self.directory = Path(directory)
+        self.suffix = suffix
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(self.directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {self.directory}")
+
+    def changes(self, timeout):
+        """
+        Wait up to timeout seconds for changes.
+
+        Args:
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            set[str]: Names of changed files.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        names = set()
+        if not readable:
+            return names
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+            if name.endswith(self.suffix):
+                names.add(name)
+        return names
+
+    def close(self):
+        """Stop watching."""
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    Reports changed file names of a directory by comparing periodic os.scandir snapshots.
+    """
+
+    def __init__(self, directory, suffix=".m4a"):
+        """
+        Start watching a directory. Files present now are not reported.
+
+        Args:
+            directory (Path): Directory to watch.
+            suffix (str): Only report files with this suffix. Defaults to ".m4a".
+        """
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(self.suffix) and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout):
+        """
+        Sleep for timeout seconds, then report new or modified files.
+
+        Args:
+            timeout (float): Seconds to wait.
+
+        Returns:
+            set[str]: Names of changed files.
+        """
+        time.sleep(timeout)
+        snapshot = self._scan()
+        names = {
+            name
+            for name, signature in snapshot.items()
+            if self._snapshot.get(name) != signature
+        }
+        self._snapshot = snapshot
+        return names
+
+    def close(self):
+        """Stop watching."""
+
+
+def create_watcher(directory, suffix=".m4a", use_inotify=None):
+    """
+    Create an inotify watcher on Linux, falling back to polling elsewhere or on error.
+
+    Args:
+        directory (Path): Directory to watch.
+        suffix (str): Only report files with this suffix. Defaults to ".m4a".
+        use_inotify (bool, optional): Force (True) or disable (False) inotify.
+            Defaults to inotify on Linux.
+
+    Returns:
+        InotifyWatcher or PollingWatcher: The watcher.
+    """
+    if use_inotify is None:
+        use_inotify = sys.platform.startswith("linux")
+    if use_inotify:
+        try:
+            return InotifyWatcher(directory, suffix)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(directory, suffix)
+
+
+def watch_settled_files(
+    watcher, settle_seconds=5.0, poll_interval=1.0, stop_event=None
+):
+    """
+    Yield batches of files that stopped changing, debouncing files still being written.
+
+    A file is reported once its size and mtime stayed the same for settle_seconds
+    after its last change event.
+
+    Args:
+        watcher: InotifyWatcher or PollingWatcher.
+        settle_seconds (float): Quiet time before a file counts as complete. Defaults to 5.
+        poll_interval (float): Maximum seconds between checks. Defaults to 1.
+        stop_event (threading.Event, optional): Ends the generator when set.
+
+    Yields:
+        list[Path]: Settled files, oldest change first.
+    """
+    stop_event = stop_event or threading.Event()
+    pending = {}  # path -> (stat signature, time the signature was last seen changing)
+    while not stop_event.is_set():
+        now = time.monotonic()
+        for name in watcher.changes(poll_interval):
+            pending[watcher.directory / name] = (None, now)
+
+        now = time.monotonic()
+        settled = []
+        for path, (signature, changed_at) in list(pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del pending[path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != signature:
+                pending[path] = (current, now)
+            elif now - changed_at >= settle_seconds:
+                settled.append((changed_at, path))
+                del pending[path]
+        if settled:
+            yield [path for _, path in sorted(settled)]
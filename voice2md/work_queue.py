@@ -0,0 +1,304 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from voice2md.logger_config import setup_logger
+from voice2md.memo_index import scan_voice_memos
+
+logger = setup_logger(__name__)
+
+QUEUE_DIR_NAME = ".voice2md-queue"
+
+
+def new_worker_id():
+    """Return an id unique to this process, e.g. "macbook-4711-3f2a"."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+
+
+class WorkQueue:
+    """
+    Queue of voice memos shared by worker processes through a directory.
+
+    The queue lives in PATH_VOICE_MEMOS_ORIGINAL/.voice2md-queue, so every
+    host that mounts the originals shares it, without a broker:
+
+    - leases/<memo>/gen-<n>: numbered generations of a memo's lease. A worker
+      claims a memo by hard-linking a complete lease file to the next
+      generation's name, which fails if the name exists, so exactly one
+      worker gets each generation. The newest generation is the lease; its
+      holder refreshes the mtime (heartbeat) while it processes the memo.
+    - A lease whose mtime is older than lease_seconds belongs to a crashed
+      worker. It is taken over by claiming the next generation, so the lease
+      is never missing in between and the old holder sees it lost.
+    - done/<memo> and failed/<memo>: the outcome, written once the result is
+      in the database. Failed memos are not claimed again until retried.
+
+    Lease expiry relies on the clocks of the hosts being roughly in sync.
+    """
+
+    def __init__(self, path_voice_memos_original, worker_id=None, lease_seconds=60.0):
+        """
+        Open (and if needed create) the queue.
+
+        Args:
+            path_voice_memos_original (Path): Directory of original voice memos.
+            worker_id (str, optional): Id of this worker. Defaults to new_worker_id().
+            lease_seconds (float): Age of the last heartbeat after which a lease
+                is considered abandoned. Defaults to 60.
+        """
+        self.path_voice_memos_original = Path(path_voice_memos_original)
+        self.path = self.path_voice_memos_original / QUEUE_DIR_NAME
+        self.worker_id = worker_id or new_worker_id()
+        self.lease_seconds = lease_seconds
+        for name in ("leases", "done", "failed"):
+            (self.path / name).mkdir(parents=True, exist_ok=True)
+        self._held = {}  # memo name -> lease generation
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _lease_dir(self, name):
+        return self.path / "leases" / name
+
+    def _lease_path(self, name, generation):
+        return self._lease_dir(name) / f"gen-{generation:06d}"
+
+    def _leases(self, name):
+        """Return the (generation, path) of a memo's lease files, newest first."""
+        try:
+            entries = os.listdir(self._lease_dir(name))
+        except FileNotFoundError:
+            return []
+        leases = []
+        for entry in entries:
+            if entry.startswith("gen-") and entry[4:].isdigit():
+                leases.append((int(entry[4:]), self._lease_dir(name) / entry))
+        return sorted(leases, reverse=True)
+
+    @staticmethod
+    def _owner(path):
+        try:
+            return json.loads(Path(path).read_text()).get("worker")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _is_expired(self, path):
+        try:
+            return time.time() - path.stat().st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            return False
+
+    def _try_lease(self, name, generation):
+        """Claim a generation of a memo's lease; return whether this worker holds it."""
+        lease_dir = self._lease_dir(name)
+        lease_dir.mkdir(exist_ok=True)
+        path = self._lease_path(name, generation)
+        tmp = lease_dir / f".{self.worker_id}.part"
+        tmp.write_text(
+            json.dumps(
+                {
+                    "worker": self.worker_id,
+                    "generation": generation,
+                    "claimed_at": time.time(),
+                }
+            )
+        )
+        try:
+            # link fails if the generation exists: only one worker gets it
+            os.link(tmp, path)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp)
+        with self._lock:
+            self._held[name] = generation
+        if not self.holds(name):
+            # a newer generation appeared while this one was claimed
+            self.release(name)
+            return False
+        for older, older_path in self._leases(name):
+            if older < generation:
+                try:
+                    os.unlink(older_path)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def claim(self, name):
+        """
+        Claim a memo, taking over an abandoned lease if needed.
+
+        Args:
+            name (str): File name of the original voice memo.
+
+        Returns:
+            bool: Whether this worker holds the lease now.
+        """
+        if self.is_finished(name):
+            return False
+        leases = self._leases(name)
+        if not leases:
+            claimed = self._try_lease(name, 0)
+        else:
+            generation, path = leases[0]
+            if not self._is_expired(path):
+                return False
+            owner = self._owner(path)
+            claimed = self._try_lease(name, generation + 1)
+            if claimed:
+                logger.warning(
+                    f"{self.worker_id} took over {name} from expired worker {owner}"
+                )
+        if claimed and self.is_finished(name):
+            # finished by another worker between the check and the claim
+            self.release(name)
+            return False
+        return claimed
+
+    def is_finished(self, name):
+        """Return whether a memo is done or failed."""
+        return (self.path / "done" / name).exists() or (
+            self.path / "failed" / name
+        ).exists()
+
+    def holds(self, name):
+        """Return whether this worker still holds the lease of a memo."""
+        with self._lock:
+            generation = self._held.get(name)
+        if generation is None:
+            return False
+        leases = self._leases(name)
+        return (
+            bool(leases)
+            and leases[0][0] == generation
+            and self._owner(leases[0][1]) == self.worker_id
+        )
+
+    def claim_batch(self, max_memos):
+        """
+        Claim up to max_memos unfinished memos, oldest recording first.
+
+        Args:
+            max_memos (int): Maximum memos to claim.
+
+        Returns:
+            list[Path]: The claimed voice memos.
+        """
+        claimed = []
+        for _, file_path in self.unfinished():
+            if len(claimed) >= max_memos:
+                break
+            if self.claim(file_path.name):
+                claimed.append(file_path)
+        return claimed
+
+    def unfinished(self):
+        """Return the (datetime, Path) of the memos that are neither done nor failed."""
+        return [
+            (datetime_created, file_path)
+            for datetime_created, file_path in scan_voice_memos(
+                self.path_voice_memos_original
+            )
+            if not self.is_finished(file_path.name)
+        ]
+
+    def _finish(self, name, outcome, **details):
+        path = self.path / outcome / name
+        tmp = path.with_name(f".{name}.{self.worker_id}.part")
+        with open(tmp, "w") as f:
+            json.dump(
+                {"worker": self.worker_id, "finished_at": time.time(), **details}, f
+            )
+        os.replace(tmp, path)
+        self.release(name)
+
+    def mark_done(self, name):
+        """Record that a memo is processed and release its lease."""
+        self._finish(name, "done")
+
+    def mark_failed(self, name, error):
+        """Record that a memo failed and release its lease."""
+        self._finish(name, "failed", error=str(error))
+
+    def release(self, name):
+        """Give up the lease of a memo, if this worker still holds it."""
+        with self._lock:
+            generation = self._held.pop(name, None)
+        if generation is None:
+            return
+        path = self._lease_path(name, generation)
+        if self._owner(path) == self.worker_id:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def retry_failed(self):
+        """
+        Make the failed memos claimable again.
+
+        Returns:
+            int: Number of requeued memos.
+        """
+        count = 0
+        for path in (self.path / "failed").iterdir():
+            if not path.name.startswith("."):
+                path.unlink()
+                count += 1
+        return count
+
+    def heartbeat(self):
+        """Refresh the leases held by this worker; forget the ones it lost."""
+        with self._lock:
+            held = dict(self._held)
+        for name, generation in held.items():
+            if not self.holds(name):
+                logger.warning(f"{self.worker_id} lost the lease of {name}")
+                with self._lock:
+                    if self._held.get(name) == generation:
+                        del self._held[name]
+                continue
+            try:
+                os.utime(self._lease_path(name, generation))
+            except FileNotFoundError:
+                pass
+
+    def start_heartbeat(self, interval=None):
+        """
+        Refresh the held leases in a background thread.
+
+        Args:
+            interval (float, optional): Seconds between heartbeats. Defaults to
+                a third of lease_seconds.
+        """
+        interval = interval or self.lease_seconds / 3
+
+        def beat():
+            while not self._stop.wait(interval):
+                self.heartbeat()
+
+        self._stop.clear()
+        self._heartbeat = threading.Thread(
+            target=beat, name="lease-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    def close(self):
+        """Stop the heartbeat and release all leases still held."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._lock:
+            held = list(self._held)
+        for name in held:
+            self.release(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()